@@ -0,0 +1,181 @@
+# aggregator.py
+# aggregator.py builds every higher timeframe (5m, 30m TPO periods, 1h, daily, custom) locally from one base stream of 1 minute bars or trades.
+import logging
+import math
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from SlackBot.Source.candle import CandleRecord
+
+logger = logging.getLogger(__name__)
+
+EST = ZoneInfo('America/New_York')
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+SESSION_OPEN_HOUR = 18 # Futures trading days start at 18:00 ET
+
+DEFAULT_TIMEFRAMES = ('5m', '30m', '1h', '1d')
+
+# '5m' / '30m' / '1h' / '1d' -> timedelta (days are session days, see bucket_start)
+def parse_timeframe(timeframe):
+    units = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days'}
+    unit = timeframe[-1]
+    if unit not in units:
+        raise ValueError(f"Unknown timeframe '{timeframe}', expected a number followed by s, m, h or d")
+    return timedelta(**{units[unit]: int(timeframe[:-1])})
+
+# Start of the bucket a timestamp falls in: intraday buckets are aligned to the clock,
+# daily buckets open at 18:00 ET the evening before the trading date
+def bucket_start(event_time, size):
+    if size >= timedelta(days=1):
+        local = event_time.astimezone(EST)
+        start = local.replace(hour=SESSION_OPEN_HOUR, minute=0, second=0, microsecond=0)
+        if local.hour < SESSION_OPEN_HOUR:
+            start -= timedelta(days=1)
+        return start.astimezone(timezone.utc)
+    return EPOCH + ((event_time - EPOCH) // size) * size
+
+def _number(value):
+    if value is None:
+        return 0.0
+    value = float(value)
+    return 0.0 if math.isnan(value) else value
+
+# Running rollup of one bar: OHLC plus additive volume, price x volume, bid/ask volume and count
+class _Rollup():
+    __slots__ = ('open', 'high', 'low', 'close', 'volume', 'pv', 'bid_volume', 'ask_volume', 'count')
+
+    def __init__(self):
+        self.open = None
+        self.high = -math.inf
+        self.low = math.inf
+        self.close = None
+        self.volume = 0.0
+        self.pv = 0.0
+        self.bid_volume = 0.0
+        self.ask_volume = 0.0
+        self.count = 0.0
+
+    def add(self, open_price, high, low, close, volume, vwap, bid_volume, ask_volume, count):
+        if self.open is None:
+            self.open = open_price
+        self.high = max(self.high, high)
+        self.low = min(self.low, low)
+        self.close = close
+        self.volume += volume
+        self.pv += vwap * volume
+        self.bid_volume += bid_volume
+        self.ask_volume += ask_volume
+        self.count += count
+
+    # Folds another rollup into this one in place
+    def absorb(self, other):
+        if other is None or other.open is None:
+            return
+        if self.open is None:
+            self.open = other.open
+        self.high = max(self.high, other.high)
+        self.low = min(self.low, other.low)
+        self.close = other.close
+        self.volume += other.volume
+        self.pv += other.pv
+        self.bid_volume += other.bid_volume
+        self.ask_volume += other.ask_volume
+        self.count += other.count
+
+    def merged(self, other):
+        merged = _Rollup()
+        for slot in _Rollup.__slots__:
+            setattr(merged, slot, getattr(self, slot))
+        merged.absorb(other)
+        return merged
+
+    def record(self, symbol, start):
+        return CandleRecord(
+            symbol,
+            start,
+            Count=self.count,
+            Volume=self.volume,
+            VWAP=self.pv / self.volume if self.volume else self.close,
+            BidVolume=self.bid_volume,
+            AskVolume=self.ask_volume,
+            Open=self.open,
+            High=self.high,
+            Low=self.low,
+            Close=self.close,
+        )
+
+# One forming bar of one timeframe: everything from finished base bars, plus the latest state of the base bar still forming
+class _Bucket():
+    __slots__ = ('start', 'committed', 'forming', 'forming_time')
+
+    def __init__(self, start):
+        self.start = start
+        self.committed = _Rollup()
+        self.forming = None
+        self.forming_time = None
+
+    def rollup(self):
+        return self.committed.merged(self.forming)
+
+class BarAggregator():
+    def __init__(self, timeframes=DEFAULT_TIMEFRAMES):
+        self.timeframes = {timeframe: parse_timeframe(timeframe) for timeframe in timeframes}
+        self.buckets = {} # (symbol, timeframe) -> _Bucket
+
+    # Feeds one base candle (repeats of the forming base bar replace its previous state).
+    # Returns [(timeframe, CandleRecord)] for every higher timeframe bar this closed.
+    def update(self, candle):
+        close = _number(candle['Close'])
+        volume = _number(candle['Volume'])
+        vwap = _number(candle['VWAP']) or close
+        base = _Rollup()
+        base.add(
+            _number(candle['Open']) or close,
+            _number(candle['High']) or close,
+            _number(candle['Low']) or close,
+            close,
+            volume,
+            vwap,
+            _number(candle['BidVolume']),
+            _number(candle['AskVolume']),
+            _number(candle['Count']),
+        )
+        return self._apply(candle['EventSymbol'], candle['EventTime'], base, forming=True)
+
+    # Feeds one trade, side is 'BUY' (lifted the offer), 'SELL' (hit the bid) or None
+    def add_trade(self, symbol, event_time, price, size, side=None):
+        trade = _Rollup()
+        trade.add(price, price, price, price, size, price,
+                  size if side == 'SELL' else 0.0, size if side == 'BUY' else 0.0, 1)
+        return self._apply(symbol, event_time, trade, forming=False)
+
+    # Current (possibly unfinished) bar of a timeframe
+    def current(self, symbol, timeframe):
+        bucket = self.buckets.get((symbol, timeframe))
+        if bucket is None:
+            return None
+        return bucket.rollup().record(symbol, bucket.start)
+
+    def _apply(self, symbol, event_time, base, forming):
+        closed = []
+        for timeframe, size in self.timeframes.items():
+            start = bucket_start(event_time, size)
+            bucket = self.buckets.get((symbol, timeframe))
+            if bucket is not None and start < bucket.start:
+                logger.debug(f" BarAggregator | update | Symbol: {symbol} | Timeframe: {timeframe} | Note: Late base bar {event_time} ignored")
+                continue
+            if bucket is None or start > bucket.start:
+                if bucket is not None:
+                    closed.append((timeframe, bucket.rollup().record(symbol, bucket.start)))
+                bucket = self.buckets[(symbol, timeframe)] = _Bucket(start)
+
+            if not forming:
+                bucket.committed.absorb(base)
+            elif bucket.forming_time is None or event_time == bucket.forming_time:
+                bucket.forming = base
+                bucket.forming_time = event_time
+            elif event_time > bucket.forming_time:
+                # The previous base bar is finished, fold it in for good
+                bucket.committed.absorb(bucket.forming)
+                bucket.forming = base
+                bucket.forming_time = event_time
+        return closed
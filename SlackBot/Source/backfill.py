@@ -0,0 +1,184 @@
+# backfill.py
+# backfill.py seeds the database with historical candles, one history subscription per symbol fetched concurrently, resuming from what is already covered.
+import argparse
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from tastytrade import DXLinkStreamer
+from logs.Logging_Config import setup_logging
+from SlackBot.Source.constant import symbols as default_symbols
+from SlackBot.Source.data import Data
+
+logger = logging.getLogger(__name__)
+
+# ------------------ Configuration ------------------ #
+
+MAX_CONNECTIONS = int(os.getenv('BACKFILL_MAX_CONNECTIONS', 2)) # Concurrent DXLink connections (one symbol each at a time)
+CHECKPOINT_PATH = os.getenv('BACKFILL_CHECKPOINT', 'backfill_checkpoint.json') # Covered range per symbol, survives restarts
+
+# --------------------------------------------------- #
+
+# A DXLink Candle subscription only takes a start time and streams every bar from there up to now (newest first),
+# so a symbol is fetched with exactly one subscription and split on the consumer side: rows are flushed in batches
+# and the contiguous range delivered so far is checkpointed after each batch.
+# The checkpoint keeps one covered [start, end] per symbol and interval. A range that extends it forward only
+# subscribes from the end of the covered range, bars already covered are not written again.
+# checkpoint_path=None keeps the coverage in memory only (one off gap fills)
+class Backfill():
+    def __init__(self, data, interval='5m', max_connections=MAX_CONNECTIONS, checkpoint_path=CHECKPOINT_PATH):
+        self.data = data
+        self.interval = interval
+        self.max_connections = max_connections
+        self.checkpoint_path = checkpoint_path
+        self.covered = self._load_checkpoint()
+
+    def coverage_key(self, symbol):
+        return f"{symbol}|{self.interval}"
+
+    # (symbol, fetch start, end) per symbol that still needs fetching
+    def plan(self, symbols, start_time, end_time):
+        jobs = []
+        for symbol in symbols:
+            fetch_start = start_time
+            covered = self.covered.get(self.coverage_key(symbol))
+            if covered is not None and covered[0] <= start_time:
+                if covered[1] >= end_time:
+                    continue
+                fetch_start = max(start_time, covered[1])
+            jobs.append((symbol, fetch_start, end_time))
+        return jobs
+
+    # Fetches every symbol not yet covered, returns the number of candles written
+    async def run(self, symbols, start_time, end_time):
+        queue = asyncio.Queue()
+        for job in self.plan(symbols, start_time, end_time):
+            queue.put_nowait(job)
+        if queue.empty():
+            logger.info(" Backfill | run | Note: Nothing to do, every symbol already covered")
+            return 0
+        logger.info(f" Backfill | run | Symbols: {queue.qsize()} | Connections: {self.max_connections}")
+        await self.data.prepare_range(start_time, end_time)
+
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(min(self.max_connections, queue.qsize()))]
+        counts = await asyncio.gather(*workers)
+        return sum(counts)
+
+    # One DXLink connection per worker, reused for every symbol it picks up
+    async def _worker(self, queue):
+        written = 0
+        async with DXLinkStreamer(await self.data.get_session()) as streamer:
+            while not queue.empty():
+                symbol, fetch_start, end_time = queue.get_nowait()
+                try:
+                    written += await self._fetch_symbol(streamer, symbol, fetch_start, end_time)
+                except Exception as e:
+                    logger.error(f" Backfill | fetch | Symbol: {symbol} | Start: {fetch_start} | End: {end_time} | Error: {e}")
+        return written
+
+    # Streams one symbol's history straight into the writer. Progress is only checkpointed once a batch is flushed,
+    # the whole range only once the feed is known to have delivered all of it.
+    async def _fetch_symbol(self, streamer, symbol, fetch_start, end_time):
+        covered = self.covered.get(self.coverage_key(symbol))
+        count = 0
+        rows = []
+        status = {}
+        first = last = None # EventTime of the first and the latest bar delivered
+        async for candle in self.data.iter_candle_data(symbol, self.interval, fetch_start, end_time, streamer=streamer, status=status):
+            event_time = candle['EventTime']
+            first = event_time if first is None else first
+            last = event_time
+            if covered is not None and covered[0] <= event_time <= covered[1]:
+                continue # Stored by an earlier run
+            rows.append(candle)
+            if len(rows) >= self.data.writer.flush_size:
+                count += await self._write(rows)
+                rows = []
+                self._progress(symbol, fetch_start, end_time, first, last)
+        count += await self._write(rows)
+        if not status.get('complete'):
+            self._progress(symbol, fetch_start, end_time, first, last)
+            logger.warning(f" Backfill | fetch | Symbol: {symbol} | Start: {fetch_start} | End: {end_time} | Candles: {count} | Note: Feed went quiet before the end of the range, only the delivered part is checkpointed")
+            return count
+        self._cover(symbol, fetch_start, end_time)
+        logger.info(f" Backfill | fetch | Symbol: {symbol} | Start: {fetch_start} | End: {end_time} | Candles: {count}")
+        return count
+
+    # add() leaves a failed flush to the writer's timer, the explicit flush raises so nothing is checkpointed unwritten
+    async def _write(self, rows):
+        await self.data.writer.add(rows)
+        await self.data.writer.flush()
+        return len(rows)
+
+    # The contiguous part of [fetch_start, end_time] delivered so far: from the latest bar up to the end when the
+    # history comes newest first, from the start up to the latest bar when it comes oldest first
+    def _progress(self, symbol, fetch_start, end_time, first, last):
+        if first is None or first == last:
+            return
+        if last < first:
+            self._cover(symbol, last, end_time, partial=True)
+        else:
+            self._cover(symbol, fetch_start, last, partial=True)
+
+    # Merges [start, end] into the symbol's covered range. A disjoint finished range replaces an older one,
+    # the newest stretch is the one later runs extend. Partial progress only ever extends it.
+    def _cover(self, symbol, start, end, partial=False):
+        key = self.coverage_key(symbol)
+        covered = self.covered.get(key)
+        if covered is not None:
+            if start <= covered[1] and end >= covered[0]:
+                start, end = min(start, covered[0]), max(end, covered[1])
+            elif partial or end < covered[0]:
+                return
+        self.covered[key] = (start, end)
+        self._save()
+
+    def _load_checkpoint(self):
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return {}
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if not isinstance(saved, dict):
+            logger.warning(f" Backfill | checkpoint | Path: {self.checkpoint_path} | Note: Old per chunk format, starting from an empty checkpoint")
+            return {}
+        return {key: (datetime.fromisoformat(start), datetime.fromisoformat(end)) for key, (start, end) in saved.items()}
+
+    # Written to a temp file and swapped in so a crash never leaves a half written checkpoint
+    def _save(self):
+        if self.checkpoint_path is None:
+            return
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({key: [start.isoformat(), end.isoformat()] for key, (start, end) in sorted(self.covered.items())}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+# Dates and times without a zone are taken as UTC
+def _parse_time(value):
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+# Seeds the store from the command line:
+# python -m SlackBot.Source.backfill --start 2025-01-01 [--end 2025-06-30] [--symbols /ES /NQ] [--interval 5m]
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed the candle store with historical candles")
+    parser.add_argument('--start', required=True, help="Start of the range, ISO date or time (UTC unless a zone is given)")
+    parser.add_argument('--end', help="End of the range, defaults to now")
+    parser.add_argument('--symbols', nargs='+', default=default_symbols)
+    parser.add_argument('--interval', default='5m')
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    data = Data()
+    backfill = Backfill(data, interval=args.interval)
+    start_time = _parse_time(args.start)
+    end_time = _parse_time(args.end) if args.end else datetime.now(timezone.utc)
+    try:
+        count = await backfill.run(args.symbols, start_time, end_time)
+        logger.info(f" Backfill | main | Candles: {count}")
+    finally:
+        await data.flush_data()
+        await data.connection.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,149 @@
+# bus.py
+# bus.py pushes every new or updated bar to subscribers as it is ingested, in process through asyncio queues and across processes through Postgres LISTEN/NOTIFY.
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from sqlalchemy import text
+from SlackBot.Source.candle import CandleRecord
+
+logger = logging.getLogger(__name__)
+
+# ------------------ Configuration ------------------ #
+
+BUS_QUEUE_SIZE = int(os.getenv('BUS_QUEUE_SIZE', 1000)) # Bars buffered per subscriber before its oldest is dropped
+BUS_CHANNEL = os.getenv('BUS_CHANNEL', 'candle_bars') # Postgres NOTIFY channel bars are forwarded on
+
+# --------------------------------------------------- #
+
+# NOTIFY payloads are plain JSON of the record, EventTime as ISO 8601
+def encode_bar(candle):
+    row = candle.as_dict() if hasattr(candle, 'as_dict') else dict(candle)
+    row['EventTime'] = row['EventTime'].isoformat() if row['EventTime'] is not None else None
+    return json.dumps(row, default=float)
+
+def decode_bar(payload):
+    row = json.loads(payload)
+    if row.get('EventTime') is not None:
+        row['EventTime'] = datetime.fromisoformat(row['EventTime'])
+    return CandleRecord(**row)
+
+# In process fan-out, every subscriber gets its own bounded queue so a slow one never holds up the feed
+class BarBus():
+    def __init__(self, maxsize=BUS_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self.subscribers = {} # queue -> set of symbols (None = every symbol)
+        self.forwarders = [] # callables handed every published bar (e.g. PgNotifier)
+
+    def subscribe(self, symbols=None, maxsize=None):
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        queue = asyncio.Queue(maxsize=maxsize or self.maxsize)
+        self.subscribers[queue] = set(symbols) if symbols is not None else None
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.pop(queue, None)
+
+    def forward(self, forwarder):
+        self.forwarders.append(forwarder)
+
+    # Never blocks, a full subscriber loses its oldest bar
+    def publish(self, candle):
+        symbol = candle['EventSymbol']
+        for queue, wanted in self.subscribers.items():
+            if wanted is not None and symbol not in wanted:
+                continue
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(candle)
+        for forwarder in self.forwarders:
+            forwarder(candle)
+
+    # async for candle in bus.bars(['/ES']): ...
+    async def bars(self, symbols=None):
+        queue = self.subscribe(symbols)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.unsubscribe(queue)
+
+# Process wide bus, import it from here
+bus = BarBus()
+
+# Forwards published bars to Postgres NOTIFY. Updates of the same bar between two sends collapse into the
+# latest one and everything pending goes out in one statement. Best effort: the table stays the source of truth.
+class PgNotifier():
+    def __init__(self, engine, channel=BUS_CHANNEL):
+        self.engine = engine
+        self.channel = channel
+        self.pending = {} # (symbol, time) -> latest bar
+        self.ready = asyncio.Event()
+        self.task = None
+
+    def __call__(self, candle):
+        self.pending[(candle['EventSymbol'], candle['EventTime'])] = candle
+        self.ready.set()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            bars, self.pending = self.pending, {}
+            try:
+                await asyncio.to_thread(self._send, [encode_bar(candle) for candle in bars.values()])
+            except Exception as e:
+                logger.error(f" PgNotifier | send | Channel: {self.channel} | Bars: {len(bars)} | Error: {e}")
+
+    def _send(self, payloads):
+        with self.engine.begin() as connection:
+            connection.execute(
+                text('SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload'),
+                {'channel': self.channel, 'payloads': payloads}
+            )
+
+# Forwards the process bus to Postgres NOTIFY, once per process however many writers ask for it
+def notify_postgres(engine, channel=BUS_CHANNEL):
+    for forwarder in bus.forwarders:
+        if isinstance(forwarder, PgNotifier) and forwarder.engine is engine and forwarder.channel == channel:
+            return forwarder
+    notifier = PgNotifier(engine, channel)
+    bus.forward(notifier)
+    return notifier
+
+# Yields every bar NOTIFY'd on the channel as a CandleRecord, on a dedicated connection taken out of the pool.
+# The socket is watched by the event loop, so a bar arrives as soon as the publishing transaction commits.
+# on_listen (a coroutine function) runs once LISTEN is in place and before the first bar is yielded, the place
+# to read back what was missed while not listening: bars notified meanwhile wait on the socket, none are lost.
+async def pg_listen(engine, channel=BUS_CHANNEL, on_listen=None):
+    connection = engine.raw_connection()
+    connection.detach() # LISTEN state must not leak back into the pool
+    dbapi = connection.driver_connection
+    dbapi.set_session(autocommit=True)
+    with dbapi.cursor() as cursor:
+        cursor.execute(f'LISTEN {channel}')
+    logger.info(f" Bus | pg_listen | Channel: {channel} | Note: Listening")
+
+    loop = asyncio.get_running_loop()
+    readable = asyncio.Event()
+    loop.add_reader(dbapi.fileno(), readable.set)
+    try:
+        if on_listen is not None:
+            await on_listen()
+        while True:
+            await readable.wait()
+            readable.clear()
+            dbapi.poll()
+            while dbapi.notifies:
+                notify = dbapi.notifies.pop(0)
+                try:
+                    yield decode_bar(notify.payload)
+                except (ValueError, TypeError) as e:
+                    logger.error(f" Bus | pg_listen | Channel: {channel} | Error: Bad payload ({e})")
+    finally:
+        loop.remove_reader(dbapi.fileno())
+        connection.close()
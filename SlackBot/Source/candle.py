@@ -0,0 +1,114 @@
+# candle.py
+# candle.py holds the compact candle record that flows from the streamer through the queue, writers and studies.
+import math
+import pandas as pd
+
+CANDLE_COLUMNS = (
+    "EventSymbol",
+    "EventTime",
+    "Index",
+    "Sequence",
+    "Count",
+    "Volume",
+    "VWAP",
+    "BidVolume",
+    "AskVolume",
+    "ImpVolatility",
+    "OpenInterest",
+    "Open",
+    "High",
+    "Low",
+    "Close",
+    "EventFlags",
+)
+
+# Decimal / str / int -> float, None and NaN -> None
+def to_float(value):
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+# One candle as a __slots__ object instead of a 16 key dict per event.
+# Attributes are named after the candle_data columns and the record also answers the read only
+# mapping calls (candle['Close'], .get(), .keys()) the rest of the code already uses on rows.
+class CandleRecord():
+    __slots__ = CANDLE_COLUMNS
+
+    def __init__(self, EventSymbol, EventTime, Index=None, Sequence=None, Count=None, Volume=None, VWAP=None,
+                 BidVolume=None, AskVolume=None, ImpVolatility=None, OpenInterest=None, Open=None, High=None,
+                 Low=None, Close=None, EventFlags=0):
+        self.EventSymbol = EventSymbol
+        self.EventTime = EventTime
+        self.Index = Index
+        self.Sequence = Sequence
+        self.Count = Count
+        self.Volume = Volume
+        self.VWAP = VWAP
+        self.BidVolume = BidVolume
+        self.AskVolume = AskVolume
+        self.ImpVolatility = ImpVolatility
+        self.OpenInterest = OpenInterest
+        self.Open = Open
+        self.High = High
+        self.Low = Low
+        self.Close = Close
+        self.EventFlags = EventFlags
+
+    # Builds a record straight from a tastytrade Candle event. The SDK sends Decimals (NaN for missing
+    # values), they become floats and None so live records carry the same types as ones read from a store.
+    # EventFlags is always an int (0 when unset), a column mixing '' and snapshot flags cannot be written to Parquet.
+    @classmethod
+    def from_event(cls, symbol, event, event_time):
+        return cls(
+            symbol,
+            event_time,
+            event.index,
+            event.sequence,
+            event.count,
+            to_float(event.volume),
+            to_float(event.vwap),
+            to_float(event.bid_volume),
+            to_float(event.ask_volume),
+            to_float(event.imp_volatility),
+            to_float(event.open_interest),
+            to_float(event.open),
+            to_float(event.high),
+            to_float(event.low),
+            to_float(event.close),
+            int(getattr(event, 'event_flags', 0) or 0),
+        )
+
+    def __getitem__(self, column):
+        try:
+            return getattr(self, column)
+        except AttributeError:
+            raise KeyError(column) from None
+
+    def get(self, column, default=None):
+        return getattr(self, column, default)
+
+    def keys(self):
+        return CANDLE_COLUMNS
+
+    # Column values in CANDLE_COLUMNS order
+    def values(self):
+        return tuple(getattr(self, column) for column in CANDLE_COLUMNS)
+
+    def as_dict(self):
+        return dict(zip(CANDLE_COLUMNS, self.values()))
+
+    def __repr__(self):
+        return f"CandleRecord({self.EventSymbol}, {self.EventTime}, O={self.Open}, H={self.High}, L={self.Low}, C={self.Close}, V={self.Volume})"
+
+# Builds a DataFrame from records in one pass (pandas cannot take __slots__ objects directly)
+def records_to_frame(records):
+    return pd.DataFrame.from_records([record.values() for record in records], columns=CANDLE_COLUMNS)
+
+# Rebuilds records from a DataFrame read back from a store, missing columns are left as None
+def frame_to_records(df):
+    columns = [column for column in CANDLE_COLUMNS if column in df.columns]
+    return [CandleRecord(**dict(zip(columns, row))) for row in df[columns].itertuples(index=False, name=None)]
@@ -0,0 +1,51 @@
+# coalescer.py
+# coalescer.py keeps only the latest state of each symbol's forming candle, so a bar is persisted once instead of once per update.
+import os
+import time
+
+# ------------------ Configuration ------------------ #
+
+SNAPSHOT_INTERVAL = float(os.getenv('COALESCER_SNAPSHOT_INTERVAL', 60)) # Seconds between snapshots of still forming bars
+
+# --------------------------------------------------- #
+
+# DXLink re-sends the forming candle with the same EventSymbol/EventTime and a growing Count/Volume.
+# A bar is final once a candle with a later EventTime arrives for the same symbol.
+class CandleCoalescer():
+    def __init__(self, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.snapshot_interval = snapshot_interval
+        self.open_bars = {} # symbol -> latest row of the forming bar
+        self.dirty = set() # symbols whose forming bar changed since the last snapshot
+        self.last_snapshot = time.monotonic()
+
+    # Takes one candle update and returns the rows that are ready to persist
+    def update(self, row):
+        symbol = row['EventSymbol']
+        current = self.open_bars.get(symbol)
+        if current is None or row['EventTime'] == current['EventTime']:
+            self.open_bars[symbol] = row
+            self.dirty.add(symbol)
+            return []
+        if row['EventTime'] < current['EventTime']:
+            # Update to a bar that is already closed (history snapshot or correction), upsert it as is
+            return [row]
+        self.open_bars[symbol] = row
+        self.dirty.add(symbol)
+        return [current]
+
+    def snapshot_due(self):
+        return time.monotonic() - self.last_snapshot >= self.snapshot_interval
+
+    # Latest state of every forming bar that changed since the last snapshot
+    def snapshot(self):
+        rows = [self.open_bars[symbol] for symbol in self.dirty]
+        self.dirty.clear()
+        self.last_snapshot = time.monotonic()
+        return rows
+
+    # Every forming bar, used on shutdown
+    def flush(self):
+        rows = list(self.open_bars.values())
+        self.open_bars.clear()
+        self.dirty.clear()
+        return rows
@@ -0,0 +1,321 @@
+# connection.py
+# connection.py keeps one Tastytrade session (cached on disk between runs) and one long lived DXLink streamer, and hands out reference counted subscriptions on it.
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from dotenv import load_dotenv
+from tastytrade import Session, DXLinkStreamer
+from tastytrade.dxfeed import Candle
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# ------------------ Configuration ------------------ #
+
+USERNAME = os.getenv("TASTY_USER")
+PASSWORD = os.getenv("TASTY_PASS")
+SESSION_CACHE = os.getenv('TASTY_SESSION_CACHE', '.tasty_session.json') # Remember token / session kept between runs (mode 600)
+SESSION_REFRESH = float(os.getenv('TASTY_SESSION_REFRESH', 6 * 3600)) # Seconds before a session is validated again
+SUBSCRIPTION_QUEUE_SIZE = int(os.getenv('SUBSCRIPTION_QUEUE_SIZE', 10000)) # Events buffered per subscriber before its oldest is dropped
+RECONNECT_DELAY = 5 # Seconds before the streamer is rebuilt after the connection drops
+
+# --------------------------------------------------- #
+
+_UNITS = {'s': 's', 'sec': 's', 'm': 'm', 'min': 'm', 'h': 'h', 'hour': 'h', 'd': 'd', 'day': 'd', 'w': 'w', 'week': 'w', 'mo': 'mo', 'month': 'mo'}
+
+# '5min', '5m' and '5' all mean the same candle period, so routes compare a canonical '5m'
+def canonical_interval(interval):
+    if interval is None:
+        return None
+    match = re.fullmatch(r'\s*(\d*)\s*([a-zA-Z]*)\s*', str(interval))
+    if match is None:
+        return str(interval)
+    count, unit = match.groups()
+    return f"{count or 1}{_UNITS.get(unit.lower(), unit.lower()) if unit else 'm'}"
+
+def _base_symbol(event_symbol):
+    return event_symbol.split('{', 1)[0]
+
+# Candle event symbols carry their period ('/ES{=5m,tho=true}'), other events have none
+def _event_interval(event_symbol):
+    match = re.search(r'\{=([^,}]+)', event_symbol)
+    return canonical_interval(match.group(1)) if match else None
+
+# One caller's view of a subscription: its own bounded queue, fed by the manager's dispatcher
+class Subscription():
+    def __init__(self, event_type, symbols, interval, maxsize=SUBSCRIPTION_QUEUE_SIZE):
+        self.event_type = event_type
+        self.symbols = set(symbols)
+        self.period = interval # As the caller wrote it, passed to DXLink untouched
+        self.interval = canonical_interval(interval)
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def deliver(self, event):
+        if self.interval is not None:
+            interval = _event_interval(event.event_symbol)
+            if interval is not None and interval != self.interval:
+                return
+        # Never let one slow caller stall the shared socket
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+class ConnectionManager():
+    def __init__(self, login=USERNAME, password=PASSWORD, cache_path=SESSION_CACHE):
+        self.login = login
+        self.password = password
+        self.cache_path = cache_path
+        self._session = None
+        self.validated_at = 0.0
+        self.stack = None
+        self._streamer = None
+        self.lock = asyncio.Lock()
+        self.session_lock = threading.Lock() # One login / validate at a time across worker threads
+        self.refs = {} # (event type, symbol, interval, extended hours) -> subscriber count
+        self.periods = {} # same key -> period string the DXLink subscription was made with
+        self.routes = {} # (event type, symbol) -> [Subscription]
+        self.dispatchers = {} # event type -> task reading streamer.listen(event type)
+
+    # ------------------------------ Session ------------------------------ #
+
+    # Logged in session, restored from the disk cache when possible and re-validated every SESSION_REFRESH seconds.
+    # Login and validate are blocking HTTP calls: synchronous callers only, async code awaits get_session().
+    @property
+    def session(self):
+        with self.session_lock:
+            if self._session is None:
+                self._session = self._restore() or self._login()
+                self.validated_at = time.monotonic()
+            elif time.monotonic() - self.validated_at >= SESSION_REFRESH:
+                if not self._valid(self._session):
+                    logger.info(" Connection | session | Note: Session expired, logging in again")
+                    self._session = self._restore() or self._login()
+                self.validated_at = time.monotonic()
+            return self._session
+
+    # The session without stalling the event loop, a refresh runs in a worker thread
+    async def get_session(self):
+        if self._session is not None and time.monotonic() - self.validated_at < SESSION_REFRESH:
+            return self._session
+        return await asyncio.to_thread(lambda: self.session)
+
+    def _valid(self, session):
+        try:
+            return bool(session.validate())
+        except Exception as e:
+            logger.debug(f" Connection | validate | Error: {e}")
+            return False
+
+    # Newer SDKs serialize the whole session, older ones only hand back a single use remember token
+    def _restore(self):
+        cached = self._read_cache()
+        if cached.get('login') != self.login:
+            return None
+        if cached.get('session') and hasattr(Session, 'deserialize'):
+            try:
+                session = Session.deserialize(cached['session'])
+                if self._valid(session):
+                    logger.info(" Connection | session | Note: Reusing cached session")
+                    return session
+            except Exception as e:
+                logger.debug(f" Connection | restore | Error: {e}")
+        if cached.get('remember_token'):
+            try:
+                session = Session(login=self.login, remember_token=cached['remember_token'], remember_me=True)
+                self._write_cache(session)
+                logger.info(" Connection | session | Note: Logged in with the cached remember token")
+                return session
+            except Exception as e:
+                logger.warning(f" Connection | restore | Note: Cached remember token rejected ({e})")
+        return None
+
+    def _login(self):
+        session = Session(login=self.login, password=self.password, remember_me=True)
+        self._write_cache(session)
+        logger.info(" Connection | session | Note: Logged in with password")
+        return session
+
+    def _read_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f" Connection | cache | Path: {self.cache_path} | Error: {e}")
+            return {}
+
+    # The cache holds credentials, so it is written 600 to a temp file and swapped in
+    def _write_cache(self, session):
+        if not self.cache_path:
+            return
+        cached = {'login': self.login, 'remember_token': getattr(session, 'remember_token', None)}
+        if hasattr(session, 'serialize'):
+            try:
+                cached['session'] = session.serialize()
+            except Exception as e:
+                logger.debug(f" Connection | serialize | Error: {e}")
+        tmp_path = f"{self.cache_path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(cached, f)
+        os.replace(tmp_path, self.cache_path)
+
+    # ------------------------------ Streamer ----------------------------- #
+
+    # The one DXLink connection, opened on first use and rebuilt after it drops
+    async def streamer(self):
+        if self._streamer is None:
+            self.stack = AsyncExitStack()
+            session = await self.get_session()
+            self._streamer = await self.stack.enter_async_context(DXLinkStreamer(session))
+            logger.info(" Connection | streamer | Note: DXLink connected")
+        return self._streamer
+
+    # Subscribes 'symbols' for one caller, the DXLink subscription is shared and only dropped by the last caller.
+    # async with manager.subscription(Candle, ['/ES'], interval='5m') as events:
+    #     async for event in events: ...
+    # A candle start_time always re-subscribes so this caller gets its history snapshot, callers already on
+    # the same candle may see those older bars again (the upsert writers and coalescer take repeats).
+    @asynccontextmanager
+    async def subscription(self, event_type, symbols, interval=None, start_time=None, extended_hours=True):
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        subscription = Subscription(event_type, symbols, interval)
+        await self._acquire(subscription, start_time, extended_hours)
+        try:
+            yield subscription
+        finally:
+            await self._release(subscription, start_time, extended_hours)
+
+    def _ref_key(self, event_type, symbol, interval, extended_hours):
+        return (event_type, symbol, interval, extended_hours if event_type is Candle else None)
+
+    async def _acquire(self, subscription, start_time, extended_hours):
+        async with self.lock:
+            streamer = await self.streamer()
+            for symbol in subscription.symbols:
+                self.routes.setdefault((subscription.event_type, symbol), []).append(subscription)
+            new = []
+            for symbol in subscription.symbols:
+                key = self._ref_key(subscription.event_type, symbol, subscription.interval, extended_hours)
+                self.refs[key] = self.refs.get(key, 0) + 1
+                self.periods.setdefault(key, subscription.period)
+                if self.refs[key] == 1 or (subscription.event_type is Candle and start_time is not None):
+                    new.append(symbol)
+            if new:
+                await self._subscribe(streamer, subscription.event_type, new, subscription.period, start_time, extended_hours)
+            self._ensure_dispatcher(subscription.event_type)
+
+    async def _release(self, subscription, start_time, extended_hours):
+        async with self.lock:
+            for symbol in subscription.symbols:
+                routes = self.routes.get((subscription.event_type, symbol), [])
+                if subscription in routes:
+                    routes.remove(subscription)
+            idle = []
+            period = subscription.period
+            for symbol in subscription.symbols:
+                key = self._ref_key(subscription.event_type, symbol, subscription.interval, extended_hours)
+                self.refs[key] -= 1
+                if self.refs[key] == 0:
+                    del self.refs[key]
+                    period = self.periods.pop(key, period)
+                    idle.append(symbol)
+            if idle and self._streamer is not None:
+                try:
+                    await self._unsubscribe(self._streamer, subscription.event_type, idle, period, start_time, extended_hours)
+                except Exception as e:
+                    logger.error(f" Connection | unsubscribe | Symbols: {idle} | Error: {e}")
+
+    async def _subscribe(self, streamer, event_type, symbols, interval, start_time, extended_hours):
+        if event_type is Candle:
+            await streamer.subscribe_candle(symbols=symbols, interval=interval, start_time=start_time, extended_trading_hours=extended_hours)
+        else:
+            await streamer.subscribe(event_type, symbols)
+        logger.debug(f" Connection | subscribe | Event: {event_type.__name__} | Symbols: {symbols} | Interval: {interval}")
+
+    async def _unsubscribe(self, streamer, event_type, symbols, interval, start_time, extended_hours):
+        if event_type is Candle:
+            await streamer.unsubscribe_candle(symbols=symbols, interval=interval, start_time=start_time, extended_trading_hours=extended_hours)
+        else:
+            await streamer.unsubscribe(event_type, symbols)
+        logger.debug(f" Connection | unsubscribe | Event: {event_type.__name__} | Symbols: {symbols}")
+
+    def _ensure_dispatcher(self, event_type):
+        task = self.dispatchers.get(event_type)
+        if task is None or task.done():
+            self.dispatchers[event_type] = asyncio.create_task(self._dispatch(event_type))
+
+    # Reads one event type off the shared streamer and fans each event out to that symbol's subscribers.
+    # If the connection drops the streamer is rebuilt and every live subscription is restored.
+    async def _dispatch(self, event_type):
+        while any(routes for (route_type, _), routes in self.routes.items() if route_type is event_type):
+            streamer = None
+            try:
+                streamer = await self.streamer()
+                async for event in streamer.listen(event_type):
+                    for subscription in self.routes.get((event_type, _base_symbol(event.event_symbol)), ()):
+                        subscription.deliver(event)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f" Connection | dispatch | Event: {event_type.__name__} | Error: {e}")
+                await self._reconnect(streamer)
+
+    # Every dispatcher sees the same dropped connection, only the first one rebuilds it
+    async def _reconnect(self, failed):
+        async with self.lock:
+            if self._streamer is not None and self._streamer is not failed:
+                return
+            await self._close_streamer()
+            await asyncio.sleep(RECONNECT_DELAY)
+            try:
+                streamer = await self.streamer()
+                for key in list(self.refs):
+                    event_type, symbol, _, extended_hours = key
+                    await self._subscribe(streamer, event_type, [symbol], self.periods.get(key), None, bool(extended_hours))
+            except Exception as e:
+                logger.error(f" Connection | reconnect | Error: {e}")
+                await self._close_streamer()
+
+    async def _close_streamer(self):
+        stack, self.stack, self._streamer = self.stack, None, None
+        if stack is not None:
+            try:
+                await stack.aclose()
+            except Exception as e:
+                logger.debug(f" Connection | close | Error: {e}")
+
+    # Stops every dispatcher and closes the streamer, the cached session stays valid for the next run
+    async def close(self):
+        for task in self.dispatchers.values():
+            task.cancel()
+        self.dispatchers.clear()
+        await self._close_streamer()
+
+_shared = None
+
+# Process wide manager, every Data instance shares its session and streamer
+def shared_connection():
+    global _shared
+    if _shared is None:
+        _shared = ConnectionManager()
+    return _shared
@@ -1,3 +1,6 @@
 # Will need to impliment volume based roll-over contract adjustment
 
 symbols = ['/ES', '/NQ', '/RTY', '/CL']
+
+# Minimum price increment per product, volume at price is bucketed on these
+tick_sizes = {'/ES': 0.25, '/NQ': 0.25, '/RTY': 0.1, '/CL': 0.01}
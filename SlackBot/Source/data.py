@@ -3,79 +3,129 @@
 import asyncio
 import os 
 import logging
-from logs.Logging_Config import setup_logging
+from datetime import datetime, timezone
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from tastytrade import Session, DXLinkStreamer
-from tastytrade.dxfeed import Candle
-import pandas as pd
+from tastytrade.dxfeed import Candle, TimeAndSale
 from SlackBot.Utils.utils import Utils
+from SlackBot.Source.writer import BulkWriter
+from SlackBot.Source.coalescer import CandleCoalescer
+from SlackBot.Source.parquet_store import ParquetStore
+from SlackBot.Source.memory_store import MemoryStore
+from SlackBot.Source.candle import CandleRecord, to_float
+from SlackBot.Source.time_and_sales import TradeAggregates
+from SlackBot.Source.bus import bus, notify_postgres
+from SlackBot.Source.connection import shared_connection
+from SlackBot.Source.spool import Spool, SPOOL_DIR
+from SlackBot.Source.schema import ensure_schema, ensure_partitions
+from SlackBot.Source import db
+from SlackBot.Source.db import engine
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
-DB_USER = os.getenv('DB_USER')
-DB_PASSWORD = os.getenv('DB_PASSWORD')
-DB_HOST = os.getenv('DB_HOST')
-DB_PORT = os.getenv('DB_PORT')
-DB_NAME = os.getenv('DB_NAME')
-
-USERNAME = os.getenv("TASTY_USER")
-PASSWORD = os.getenv("TASTY_PASS")
-
-# SqlAlchemy Engine
-engine = create_engine(
-    f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
-)
+FETCH_IDLE_TIMEOUT = 5 # Seconds without a historical candle before a fetch is considered complete
+SNAPSHOT_END = 0x08 # eventFlags bit on the last event of a history snapshot
+SNAPSHOT_SNIP = 0x10 # Same, when the feed cut the snapshot short (nothing older is available)
+STORED_INTERVAL = '5m' # Period of the bars in the store, candle_data is keyed on (EventSymbol, EventTime) without an interval
+DATA_BACKEND = os.getenv('DATA_BACKEND', 'postgres') # 'postgres' (candle_data table), 'parquet' (local columnar files) or 'memory' (replays)
 
 # Data FLow Class to handle all data related operations
 class Data():
-    def __init__(self):
-        self.session = Session(login=USERNAME, password=PASSWORD) # TastyWorks Session
+    def __init__(self, backend=DATA_BACKEND, connection=None):
+        self.connection = connection or shared_connection() # Cached TastyWorks Session and the Shared DXLink Streamer
         self.utils = Utils() # Utility Functions
-        pass
+        self.backend = backend
+        self.trades = TradeAggregates() # Per Price Volume / Delta built from Time and Sales
+        self.trade_writer = None
+        if backend == 'parquet':
+            self.writer = ParquetStore() # Parquet Files Partitioned by Symbol and Trading Date
+        elif backend == 'memory':
+            self.writer = MemoryStore() # Nothing Persisted and no NOTIFY, for Offline Replays
+        elif backend == 'postgres':
+            try:
+                ensure_schema(engine) # Partitioned candle_data, Indexes and the Months around Now
+            except Exception as e:
+                logger.error(f" Data | ensure_schema | Error: {e}")
+            notify_postgres(engine) # Bars published by write_data reach other processes through NOTIFY
+            self.writer = BulkWriter(
+                engine,
+                table="candle_data",
+                key=("EventSymbol", "EventTime"),
+                spool=Spool(os.path.join(SPOOL_DIR, "candle_data")),
+                manage_table=False
+            ) # Batched COPY Upsert Writer with an On Disk Write-Ahead Spool
+            self.trade_writer = BulkWriter(
+                engine,
+                table="volume_at_price",
+                key=("EventSymbol", "TradeDate", "Session", "Price"),
+                spool=Spool(os.path.join(SPOOL_DIR, "volume_at_price")),
+                manage_table=False
+            ) # Changed Price Levels only, Raw Prints are never Stored
+        else:
+            raise ValueError(f"Unknown data backend '{backend}', expected 'postgres', 'parquet' or 'memory'")
+        self.coalescer = CandleCoalescer() # Latest State of each Forming Bar
     
     # Method to fetch data from API Source and return it in a Structured Manner
-    async def fetch_candle_data(self, symbol, interval, start_time, end_time, extended_hours=True):
-        candles_list = []
-        async with DXLinkStreamer(self.session) as streamer:
-            await streamer.subscribe_candle(
+    async def fetch_candle_data(self, symbol, interval, start_time, end_time, extended_hours=True, streamer=None):
+        return [candle async for candle in self.iter_candle_data(symbol, interval, start_time, end_time, extended_hours, streamer)]
+
+    # Streams historical candles for [start_time, end_time] one at a time instead of accumulating the range.
+    # By default the candles come through a subscription on the shared streamer, pass an open streamer
+    # to use a dedicated connection instead (the backfill workers do this to fetch in parallel).
+    # 'status' (a dict) gets 'complete': True only when the feed is known to have delivered the whole range
+    async def iter_candle_data(self, symbol, interval, start_time, end_time, extended_hours=True, streamer=None, status=None):
+        if streamer is None:
+            async with self.connection.subscription(Candle, symbol, interval=interval, start_time=start_time, extended_hours=extended_hours) as events:
+                async for candle in self._candles_in_range(symbol, events.get, start_time, end_time, status):
+                    yield candle
+            return
+
+        await streamer.subscribe_candle(
+            symbols=[symbol],
+            interval=interval,
+            start_time=start_time,
+            extended_trading_hours=extended_hours
+        )
+        try:
+            async for candle in self._candles_in_range(symbol, streamer.listen(Candle).__aiter__().__anext__, start_time, end_time, status):
+                yield candle
+        finally:
+            await streamer.unsubscribe_candle(
                 symbols=[symbol],
                 interval=interval,
                 start_time=start_time,
                 extended_trading_hours=extended_hours
             )
-            async for event in streamer.listen(Candle):
-                if event.event_symbol == symbol:
-                    continue
-                event_dt = self.utils._to_datetime(event.time)
-                if event_dt > end_time:
-                    await streamer.unsubscribe_candle(
-                        symbols=[symbol],
-                        interval=interval,
-                        start_time=start_time,
-                        extended_trading_hours=extended_hours
-                    )
-                    break
-                
+
+    # History may arrive oldest or newest first. The range is complete once bars on both sides of it were seen,
+    # the snapshot end flag arrived, or the feed went quiet with the range reaching up to the present.
+    async def _candles_in_range(self, symbol, next_event, start_time, end_time, status=None):
+        status = {} if status is None else status
+        status['complete'] = False
+        fetch_started = datetime.now(timezone.utc)
+        before = after = False
+        while True:
+            try:
+                event = await asyncio.wait_for(next_event(), timeout=FETCH_IDLE_TIMEOUT)
+            except (asyncio.TimeoutError, StopAsyncIteration):
+                status['complete'] = before and end_time >= fetch_started
+                break
+            if self._base_symbol(event.event_symbol) != symbol:
+                continue
+            event_dt = self.utils._to_datetime(event.time)
+            if event_dt < start_time:
+                before = True
+            elif event_dt > end_time:
+                after = True
+            else:
                 # Structured Data
-                candles_list.append({
-                    "EventSymbol": event.event_symbol,
-                    "EventTime": event_dt,
-                    "Index": event.index,
-                    "Sequence": event.sequence,
-                    "Count": event.count,
-                    "Volume": event.volume,
-                    "VWAP": event.vwap,
-                    "BidVolume": event.bid_volume,
-                    "AskVolume": event.ask_volume,
-                    "ImpVolatility": event.imp_volatility,
-                    "OpenInterest": event.open_interest,
-                    "Open": event.open,
-                    "High": event.high,
-                    "Low": event.low,
-                    "Close": event.close
-                })
-        return candles_list
+                yield CandleRecord.from_event(symbol, event, event_dt)
+            flags = getattr(event, 'event_flags', None) or 0
+            if flags & SNAPSHOT_SNIP:
+                logger.warning(f" Data | candles_in_range | Symbol: {symbol} | Note: Snapshot cut short by the feed before {event_dt}")
+            if before and after or flags & (SNAPSHOT_END | SNAPSHOT_SNIP):
+                status['complete'] = True
+                break
     
     async def fetch_option_data(self, symbol, period, start_date, end_date, data_type):
         # Need to impliment this later (I REALLLLLLLY DONT WANT TO TO THIIIISSS)
@@ -83,44 +133,113 @@ class Data():
         pass
     
     # Method to Stream Candle Data from API Source and return it in a structured manner.
-    async def stream_candle_data(self, symbol, period, start_date, end_date, data_type):
-        async with DXLinkStreamer(self.session) as streamer:
-            await streamer.subscribe_candle(
-                symbols=[symbol],
-                interval=period,
-            )
-            async for event in streamer.listen(Candle):
-                if event.event_symbol == symbol:
-                    yield {
-                        "EventSymbol": event.event_symbol,
-                        "EventTime": self.utils._to_datetime(event.time),
-                        "Index": event.index,
-                        "Sequence": event.sequence,
-                        "Count": event.count,
-                        "Volume": event.volume,
-                        "VWAP": event.vwap,
-                        "BidVolume": event.bid_volume,
-                        "AskVolume": event.ask_volume,
-                        "ImpVolatility": event.imp_volatility,
-                        "OpenInterest": event.open_interest,
-                        "Open": event.open,
-                        "High": event.high,
-                        "Low": event.low,
-                        "Close": event.close
-                    }       
+    # One subscription on the shared streamer covers every symbol, candles are yielded in arrival order.
+    # Per product consumers subscribe to the bar bus (bus.bars(['/ES'])), which write_data publishes to.
+    async def stream_candle_data(self, symbols, period, recorder=None):
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        wanted = set(symbols)
+        async with self.connection.subscription(Candle, symbols, interval=period, extended_hours=False) as events:
+            async for event in events:
+                symbol = self._base_symbol(event.event_symbol)
+                if symbol not in wanted:
+                    continue
+                if recorder is not None:
+                    recorder.write(symbol, event)
+                yield CandleRecord.from_event(symbol, event, self.utils._to_datetime(event.time))
+
+    # Streams Time and Sales for every symbol, classifies each print by aggressor side and folds it into self.trades.
+    # Yields (symbol, event_time, price, size, side) so bars can be built from trades as well.
+    # Only the per price aggregates are persisted (volume_at_price), never the prints themselves.
+    async def stream_time_and_sales(self, symbols):
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        async with self.connection.subscription(TimeAndSale, symbols) as events:
+            async for event in events:
+                symbol = self._base_symbol(event.event_symbol)
+                # Missing values come as Decimal('NaN'), a print without a price or size is skipped
+                price = to_float(event.price)
+                size = to_float(event.size)
+                if price is None or not size:
+                    continue
+                # Corrections and cancels re-send earlier prints, only new valid ticks count
+                if not getattr(event, 'valid_tick', True) or getattr(event, 'type', 'NEW') not in ('NEW', None):
+                    continue
+                event_time = self.utils._to_datetime(event.time)
+                side = self.trades.add(
+                    symbol,
+                    event_time,
+                    price,
+                    size,
+                    bid=to_float(event.bid_price),
+                    ask=to_float(event.ask_price),
+                    aggressor_side=event.aggressor_side
+                )
+                if self.trade_writer is not None and self.trades.snapshot_due():
+                    await self.trade_writer.add(self.trades.snapshot())
+                yield symbol, event_time, price, size, side
+
+    # Logged in session of the shared connection (DXLinkStreamer, account calls), may block on a refresh
+    @property
+    def session(self):
+        return self.connection.session
+
+    # Same, refreshed in a worker thread so the live stream keeps going, use this from async code
+    async def get_session(self):
+        return await self.connection.get_session()
+
+    # Candle events come back as '/ES{=5m}', strip the interval so events route to the subscribed symbol
+    @staticmethod
+    def _base_symbol(event_symbol):
+        return event_symbol.split('{', 1)[0]
                
     # Writes Historical and Real Time Candle Data to Database
-    async def write_data(self, data, data_type):
-        df = pd.DataFrame(data) # Convert Data to DataFrame
-        df.to_sql(name="candle_data",engine=engine, if_exists='append', index=False)
+    # Updates to a forming bar are coalesced, a bar is upserted once it is final or when a periodic snapshot is due.
+    # Rows are buffered and COPY'd in batches, call flush_data() to force them out (e.g. on exit).
+    # Every candle is published on the bar bus first so subscribers never wait on the database.
+    async def write_data(self, data, data_type=None):
+        rows = []
+        for candle in data:
+            bus.publish(candle)
+            rows.extend(self.coalescer.update(candle))
+        if self.coalescer.snapshot_due():
+            rows.extend(self.coalescer.snapshot())
+        await self.writer.add(rows)
+
+    # Makes sure the store can take candles for [start_time, end_time] (monthly partitions in Postgres)
+    async def prepare_range(self, start_time, end_time):
+        if self.backend == 'postgres':
+            await asyncio.to_thread(ensure_partitions, engine, start_time, end_time)
+
+    # Daily store upkeep after the close (runs on the scheduler thread): partitions ahead of the calendar and
+    # retention for Postgres, one file per finished partition for Parquet
+    def maintenance(self):
+        if self.backend == 'parquet':
+            self.writer.compact_finished()
+        elif self.backend == 'postgres':
+            ensure_schema(engine)
+
+    # Replays batches a previous run spooled but never got into the database
+    async def replay_spool(self):
+        await self.writer.flush()
+        if self.trade_writer is not None:
+            await self.trade_writer.flush()
+
+    async def flush_data(self):
+        await self.writer.add(self.coalescer.flush())
+        await self.writer.close()
+        if self.trade_writer is not None:
+            await self.trade_writer.add(self.trades.snapshot())
+            await self.trade_writer.close()
         
     # Reads the most 'limit' rows of data for a symbol from the Database
     async def read_data(self, symbol, limit):
-        query = f"""
-            SELECT * FROM candle_data
-            WHERE "EventSymbol" = '{symbol}'
-            ORDER BY "EventTime" DESC
-            LIMIT {limit};
-        """
-        df = pd.read_sql(query, engine)
-        return df.sort_values("EventTime")
\ No newline at end of file
+        if self.backend != 'postgres':
+            return await asyncio.to_thread(self.writer.read, symbol, limit)
+        return await asyncio.to_thread(db.latest_candles, symbol, limit)
+
+    # Reads every row of a symbol in [start_time, end_time], oldest first
+    async def read_range(self, symbol, start_time, end_time):
+        if self.backend != 'postgres':
+            return await asyncio.to_thread(self.writer.read, symbol, None, start_time, end_time)
+        return await asyncio.to_thread(db.range_candles, symbol, start_time, end_time)
@@ -0,0 +1,98 @@
+# db.py
+# db.py owns the one pooled SQLAlchemy engine every data module shares, plus the parameterized candle queries they all run.
+import logging
+import os
+from dotenv import load_dotenv
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# ------------------ Configuration ------------------ #
+
+DB_USER = os.getenv('DB_USER')
+DB_PASSWORD = os.getenv('DB_PASSWORD')
+DB_HOST = os.getenv('DB_HOST')
+DB_PORT = os.getenv('DB_PORT')
+DB_NAME = os.getenv('DB_NAME')
+
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5)) # Connections kept open per process
+MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 2)) # Extra connections allowed under bursts
+POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800)) # Seconds before a connection is replaced
+
+# --------------------------------------------------- #
+
+# SqlAlchemy Engine (one per process, import it from here)
+engine = create_engine(
+    f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}',
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_recycle=POOL_RECYCLE,
+    pool_pre_ping=True
+)
+
+# Server side prepared statements, created once per pooled connection so Postgres plans them once
+PREPARED = {
+    'candle_latest': (
+        '(text, bigint)',
+        'SELECT * FROM candle_data WHERE "EventSymbol" = $1 ORDER BY "EventTime" DESC LIMIT $2'
+    ),
+    'candle_range': (
+        '(text, timestamptz, timestamptz)',
+        'SELECT * FROM candle_data WHERE "EventSymbol" = $1 AND "EventTime" >= $2 AND "EventTime" <= $3 ORDER BY "EventTime"'
+    ),
+    'candle_last_time': (
+        '(text)',
+        'SELECT max("EventTime") FROM candle_data WHERE "EventSymbol" = $1'
+    ),
+}
+
+# Same queries as plain bound statements, used until a connection managed to prepare (e.g. before the table exists)
+FALLBACK = {
+    'candle_latest': 'SELECT * FROM candle_data WHERE "EventSymbol" = :p1 ORDER BY "EventTime" DESC LIMIT :p2',
+    'candle_range': 'SELECT * FROM candle_data WHERE "EventSymbol" = :p1 AND "EventTime" >= :p2 AND "EventTime" <= :p3 ORDER BY "EventTime"',
+    'candle_last_time': 'SELECT max("EventTime") FROM candle_data WHERE "EventSymbol" = :p1',
+}
+
+def _statement(connection, name, param_count):
+    # connection.info lives as long as the pooled DBAPI connection, so each one prepares once
+    if not connection.info.get('prepared'):
+        try:
+            with connection.begin_nested():
+                existing = {row[0] for row in connection.exec_driver_sql('SELECT name FROM pg_prepared_statements')}
+                for statement, (types, sql) in PREPARED.items():
+                    if statement not in existing:
+                        connection.exec_driver_sql(f'PREPARE {statement} {types} AS {sql}')
+            connection.info['prepared'] = True
+        except Exception as e:
+            logger.debug(f" db | prepare | Note: Falling back to unprepared statements ({e})")
+            return text(FALLBACK[name])
+    params = ', '.join(f':p{i}' for i in range(1, param_count + 1))
+    return text(f'EXECUTE {name}({params})')
+
+# Reads the most 'limit' candles for a symbol, oldest first
+def latest_candles(symbol, limit):
+    with engine.connect() as connection:
+        df = pd.read_sql(_statement(connection, 'candle_latest', 2), connection, params={'p1': symbol, 'p2': limit})
+    return df.sort_values('EventTime').reset_index(drop=True)
+
+# Reads every candle for a symbol in [start_time, end_time], oldest first
+def range_candles(symbol, start_time, end_time):
+    with engine.connect() as connection:
+        return pd.read_sql(
+            _statement(connection, 'candle_range', 3),
+            connection,
+            params={'p1': symbol, 'p2': start_time, 'p3': end_time}
+        )
+
+# Latest stored EventTime for a symbol (None if nothing is stored)
+def last_timestamp(symbol):
+    with engine.connect() as connection:
+        return connection.execute(_statement(connection, 'candle_last_time', 1), {'p1': symbol}).scalar()
+
+# Latest stored EventTime of every symbol
+def last_timestamps():
+    with engine.connect() as connection:
+        rows = connection.execute(text('SELECT "EventSymbol", max("EventTime") FROM candle_data GROUP BY "EventSymbol"'))
+        return {symbol: event_time for symbol, event_time in rows if event_time is not None}
@@ -0,0 +1,172 @@
+# decoder.py
+# decoder.py turns DXLink FEED_DATA messages into columnar batches per event type, driven by the COMPACT field order of each event.
+import json
+import logging
+import numpy as np
+from SlackBot.Source.candle import CandleRecord
+from SlackBot.Source.timestamps import parse_timestamps_ns, ns_to_datetime, INVALID_NS
+
+try:
+    import orjson # Several times faster than json on FEED_DATA sized messages
+    _loads = orjson.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+# COMPACT field order per event type, the order the feed is set up with (FEED_CONFIG can override it)
+SCHEMAS = {
+    'Candle': (
+        'eventSymbol', 'eventTime', 'time', 'sequence', 'count', 'open', 'high', 'low', 'close',
+        'volume', 'vwap', 'bidVolume', 'askVolume', 'impVolatility', 'openInterest', 'eventFlags',
+    ),
+    'Quote': (
+        'eventSymbol', 'eventTime', 'sequence', 'timeNanoPart', 'bidTime', 'bidExchangeCode', 'bidPrice',
+        'bidSize', 'askTime', 'askExchangeCode', 'askPrice', 'askSize',
+    ),
+    'TimeAndSale': (
+        'eventSymbol', 'eventTime', 'eventFlags', 'index', 'time', 'timeNanoPart', 'sequence', 'exchangeCode',
+        'price', 'size', 'bidPrice', 'askPrice', 'exchangeSaleConditions', 'tradeThroughExempt',
+        'aggressorSide', 'spreadLeg', 'extendedTradingHours', 'validTick', 'type', 'buyer', 'seller',
+    ),
+}
+
+# Fields an event must carry to be usable, shorter rows are dropped
+REQUIRED = {'Candle': 15, 'Quote': 12, 'TimeAndSale': 10}
+
+# Candle fields -> candle_data columns ('time' is the bar start and the candle key)
+# Every column but Sequence and Count is a price or volume, the feed's 'NaN' strings become None there
+FLOAT_FIELDS = ('open', 'high', 'low', 'close', 'volume', 'vwap', 'bidVolume', 'askVolume', 'impVolatility', 'openInterest')
+CANDLE_COLUMNS = {
+    'sequence': 'Sequence', 'count': 'Count', 'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close',
+    'volume': 'Volume', 'vwap': 'VWAP', 'bidVolume': 'BidVolume', 'askVolume': 'AskVolume',
+    'impVolatility': 'ImpVolatility', 'openInterest': 'OpenInterest',
+}
+
+# Every event of one type from one message, one list per field
+class ColumnBatch():
+    def __init__(self, event_type, fields, columns):
+        self.event_type = event_type
+        self.fields = fields
+        self.columns = dict(zip(fields, columns))
+
+    def __len__(self):
+        first = next(iter(self.columns.values()), ())
+        return len(first)
+
+    def column(self, name):
+        return self.columns.get(name, [None] * len(self))
+
+    # 'NaN' strings and None become nan
+    def floats(self, name):
+        values = self.column(name)
+        try:
+            return np.array(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            return np.array([_float(value) for value in values], dtype=np.float64)
+
+    # Epoch nanoseconds of a time field, epoch millis and 'YYYYMMDD-HHMMSS.mmm-TZ' strings both decode in one call
+    def times_ns(self, name):
+        values = self.column(name)
+        numeric = np.asarray(values)
+        if numeric.dtype.kind in 'iuf':
+            return numeric.astype(np.int64) * 1_000_000
+        return parse_timestamps_ns(values)
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+class FeedDecoder():
+    def __init__(self, schemas=SCHEMAS):
+        self.schemas = {event_type: tuple(fields) for event_type, fields in schemas.items()}
+
+    # FEED_CONFIG tells the actual field order ({'eventFields': {'Candle': [...]}}), it replaces the default
+    def configure(self, message):
+        for event_type, fields in (message.get('eventFields') or {}).items():
+            self.schemas[event_type] = tuple(fields)
+            logger.debug(f" FeedDecoder | configure | Event: {event_type} | Fields: {len(fields)}")
+
+    # Raw websocket message -> {event type: ColumnBatch}, empty for anything that is not FEED_DATA
+    def decode(self, raw):
+        message = _loads(raw)
+        if not isinstance(message, dict):
+            return {}
+        kind = message.get('type')
+        if kind == 'FEED_CONFIG':
+            self.configure(message)
+            return {}
+        if kind != 'FEED_DATA':
+            return {}
+        return self.decode_data(message.get('data') or [])
+
+    def decode_data(self, data):
+        batches = {}
+        if not data:
+            return batches
+        if isinstance(data[0], str):
+            # COMPACT: ['Candle', [e1f1, e1f2, ..., e2f1, ...], 'Quote', [...]], every event flattened in field order
+            for event_type, values in zip(data[0::2], data[1::2]):
+                fields = self.schemas.get(event_type)
+                if fields is None or not values:
+                    continue
+                width = len(fields)
+                if len(values) % width:
+                    logger.warning(f" FeedDecoder | decode | Event: {event_type} | Note: {len(values)} values is not a multiple of {width}, tail dropped")
+                    values = values[:len(values) - len(values) % width]
+                # Stride slices pull each column out of the flat array without touching single events
+                self._extend(batches, event_type, fields, [values[i::width] for i in range(width)])
+        else:
+            # One list per event: [['Candle', [fields...]], ...]
+            rows = {}
+            for event in data:
+                if len(event) < 2:
+                    continue
+                rows.setdefault(event[0], []).append(event[1])
+            for event_type, events in rows.items():
+                fields = self.schemas.get(event_type)
+                if fields is None:
+                    continue
+                required = REQUIRED.get(event_type, len(fields))
+                complete = [row for row in events if len(row) >= required]
+                if len(complete) < len(events):
+                    logger.warning(f" FeedDecoder | decode | Event: {event_type} | Note: {len(events) - len(complete)} incomplete events dropped")
+                if not complete:
+                    continue
+                # Pad short rows (trailing optional fields) and cut extras so every column has one value per event
+                width = len(fields)
+                complete = [row[:width] if len(row) >= width else list(row) + [None] * (width - len(row)) for row in complete]
+                self._extend(batches, event_type, fields, list(zip(*complete)))
+        return batches
+
+    def _extend(self, batches, event_type, fields, columns):
+        batch = batches.get(event_type)
+        if batch is None:
+            batches[event_type] = ColumnBatch(event_type, fields, [list(column) for column in columns])
+            return
+        for name, column in zip(fields, columns):
+            batch.columns.setdefault(name, []).extend(column)
+
+# Candle batch -> CandleRecords keyed like Data.stream_candle_data ('/ES{=5m}' stored as '/ES', bar start time as EventTime)
+def candle_records(batch):
+    symbols = [symbol.split('{', 1)[0] for symbol in batch.column('eventSymbol')]
+    times = batch.times_ns('time')
+    values = {}
+    for field, column in CANDLE_COLUMNS.items():
+        if field in FLOAT_FIELDS:
+            values[column] = [None if np.isnan(value) else float(value) for value in batch.floats(field)]
+        else:
+            values[column] = batch.column(field)
+    flags = batch.column('eventFlags')
+    records = []
+    for i, (symbol, time_ns) in enumerate(zip(symbols, times)):
+        if time_ns == INVALID_NS:
+            logger.warning(f" FeedDecoder | candle_records | Symbol: {symbol} | Note: Unparseable bar time, dropped")
+            continue
+        record = CandleRecord(symbol, ns_to_datetime(time_ns), **{column: column_values[i] for column, column_values in values.items()})
+        record.EventFlags = int(flags[i] or 0)
+        records.append(record)
+    return records
@@ -0,0 +1,219 @@
+# indicators.py
+# indicators.py holds incremental indicators (SMA, EMA, rolling min / max / standard deviation) that update in O(1) per bar for any number of lengths and symbols.
+import logging
+import math
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+RESUM_EVERY = 1000 # Commits between exact re-sums of running totals, keeps float drift from adding / removing bounded
+
+# Every indicator splits its window into committed (closed) bars and the one forming bar.
+# update(value) with new_bar=False replaces the forming bar, with new_bar=True the forming bar is committed first.
+# Repeats of the forming bar (DXLink re-sends it until it closes) therefore never double count.
+class _Indicator():
+    def __init__(self, length):
+        if length < 1:
+            raise ValueError(f"Indicator length must be at least 1, got {length}")
+        self.length = length
+        self.forming = None
+        self.count = 0 # Committed bars seen
+
+    def update(self, value, new_bar=True):
+        if new_bar and self.forming is not None:
+            self.count += 1
+            self._commit(self.forming)
+        self.forming = value
+        return self.value
+
+    # Warm-up from history, oldest first: everything but the last value is committed, the last one is the forming bar
+    def warm_up(self, values):
+        values = [value for value in values if value is not None and not math.isnan(value)]
+        if not values:
+            return self.value
+        for value in values[:-1]:
+            self.count += 1
+            self._commit(value)
+        self.forming = values[-1]
+        return self.value
+
+    @property
+    def ready(self):
+        return self.forming is not None and self.count + 1 >= self.length
+
+    def _commit(self, value):
+        raise NotImplementedError
+
+# Running sum over the last length - 1 closed bars, plus the forming bar
+class SMA(_Indicator):
+    def __init__(self, length):
+        super().__init__(length)
+        self.window = deque()
+        self.total = 0.0
+
+    def _commit(self, value):
+        self.window.append(value)
+        self.total += value
+        if len(self.window) >= self.length:
+            self.total -= self.window.popleft()
+        if self.count % RESUM_EVERY == 0:
+            self.total = math.fsum(self.window)
+
+    @property
+    def value(self):
+        if not self.ready:
+            return None
+        return (self.total + self.forming) / self.length
+
+# Exponential moving average seeded with the first bar (pandas ewm(adjust=False)), None until length bars are in
+class EMA(_Indicator):
+    def __init__(self, length):
+        super().__init__(length)
+        self.alpha = 2.0 / (length + 1)
+        self.average = None # EMA over the closed bars
+
+    def _commit(self, value):
+        self.average = value if self.average is None else self.average + self.alpha * (value - self.average)
+
+    @property
+    def value(self):
+        if not self.ready:
+            return None
+        if self.average is None:
+            return self.forming
+        return self.average + self.alpha * (self.forming - self.average)
+
+# Sample standard deviation from running sums, shifted by the first value seen to avoid catastrophic cancellation
+class RollingStd(_Indicator):
+    def __init__(self, length, ddof=1):
+        super().__init__(length)
+        self.ddof = ddof
+        self.window = deque()
+        self.shift = None
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def _commit(self, value):
+        if self.shift is None:
+            self.shift = value
+        value -= self.shift
+        self.window.append(value)
+        self.total += value
+        self.total_sq += value * value
+        if len(self.window) >= self.length:
+            old = self.window.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+        if self.count % RESUM_EVERY == 0:
+            self.total = math.fsum(self.window)
+            self.total_sq = math.fsum(value * value for value in self.window)
+
+    @property
+    def value(self):
+        if not self.ready or self.length - self.ddof <= 0:
+            return None
+        forming = self.forming - (self.shift if self.shift is not None else self.forming)
+        total = self.total + forming
+        total_sq = self.total_sq + forming * forming
+        variance = (total_sq - total * total / self.length) / (self.length - self.ddof)
+        return math.sqrt(max(variance, 0.0))
+
+# Monotonic deque of (bar number, value): the front is always the extreme of the closed part of the window
+class _RollingExtreme(_Indicator):
+    def __init__(self, length):
+        super().__init__(length)
+        self.extremes = deque()
+
+    def _better(self, a, b):
+        raise NotImplementedError
+
+    def _commit(self, value):
+        while self.extremes and not self._better(self.extremes[-1][1], value):
+            self.extremes.pop()
+        self.extremes.append((self.count, value))
+        # Closed bars older than the last length - 1 fall out of the window
+        while self.extremes and self.extremes[0][0] <= self.count - (self.length - 1):
+            self.extremes.popleft()
+
+    @property
+    def value(self):
+        if not self.ready:
+            return None
+        if not self.extremes:
+            return self.forming
+        front = self.extremes[0][1]
+        return front if self._better(front, self.forming) else self.forming
+
+class RollingMin(_RollingExtreme):
+    def _better(self, a, b):
+        return a < b
+
+class RollingMax(_RollingExtreme):
+    def _better(self, a, b):
+        return a > b
+
+INDICATORS = {
+    'sma': SMA,
+    'ema': EMA,
+    'std': RollingStd,
+    'min': RollingMin,
+    'max': RollingMax,
+}
+
+# Every configured indicator for every symbol, fed one candle at a time
+# IndicatorSet({'sma': [10, 20, 50], 'ema': [9, 21], 'std': [20], 'min': [20], 'max': [20]})
+# values come back keyed 'sma_10', 'ema_21', ... and stay None while an indicator is still warming up.
+class IndicatorSet():
+    def __init__(self, spec, column='Close'):
+        unknown = set(spec) - set(INDICATORS)
+        if unknown:
+            raise ValueError(f"Unknown indicators {sorted(unknown)}, expected any of {sorted(INDICATORS)}")
+        self.spec = {kind: sorted(set(lengths)) for kind, lengths in spec.items()}
+        self.column = column
+        self.indicators = {} # symbol -> {name: indicator}
+        self.last_time = {} # symbol -> EventTime of the forming bar
+
+    def _symbol(self, symbol):
+        indicators = self.indicators.get(symbol)
+        if indicators is None:
+            indicators = self.indicators[symbol] = {
+                f"{kind}_{length}": INDICATORS[kind](length)
+                for kind, lengths in self.spec.items()
+                for length in lengths
+            }
+        return indicators
+
+    # One candle, returns every value of the symbol. Late updates to already closed bars are ignored.
+    def update(self, candle):
+        symbol = candle['EventSymbol']
+        value = candle[self.column]
+        event_time = candle['EventTime']
+        last_time = self.last_time.get(symbol)
+        if value is None or math.isnan(value) or (last_time is not None and event_time < last_time):
+            return self.values(symbol)
+        new_bar = last_time is None or event_time > last_time
+        self.last_time[symbol] = event_time
+        return {name: indicator.update(value, new_bar) for name, indicator in self._symbol(symbol).items()}
+
+    # Warm-up from history (CandleRecords or a DataFrame sorted by EventTime), replaces any previous state of the symbol
+    def warm_up(self, symbol, history):
+        if hasattr(history, 'columns'):
+            values = history[self.column].astype(float).tolist()
+            times = history['EventTime'].tolist()
+        else:
+            values = [candle[self.column] for candle in history]
+            times = [candle['EventTime'] for candle in history]
+        self.indicators.pop(symbol, None)
+        self.last_time.pop(symbol, None)
+        if times:
+            self.last_time[symbol] = times[-1]
+        values = {name: indicator.warm_up(values) for name, indicator in self._symbol(symbol).items()}
+        logger.debug(f" IndicatorSet | warm_up | Symbol: {symbol} | Bars: {len(times)}")
+        return values
+
+    def values(self, symbol):
+        return {name: indicator.value for name, indicator in self._symbol(symbol).items()}
+
+    def value(self, symbol, name):
+        indicator = self._symbol(symbol).get(name)
+        return indicator.value if indicator is not None else None
@@ -0,0 +1,107 @@
+# ingest_queue.py
+# ingest_queue.py is the bounded hand off between the feed and the database writer, so a slow database can never grow memory without limit.
+import asyncio
+import time
+from collections import deque
+
+POLICIES = ('block', 'drop_oldest', 'coalesce')
+
+def candle_key(row):
+    return (row['EventSymbol'], row['EventTime'])
+
+# Bounded FIFO of rows with an explicit overflow policy:
+#   block       -> put() waits until the writer frees space (backpressure into the feed)
+#   drop_oldest -> the oldest queued row is discarded to make room
+#   coalesce    -> a row whose candle key is already queued replaces it in place, new candles block when full
+class IngestQueue():
+    def __init__(self, maxsize, policy='block', key=candle_key):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy '{policy}', expected one of {POLICIES}")
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.key = key
+        self.entries = deque() # [enqueued_at, row]
+        self.index = {} # candle key -> entry, coalesce policy only
+        self.space = asyncio.Event()
+        self.space.set()
+
+        # Gauges
+        self.dropped = 0
+        self.coalesced = 0
+        self.blocked = 0
+        self.high_water = 0
+        self.last_batch_lag = 0.0
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def depth(self):
+        return len(self.entries)
+
+    # Seconds the oldest queued row has been waiting for the writer
+    @property
+    def lag(self):
+        if not self.entries:
+            return 0.0
+        return time.monotonic() - self.entries[0][0]
+
+    def gauges(self):
+        return {
+            'depth': self.depth,
+            'maxsize': self.maxsize,
+            'high_water': self.high_water,
+            'lag': round(self.lag, 3),
+            'last_batch_lag': round(self.last_batch_lag, 3),
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'blocked': self.blocked,
+        }
+
+    async def put(self, row):
+        if self.policy == 'coalesce':
+            entry = self.index.get(self.key(row))
+            if entry is not None:
+                entry[1] = row
+                self.coalesced += 1
+                return
+        while len(self.entries) >= self.maxsize:
+            if self.policy == 'drop_oldest':
+                self._popleft()
+                self.dropped += 1
+            else:
+                self.blocked += 1
+                self.space.clear()
+                await self.space.wait()
+                # Another row may have been coalesced or queued while waiting, re-check the key
+                if self.policy == 'coalesce':
+                    entry = self.index.get(self.key(row))
+                    if entry is not None:
+                        entry[1] = row
+                        self.coalesced += 1
+                        return
+        entry = [time.monotonic(), row]
+        self.entries.append(entry)
+        if self.policy == 'coalesce':
+            self.index[self.key(row)] = entry
+        if len(self.entries) > self.high_water:
+            self.high_water = len(self.entries)
+
+    # Pops up to 'size' rows without waiting, oldest first
+    def get_batch(self, size):
+        if not self.entries:
+            return []
+        self.last_batch_lag = self.lag
+        batch = []
+        while self.entries and len(batch) < size:
+            batch.append(self._popleft())
+        self.space.set()
+        return batch
+
+    def _popleft(self):
+        enqueued_at, row = self.entries.popleft()
+        if self.policy == 'coalesce':
+            self.index.pop(self.key(row), None)
+        return row
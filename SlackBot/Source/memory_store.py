@@ -0,0 +1,36 @@
+# memory_store.py
+# memory_store.py keeps candles in memory behind the same interface as the other stores, a replayed session runs against it without touching the database or the disk.
+import logging
+import pandas as pd
+from SlackBot.Source.candle import CANDLE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Same add/flush/close/read interface as ParquetStore, the latest row of a (symbol, EventTime) wins like the upsert does
+class MemoryStore():
+    def __init__(self, flush_size=500):
+        self.flush_size = flush_size
+        self.rows = {} # symbol -> {EventTime: row}
+
+    async def add(self, rows):
+        for row in rows:
+            self.rows.setdefault(row['EventSymbol'], {})[row['EventTime']] = row
+
+    async def flush(self):
+        pass
+
+    async def close(self):
+        logger.debug(f" MemoryStore | close | Symbols: {len(self.rows)} | Rows: {sum(len(rows) for rows in self.rows.values())}")
+
+    # Reads the latest 'limit' candles and/or a time range for a symbol, oldest first
+    def read(self, symbol, limit=None, start_time=None, end_time=None, columns=None):
+        columns = list(columns) if columns is not None else list(CANDLE_COLUMNS)
+        if 'EventTime' not in columns:
+            columns = ['EventTime'] + columns
+        rows = [
+            row for event_time, row in sorted(self.rows.get(symbol, {}).items(), key=lambda item: item[0])
+            if (start_time is None or event_time >= start_time) and (end_time is None or event_time <= end_time)
+        ]
+        if limit is not None:
+            rows = rows[-limit:] if limit else []
+        return pd.DataFrame.from_records([[row.get(column) for column in columns] for row in rows], columns=columns)
@@ -0,0 +1,132 @@
+# naked_vpoc.py
+# naked_vpoc.py indexes every finished session's VPOC by price and retires the ones a bar trades through, so the untested (naked) VPOCs are always at hand and survive restarts.
+import json
+import logging
+import math
+import os
+from bisect import bisect_left, bisect_right
+from datetime import date as Date, datetime
+from SlackBot.Source.sessions import trading_date, session_of
+
+logger = logging.getLogger(__name__)
+
+# ------------------ Configuration ------------------ #
+
+NAKED_VPOC_PATH = os.getenv('NAKED_VPOC_PATH', 'naked_vpocs.json') # Where the index is kept between runs
+
+# --------------------------------------------------- #
+
+# The overnight session of a trading date finishes (at the RTH open) before its RTH session does
+SESSION_ORDER = {'ETH': 0, 'RTH': 1}
+
+# Naked VPOCs of every symbol, kept sorted by price so a bar's [low, high] finds the ones it touches with two
+# bisects: O(log n + k) for k retired instead of testing every VPOC on every bar.
+# A VPOC joins when its session finishes (the first bar of the next session) and is tested from that bar on.
+class NakedVPOCIndex():
+    def __init__(self, path=NAKED_VPOC_PATH):
+        self.path = path
+        self.prices = {} # symbol -> sorted VPOC prices
+        self.entries = {} # symbol -> (trading date, session) per price, same order
+        self.latest = {} # symbol -> (trading date, session) of the newest VPOC added
+        self.sessions = {} # symbol -> (trading date, session) of the last bar seen
+        self.checked = {} # symbol -> EventTime of the last bar tested, earlier bars (replayed history) are skipped
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f" NakedVPOCIndex | load | Path: {self.path} | Error: {e} | Note: Starting from an empty index")
+            return
+        for symbol, saved in state.items():
+            vpocs = sorted((price, date, session) for price, date, session in saved['vpocs'])
+            self.prices[symbol] = [price for price, _, _ in vpocs]
+            self.entries[symbol] = [(date, session) for _, date, session in vpocs]
+            self.latest[symbol] = tuple(saved['latest']) if saved.get('latest') else None
+            self.sessions[symbol] = tuple(saved['session']) if saved.get('session') else None
+            self.checked[symbol] = datetime.fromisoformat(saved['checked']) if saved.get('checked') else None
+        logger.info(f" NakedVPOCIndex | load | Symbols: {len(state)} | VPOCs: {sum(len(p) for p in self.prices.values())}")
+
+    # Writes the index if anything changed since the last save
+    def save(self):
+        if not self.dirty:
+            return
+        state = {}
+        for symbol in set(self.prices) | set(self.checked):
+            checked = self.checked.get(symbol)
+            state[symbol] = {
+                'vpocs': [[price, date, session] for price, (date, session) in zip(self.prices.get(symbol, []), self.entries.get(symbol, []))],
+                'latest': self.latest.get(symbol),
+                'session': self.sessions.get(symbol),
+                'checked': checked.isoformat() if checked is not None else None,
+            }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def add(self, symbol, date, session, vpoc):
+        if vpoc is None:
+            return False
+        key = (date.isoformat(), session)
+        latest = self.latest.get(symbol)
+        if latest is not None and (key[0], SESSION_ORDER[key[1]]) <= (latest[0], SESSION_ORDER[latest[1]]):
+            return False # Already added (e.g. the overnight VPOC again when the date rolls)
+        prices = self.prices.setdefault(symbol, [])
+        entries = self.entries.setdefault(symbol, [])
+        i = bisect_right(prices, vpoc)
+        prices.insert(i, vpoc)
+        entries.insert(i, key)
+        self.latest[symbol] = key
+        self.dirty = True
+        return True
+
+    # Retires every VPOC inside [low, high], returns them as [(price, date, session)]
+    def touch(self, symbol, low, high):
+        prices = self.prices.get(symbol)
+        if not prices:
+            return []
+        i, j = bisect_left(prices, low), bisect_right(prices, high)
+        if i == j:
+            return []
+        touched = [(price, date, session) for price, (date, session) in zip(prices[i:j], self.entries[symbol][i:j])]
+        del prices[i:j]
+        del self.entries[symbol][i:j]
+        self.dirty = True
+        return touched
+
+    # One candle: a change of session adds the finished session's VPOC (from SessionProfiles), then the bar's
+    # range retires what it touched. Returns the retired VPOCs.
+    def update(self, candle, profiles):
+        symbol, event_time = candle['EventSymbol'], candle['EventTime']
+        low, high = candle['Low'], candle['High']
+        checked = self.checked.get(symbol)
+        if low is None or high is None or math.isnan(low) or math.isnan(high) or (checked is not None and event_time < checked):
+            return []
+        key = (trading_date(event_time).isoformat(), session_of(symbol, event_time))
+        previous = self.sessions.get(symbol)
+        if previous != key:
+            if previous is not None:
+                date, session = Date.fromisoformat(previous[0]), previous[1]
+                profile = profiles.get_date(symbol, date, session)
+                if profile is not None and self.add(symbol, date, session, profile.vpoc):
+                    logger.debug(f" NakedVPOCIndex | add | Symbol: {symbol} | Date: {date} | Session: {session} | VPOC: {profile.vpoc}")
+            self.sessions[symbol] = key
+            self.dirty = True
+        self.checked[symbol] = event_time
+        return self.touch(symbol, min(low, high), max(low, high))
+
+    # Naked VPOCs of a symbol newest first as [(date, session, price)], 'since' (a date) limits the lookback
+    def naked(self, symbol, since=None, session=None):
+        since = since.isoformat() if since is not None else None
+        vpocs = [
+            (Date.fromisoformat(date), entry_session, price)
+            for price, (date, entry_session) in zip(self.prices.get(symbol, []), self.entries.get(symbol, []))
+            if (since is None or date >= since) and (session is None or entry_session == session)
+        ]
+        return sorted(vpocs, key=lambda vpoc: (vpoc[0], SESSION_ORDER[vpoc[1]]), reverse=True)
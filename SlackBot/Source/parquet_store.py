@@ -0,0 +1,204 @@
+# parquet_store.py
+# parquet_store.py is a columnar alternative to the candle_data table, candles are kept in Parquet files partitioned by symbol and trading date.
+import asyncio
+import logging
+import os
+import threading
+import time
+import pandas as pd
+from datetime import datetime, timezone
+from SlackBot.Source.sessions import trading_date
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# ------------------ Configuration ------------------ #
+
+PARQUET_ROOT = os.getenv('PARQUET_ROOT', 'candle_store') # Root directory of the store (put it on the SSD)
+FLUSH_SIZE = int(os.getenv('PARQUET_FLUSH_SIZE', 5000)) # Rows buffered before a file is written
+FLUSH_INTERVAL = float(os.getenv('PARQUET_FLUSH_INTERVAL', 300)) # Max seconds a row waits in the buffer
+
+# --------------------------------------------------- #
+
+# Same add/flush/close interface as BulkWriter so Data can swap one for the other
+class ParquetStore():
+    def __init__(self, root=PARQUET_ROOT, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL):
+        if pa is None:
+            raise ImportError("pyarrow is required for the parquet backend (pip install pyarrow)")
+        self.root = root
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.lock = asyncio.Lock()
+        self.files_lock = threading.Lock() # Writes, reads and compaction of partition files (worker and scheduler threads)
+        self.timer_task = None
+        self.last_flush = time.monotonic()
+        self.open_dates = {} # symbol -> latest trading date written, older partitions are compacted once it moves on
+        os.makedirs(self.root, exist_ok=True)
+
+    async def add(self, rows):
+        if not rows:
+            return
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.flush_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            try:
+                await self.flush()
+                return
+            except Exception:
+                pass # Logged in flush, the rows stay buffered for the timer to retry
+        # A quiet symbol's rows still go out within flush_interval
+        if self.timer_task is None or self.timer_task.done():
+            self.timer_task = asyncio.create_task(self._flush_timer())
+
+    async def flush(self):
+        async with self.lock:
+            if not self.buffer:
+                return
+            rows, self.buffer = self.buffer, []
+            try:
+                await asyncio.to_thread(self.write_rows, rows)
+            except Exception as e:
+                logger.error(f" ParquetStore | flush | Rows: {len(rows)} | Error: {e}")
+                # Back in front of anything that arrived meanwhile, a partially written batch is rewritten
+                # and the duplicates collapse on read (the newest file wins)
+                self.buffer[:0] = rows
+                raise
+            self.last_flush = time.monotonic()
+
+    # A flush the timer is running finishes before the timer is stopped
+    async def close(self):
+        if self.timer_task is not None:
+            timer_task, self.timer_task = self.timer_task, None
+            async with self.lock:
+                timer_task.cancel()
+            await asyncio.gather(timer_task, return_exceptions=True)
+        await self.flush()
+
+    async def _flush_timer(self):
+        while self.buffer:
+            wait = self.flush_interval - (time.monotonic() - self.last_flush)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                await self.flush()
+            except Exception:
+                # Already logged in flush, back off a full interval before retrying
+                await asyncio.sleep(self.flush_interval)
+
+    # Appends one file per touched partition, files are named by write time so later writes win on read.
+    # When a symbol's trading date rolls over, the finished day's partition is compacted into one file.
+    def write_rows(self, rows):
+        partitions = {}
+        for row in rows:
+            partitions.setdefault((row['EventSymbol'], trading_date(row['EventTime'])), []).append(row)
+        finished = []
+        with self.files_lock:
+            for (symbol, date), part in partitions.items():
+                path = self._partition_path(symbol, date)
+                os.makedirs(path, exist_ok=True)
+                columns = list(part[0].keys())
+                table = pa.Table.from_pydict({column: [row.get(column) for row in part] for column in columns})
+                pq.write_table(table, os.path.join(path, f"part-{time.time_ns()}.parquet"))
+                open_date = self.open_dates.get(symbol)
+                if open_date is None or date > open_date:
+                    if open_date is not None:
+                        finished.append((symbol, open_date))
+                    self.open_dates[symbol] = date
+        logger.debug(f" ParquetStore | write | Rows: {len(rows)} | Partitions: {len(partitions)}")
+        for symbol, date in finished:
+            self.compact(symbol, date)
+
+    # Reads the latest 'limit' candles and/or a time range for a symbol, only the requested columns are loaded
+    def read(self, symbol, limit=None, start_time=None, end_time=None, columns=None):
+        if columns is not None and 'EventTime' not in columns:
+            columns = ['EventTime'] + list(columns)
+        dates = self._dates(symbol)
+        if start_time is not None:
+            dates = [d for d in dates if d >= trading_date(start_time).isoformat()]
+        if end_time is not None:
+            dates = [d for d in dates if d <= trading_date(end_time).isoformat()]
+
+        # Walk partitions newest first and stop as soon as enough rows are loaded
+        frames = []
+        rows = 0
+        for date in reversed(dates):
+            df = self._read_partition(symbol, date, columns)
+            frames.append(df)
+            rows += len(df)
+            if limit is not None and start_time is None and rows >= limit:
+                break
+        if not frames:
+            return pd.DataFrame(columns=columns)
+
+        df = pd.concat(reversed(frames), ignore_index=True)
+        if start_time is not None:
+            df = df[df['EventTime'] >= start_time]
+        if end_time is not None:
+            df = df[df['EventTime'] <= end_time]
+        df = df.sort_values('EventTime')
+        if limit is not None:
+            df = df.tail(limit)
+        return df.reset_index(drop=True)
+
+    # Rewrites a partition as a single de-duplicated file
+    def compact(self, symbol, date):
+        self._compact_path(self._partition_path(symbol, date))
+
+    # Compacts every partition of a finished trading date (all but today's), run by the daily maintenance job
+    def compact_finished(self, now=None):
+        today = trading_date(now or datetime.now(timezone.utc)).isoformat()
+        compacted = 0
+        for symbol_dir in os.listdir(self.root):
+            symbol_path = os.path.join(self.root, symbol_dir)
+            if not symbol_dir.startswith('symbol=') or not os.path.isdir(symbol_path):
+                continue
+            for date_dir in os.listdir(symbol_path):
+                if date_dir.startswith('date=') and date_dir.split('=', 1)[1] < today:
+                    compacted += self._compact_path(os.path.join(symbol_path, date_dir))
+        logger.info(f" ParquetStore | compact_finished | Partitions: {compacted}")
+        return compacted
+
+    def _compact_path(self, path):
+        with self.files_lock:
+            files = self._files(path) if os.path.isdir(path) else []
+            if len(files) < 2:
+                return 0
+            df = self._read_files(files)
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), os.path.join(path, f"part-{time.time_ns()}.parquet"))
+            for file in files:
+                os.remove(file)
+            return 1
+
+    def _read_partition(self, symbol, date, columns=None):
+        path = os.path.join(self._symbol_path(symbol), f"date={date}")
+        with self.files_lock:
+            return self._read_files(self._files(path), columns)
+
+    @staticmethod
+    def _read_files(files, columns=None):
+        frames = [pq.read_table(file, columns=columns, memory_map=True).to_pandas() for file in files]
+        df = pd.concat(frames, ignore_index=True)
+        # Snapshots and the final bar share an EventTime, the newest file holds the final state
+        return df.drop_duplicates('EventTime', keep='last')
+
+    def _symbol_path(self, symbol):
+        return os.path.join(self.root, f"symbol={symbol.strip('/')}")
+
+    def _partition_path(self, symbol, date):
+        return os.path.join(self._symbol_path(symbol), f"date={date.isoformat()}")
+
+    def _dates(self, symbol):
+        path = self._symbol_path(symbol)
+        if not os.path.isdir(path):
+            return []
+        return sorted(name.split('=', 1)[1] for name in os.listdir(path) if name.startswith('date='))
+
+    @staticmethod
+    def _files(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.parquet'))
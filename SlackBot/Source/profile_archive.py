@@ -0,0 +1,174 @@
+# profile_archive.py
+# profile_archive.py persists every finished session's volume profile as running (prefix) sums on one aligned tick grid, so a composite over any range of days is a single row subtraction.
+import json
+import logging
+import os
+from bisect import bisect_left, bisect_right
+from datetime import date as Date
+import numpy as np
+from SlackBot.Source.constant import tick_sizes
+from SlackBot.Source.volume_profile import PADDING, VolumeProfile
+
+logger = logging.getLogger(__name__)
+
+# ------------------ Configuration ------------------ #
+
+PROFILE_ARCHIVE = os.getenv('PROFILE_ARCHIVE', 'profile_archive') # Root directory of the archive
+RESIDUE = 1e-6 # Volume left over by subtracting two large running sums, treated as nothing traded
+
+# --------------------------------------------------- #
+
+COLUMNS = ('volume', 'buy', 'sell')
+SESSIONS = ('RTH', 'ETH')
+
+# One symbol and session. Row i of each column file is the sum of the first i archived days
+# (row 0 is all zeros), days are appended in trading date order as float64 rows of 'width' ticks
+# starting at tick 'base'. meta.json is written last, so a crash mid append only leaves a tail
+# of bytes that the next load cuts off.
+class ArchivedSessions():
+    def __init__(self, path, tick_size):
+        self.path = path
+        self.tick_size = tick_size
+        self.base = None
+        self.width = 0
+        self.dates = [] # ISO trading dates, oldest first
+        self.columns = {} # name -> memmap of shape (len(dates) + 1, width)
+        self._load()
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    def _load(self):
+        meta_path = os.path.join(self.path, 'meta.json')
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.tick_size = meta['tick_size']
+        self.base = meta['base']
+        self.width = meta['width']
+        self.dates = meta['dates']
+        row_bytes = self.width * 8
+        for name in COLUMNS:
+            with open(self._file(name), 'r+b') as f:
+                f.truncate((len(self.dates) + 1) * row_bytes)
+        self._map()
+
+    def _map(self):
+        self.columns = {
+            name: np.memmap(self._file(name), dtype=np.float64, mode='r', shape=(len(self.dates) + 1, self.width))
+            for name in COLUMNS
+        }
+
+    def _write_meta(self):
+        meta = {'tick_size': self.tick_size, 'base': self.base, 'width': self.width, 'dates': self.dates}
+        tmp_path = os.path.join(self.path, 'meta.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(self.path, 'meta.json'))
+
+    # Appends one finished day, days at or before the last archived one are ignored (already in)
+    def append(self, date, profile):
+        date = date.isoformat()
+        if self.dates and date <= self.dates[-1]:
+            return False
+        os.makedirs(self.path, exist_ok=True)
+        if profile is not None and profile.base is not None:
+            self._cover(profile.base, profile.base + len(profile.volume))
+        elif self.base is None:
+            return False # Nothing traded and nothing to line it up with yet
+        for name in COLUMNS:
+            row = self.columns[name][-1].copy() if self.dates else np.zeros(self.width)
+            if profile is not None and profile.base is not None:
+                start = profile.base - self.base
+                row[start:start + len(profile.volume)] += getattr(profile, name)
+            with open(self._file(name), 'ab') as f:
+                if not self.dates:
+                    f.write(np.zeros(self.width).tobytes()) # Row 0
+                f.write(row.tobytes())
+        self.dates.append(date)
+        self._write_meta()
+        self._map()
+        return True
+
+    # Widens the grid to hold ticks [low, high), running sums of earlier days are just padded with zeros
+    def _cover(self, low, high):
+        if self.base is None:
+            self.base = low - PADDING
+            self.width = high - low + 2 * PADDING
+            return
+        if low >= self.base and high <= self.base + self.width:
+            return
+        new_base = min(self.base, low - PADDING)
+        new_width = max(self.base + self.width, high + PADDING) - new_base
+        offset = self.base - new_base
+        logger.info(f" ArchivedSessions | regrid | Path: {self.path} | Ticks: {self.width} -> {new_width}")
+        for name in COLUMNS:
+            old = np.array(self.columns[name]) if self.dates else np.zeros((0, self.width))
+            grown = np.zeros((len(old), new_width))
+            grown[:, offset:offset + self.width] = old
+            tmp_path = f"{self._file(name)}.tmp"
+            grown.tofile(tmp_path)
+            os.replace(tmp_path, self._file(name))
+        self.base, self.width = new_base, new_width
+        if self.dates:
+            self._write_meta()
+            self._map()
+
+    # Row range [i, j) of the days from start to end (ISO dates, both inclusive)
+    def span(self, start=None, end=None):
+        i = 0 if start is None else bisect_left(self.dates, start)
+        j = len(self.dates) if end is None else bisect_right(self.dates, end)
+        return i, max(i, j)
+
+    # Composite of days [i, j): row j minus row i, O(width) however many days it covers
+    def composite(self, i, j):
+        if self.base is None or i >= j:
+            return None
+        arrays = []
+        for name in COLUMNS:
+            column = self.columns[name]
+            values = column[j] - column[i]
+            values[values < RESIDUE] = 0.0
+            arrays.append(values)
+        return VolumeProfile.from_arrays(self.tick_size, self.base, *arrays)
+
+# Every symbol's archived RTH and ETH sessions under root/symbol=ES/session=RTH/
+class ProfileArchive():
+    def __init__(self, root=PROFILE_ARCHIVE, tick_sizes=tick_sizes):
+        self.root = root
+        self.tick_sizes = tick_sizes
+        self.sessions = {} # (symbol, session) -> ArchivedSessions
+
+    def sessions_of(self, symbol, session):
+        key = (symbol, session)
+        archived = self.sessions.get(key)
+        if archived is None:
+            path = os.path.join(self.root, f"symbol={symbol.strip('/')}", f"session={session}")
+            archived = self.sessions[key] = ArchivedSessions(path, self.tick_sizes.get(symbol, 0.01))
+        return archived
+
+    # Archives a finished trading date out of SessionProfiles (both sessions)
+    def add(self, symbol, date, profiles):
+        for session in SESSIONS:
+            if self.sessions_of(symbol, session).append(date, profiles.get_date(symbol, date, session)):
+                logger.debug(f" ProfileArchive | add | Symbol: {symbol} | Date: {date} | Session: {session}")
+
+    def dates(self, symbol, session='RTH'):
+        return [Date.fromisoformat(date) for date in self.sessions_of(symbol, session).dates]
+
+    # Composite of the archived days from start to end (dates, inclusive), or of the last 'days' archived days.
+    # session 'RTH', 'ETH' or 'DAY' (both added up). None when no archived day is in range.
+    def composite(self, symbol, start=None, end=None, days=None, session='DAY'):
+        parts = []
+        for name in (SESSIONS if session == 'DAY' else (session,)):
+            archived = self.sessions_of(symbol, name)
+            if days is not None:
+                i, j = max(len(archived.dates) - days, 0), len(archived.dates)
+            else:
+                i, j = archived.span(start.isoformat() if start else None, end.isoformat() if end else None)
+            parts.append(archived.composite(i, j))
+        parts = [part for part in parts if part is not None]
+        if not parts:
+            return None
+        return parts[0] if len(parts) == 1 else VolumeProfile.merged(parts, self.tick_sizes.get(symbol, 0.01))
@@ -1,49 +1,54 @@
-import pandas as pd
-from sqlalchemy import create_engine
-import time
-import os
-from dotenv import load_dotenv
-load_dotenv()
-
-# Database configuration
-DB_USER = os.getenv('DB_USER')
-DB_PASSWORD = os.getenv('DB_PASSWORD')  
-DB_HOST = os.getenv('DB_HOST')
-DB_PORT = os.getenv('DB_PORT')
-DB_NAME = os.getenv('DB_NAME')
-
-# Create SQLAlchemy engine
-engine = create_engine(
-    f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
-)
+import asyncio
+import logging
+from datetime import datetime, timezone
+from SlackBot.Source import db
+from SlackBot.Source.db import engine
+from SlackBot.Source.bus import pg_listen
+from SlackBot.Source.candle import frame_to_records
+from SlackBot.Source.indicators import IndicatorSet
+
+RECONNECT_DELAY = 5  # Seconds before listening again after the connection drops
+WARM_UP_BARS = 200  # History read once to warm the indicators up
 
 
 def fetch_latest_candles(symbol, limit=1000):
-    query = f"""
-    SELECT * FROM candle_data
-    WHERE EventSymbol = '{symbol}'
-    ORDER BY EventTime DESC
-    LIMIT {limit};
-    """
-    df = pd.read_sql(query, engine)
-    df = df.sort_values('EventTime')  # Ensure data is sorted by time
-    return df
-
-def calculate_moving_average(df, window=10):
-    df['Moving_Avg_10'] = df['Close'].rolling(window=window).mean()
-    return df
-
-def main():
-    symbol = 'IBM{=d}'  # Replace with your desired symbol
+    return db.latest_candles(symbol, limit)  # Sorted by time
+
+def fetch_range(symbol, start_time, end_time):
+    return db.range_candles(symbol, start_time, end_time)  # Sorted by time
+
+async def main():
+    symbol = '/ES'  # Replace with your desired symbol
+    indicators = IndicatorSet({'sma': [10]})
+    # One read to warm up, after that every new or updated bar is pushed by the ingestion side and updates in O(1)
+    df = await asyncio.to_thread(fetch_latest_candles, symbol, WARM_UP_BARS)
+    indicators.warm_up(symbol, df)
+
+    # Runs every time LISTEN is (re)established: bars stored since the last one seen were never notified to us
+    async def catch_up():
+        last_time = indicators.last_time.get(symbol)
+        if last_time is None:
+            return
+        if last_time.tzinfo is None:
+            last_time = last_time.replace(tzinfo=timezone.utc)  # Naive timestamps are stored as UTC
+        missed = await asyncio.to_thread(fetch_range, symbol, last_time, datetime.now(timezone.utc))
+        for candle in frame_to_records(missed):
+            indicators.update(candle)
+        logging.info(f"Caught up {len(missed)} bars for {symbol} since {last_time}")
+
     while True:
-        df = fetch_latest_candles(symbol, 1000)
-        df_with_ma = calculate_moving_average(df, 10)
-        latest_entry = df_with_ma.iloc[-1]
-        print(f"Time: {latest_entry['EventTime']}, Close: {latest_entry['Close']}, 10-MA: {latest_entry['Moving_Avg_10']}")
-        time.sleep(5)  # Wait for 5 seconds before fetching new data
+        try:
+            async for candle in pg_listen(engine, on_listen=catch_up):
+                if candle['EventSymbol'] != symbol:
+                    continue
+                values = indicators.update(candle)
+                print(f"Time: {candle['EventTime']}, Close: {candle['Close']}, 10-MA: {values['sma_10']}")
+        except Exception as e:
+            logging.error(f"Bar notifications interrupted: {e}")
+        await asyncio.sleep(RECONNECT_DELAY)
 
 if __name__ == "__main__":
     try:
-        main()
+        asyncio.run(main())
     except KeyboardInterrupt:
         print("Real-time calculations stopped by user.")
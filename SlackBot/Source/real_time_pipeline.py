@@ -1,25 +1,27 @@
 import asyncio
+import random
+import time
 import websockets
 import json
-import pandas as pd
-from sqlalchemy import create_engine
-from datetime import datetime
-from collections import deque
+from datetime import datetime, timedelta, timezone
 import logging
 from dotenv import load_dotenv
 import os
+from SlackBot.Source.ingest_queue import IngestQueue
+from SlackBot.Source.coalescer import CandleCoalescer
+from SlackBot.Source.writer import BulkWriter
+from SlackBot.Source.decoder import FeedDecoder, candle_records
+from SlackBot.Source.constant import symbols
+from SlackBot.Source.spool import Spool, SPOOL_DIR
+from SlackBot.Source.schema import ensure_schema
+from SlackBot.Source.bus import bus, notify_postgres
+from SlackBot.Source import db
+from SlackBot.Source.db import engine
 
 load_dotenv()
 
 # ------------------ Configuration ------------------ #
 
-# Database configuration
-DB_USER = os.getenv('DB_USER')
-DB_PASSWORD = os.getenv('DB_PASSWORD')  
-DB_HOST = os.getenv('DB_HOST')
-DB_PORT = os.getenv('DB_PORT')
-DB_NAME = os.getenv('DB_NAME')
-
 # WebSocket configuration
 WS_URL = 'wss://api.tastytrade.com/stream'  # Replace with actual WebSocket URL
 API_KEY = 'YOUR_API_KEY'  # Replace with your actual API key
@@ -28,6 +30,17 @@ API_KEY = 'YOUR_API_KEY'  # Replace with your actual API key
 BATCH_SIZE = 500  # Number of records per batch insert
 BATCH_INTERVAL = 30  # Seconds between batch inserts
 
+# Queue configuration
+MAX_QUEUE_SIZE = int(os.getenv('MAX_QUEUE_SIZE', 20000))  # Rows held in memory before the overflow policy kicks in
+QUEUE_POLICY = os.getenv('QUEUE_POLICY', 'block')  # 'block', 'drop_oldest' or 'coalesce'
+BATCH_READY = min(BATCH_SIZE, MAX_QUEUE_SIZE)  # Depth that wakes the inserter early, a queue smaller than a batch still gets drained
+
+# Reconnect configuration
+RECONNECT_BASE_DELAY = 1  # Seconds before the first reconnect attempt
+RECONNECT_MAX_DELAY = 60  # Backoff cap, a connection that stayed up this long resets the backoff
+CANDLE_INTERVAL = os.getenv('CANDLE_INTERVAL', '5m')  # Interval used to backfill gaps
+GAP_MAX_LOOKBACK = timedelta(days=int(os.getenv('GAP_MAX_LOOKBACK_DAYS', 7)))  # Never backfill further back than this
+
 # Logging configuration
 logging.basicConfig(
     filename='data_ingestion.log',
@@ -37,133 +50,138 @@ logging.basicConfig(
 
 # --------------------------------------------------- #
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}',
-    pool_size=20,
-    max_overflow=0
-)
+# Bounded queue between the feed and the database, keyed by candle for the coalesce policy
+data_queue = IngestQueue(MAX_QUEUE_SIZE, policy=QUEUE_POLICY)
 
-# Initialize a deque to store incoming data
-data_queue = deque()
+# Keeps the forming bar per symbol, only finalized bars and periodic snapshots reach the queue
+coalescer = CandleCoalescer()
 
-async def parse_timestamp(ts_str):
-    """
-    Parses timestamp strings into datetime objects.
-    Format: 'YYYYMMDD-HHMMSS.mmm-TZ'
-    Example: '20210506-200000.000-0400'
-    """
-    try:
-        return datetime.strptime(ts_str, '%Y%m%d-%H%M%S.%f%z')
-    except ValueError as e:
-        logging.error(f"Timestamp parsing error: {e} for {ts_str}")
-        return None
+# COPY + ON CONFLICT upsert so a snapshot and the final bar land on the same row
+writer = BulkWriter(engine, table='candle_data', key=('EventSymbol', 'EventTime'), manage_table=False)
+
+# Set once a full batch is waiting so the inserter does not sit out the whole interval
+batch_ready = asyncio.Event()
+
+# Write-ahead spool, batches stay on disk until the database confirms them
+spool = Spool(os.path.join(SPOOL_DIR, 'pipeline'))
 
-async def process_candle(candle_data):
+# Schema driven FEED_DATA decoder, follows the field order FEED_CONFIG announces
+decoder = FeedDecoder()
+
+# Latest bar time received per symbol, where a gap starts if the connection drops
+last_seen = {}
+
+# Running gap backfill (at most one) and the Backfill engine it uses, created on first need
+gap_task = None
+gap_backfill = None
+
+async def process_candle(row):
     """
-    Parses a single candle entry and appends it to the queue.
+    Hands one decoded candle (a CandleRecord from the FEED_DATA decoder) to the coalescer, finalized bars are appended to the queue.
     """
-    if candle_data[0] != 'Candle':
-        return  # Ignore non-candle data
-
-    fields = candle_data[1]
-    if len(fields) < 15:
-        logging.warning(f"Incomplete candle data: {fields}")
-        return  # Incomplete data
-
-    # Extract fields
-    event_symbol = fields[0]
-    event_time_str = fields[1]
-    time_str = fields[2]
-    sequence = fields[3]
-    count = fields[4]
-    open_price = fields[5]
-    high_price = fields[6]
-    low_price = fields[7]
-    close_price = fields[8]
-    volume = fields[9]
-    vwap = fields[10]
-    bid_volume = fields[11]
-    ask_volume = fields[12]
-    imp_volatility = fields[13]
-    open_interest = fields[14] if len(fields) > 14 else None
-    event_flags = fields[15] if len(fields) > 15 else None
-
-    # Parse timestamps
-    event_time = await parse_timestamp(event_time_str)
-    time = await parse_timestamp(time_str)
-
-    # Handle 'NaN' strings by converting them to None
-    open_interest = float(open_interest) if open_interest not in (None, 'NaN') else None
-
-    # Create a dictionary for the row
-    row = {
-        'EventSymbol': event_symbol,
-        'EventTime': event_time,
-        'Time': time,
-        'Sequence': sequence,
-        'Count': count,
-        'Open': open_price,
-        'High': high_price,
-        'Low': low_price,
-        'Close': close_price,
-        'Volume': volume,
-        'VWAP': vwap,
-        'BidVolume': bid_volume,
-        'AskVolume': ask_volume,
-        'ImpVolatility': imp_volatility,
-        'OpenInterest': open_interest,
-        'EventFlags': event_flags
-    }
+    event_symbol = row.EventSymbol
+    if row.EventTime is not None and (event_symbol not in last_seen or row.EventTime > last_seen[event_symbol]):
+        last_seen[event_symbol] = row.EventTime
 
-    # Append to queue
-    data_queue.append(row)
+    # Push the update to subscribers right away (and on to other processes via NOTIFY)
+    bus.publish(row)
 
-    # Log the event
-    logging.info(f"Queued candle for {event_symbol} at {event_time}")
+    # Append finalized bars to queue, waits here under the 'block' policy while the queue is full
+    for finalized in coalescer.update(row):
+        await data_queue.put(finalized)
+        logging.info(f"Queued candle for {event_symbol} at {finalized.EventTime}")
 
     # Check if batch size is reached
-    if len(data_queue) >= BATCH_SIZE:
-        await insert_batch()
+    if data_queue.depth >= BATCH_READY:
+        batch_ready.set()
 
-async def insert_batch():
+async def insert_batch(extra=()):
     """
-    Inserts a batch of candles from the queue into the database.
+    Inserts a batch of candles from the queue (plus 'extra' rows, e.g. forming bar snapshots) into the database.
+    The batch is spooled to disk first, so a failed insert (or a crash) leaves it in the spool for replay
+    instead of in memory. Older spooled batches are always written before newer ones.
+    Returns False if the database write failed.
     """
-    if not data_queue:
-        return
-
-    # Convert deque to list and then to DataFrame
-    data_list = list(data_queue)
-    df = pd.DataFrame(data_list)
-    data_queue.clear()
+    batch = data_queue.get_batch(BATCH_SIZE) + list(extra)
+    if not batch and not spool.pending:
+        return True
 
-    # Handle missing data
-    df['OpenInterest'] = pd.to_numeric(df['OpenInterest'], errors='coerce')
-    df['EventFlags'] = df['EventFlags'].fillna('')
-
-    # Insert into PostgreSQL
+    # Upsert into PostgreSQL
     try:
-        df.to_sql('candle_data', engine, if_exists='append', index=False, method='multi')
-        logging.info(f"Inserted batch of {len(df)} candles into the database.")
+        await asyncio.to_thread(spool.write_through, batch, writer.write_rows)
+        logging.info(f"Inserted batch of {len(batch)} candles into the database. Queue: {data_queue.gauges()}")
+        return True
     except Exception as e:
-        logging.error(f"Error inserting batch into database: {e}")
-        # Re-queue the data for retry
-        for _, row in df.iterrows():
-            data_queue.append(row.to_dict())
+        logging.error(f"Error inserting batch into database: {e}. Spooled segments: {len(spool.pending)}. Queue: {data_queue.gauges()}")
+        return False
 
 async def batch_inserter():
     """
-    Periodically inserts batches of data into the database.
+    Inserts batches of data into the database every interval, or as soon as a full batch is queued.
     """
     while True:
-        await asyncio.sleep(BATCH_INTERVAL)
-        await insert_batch()
+        try:
+            await asyncio.wait_for(batch_ready.wait(), timeout=BATCH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        batch_ready.clear()
+        # Snapshots go straight into this batch, the inserter is the queue's only consumer and must never wait on it
+        snapshots = coalescer.snapshot() if coalescer.snapshot_due() else []
+        healthy = await insert_batch(snapshots)
+        # Keep draining while a backlog remains, straight to disk while the database is failing
+        while data_queue.depth >= BATCH_READY:
+            if healthy:
+                healthy = await insert_batch()
+            else:
+                await asyncio.to_thread(spool.append, data_queue.get_batch(BATCH_SIZE))
+
+def last_stored_times():
+    """
+    Returns the latest stored EventTime per symbol.
+    """
+    # Naive timestamps are stored as UTC
+    return {
+        symbol: event_time if event_time.tzinfo else event_time.replace(tzinfo=timezone.utc)
+        for symbol, event_time in db.last_timestamps().items()
+    }
+
+async def backfill_gaps(seen):
+    """
+    Fetches only the bars missed while disconnected, from the latest known bar of each symbol up to now.
+    'seen' is last_seen as it was before reconnecting, live bars arriving meanwhile must not move the gap start.
+    The upsert writer makes any overlap with live bars harmless.
+    """
+    global gap_backfill
+    try:
+        stored = await asyncio.to_thread(last_stored_times)
+    except Exception as e:
+        logging.error(f"Could not read last stored candle times: {e}")
+        stored = {}
+    if gap_backfill is None:
+        from SlackBot.Source.data import Data
+        from SlackBot.Source.backfill import Backfill
+        gap_backfill = Backfill(Data(), interval=CANDLE_INTERVAL, checkpoint_path=None)
+
+    now = datetime.now(timezone.utc)
+    for symbol in symbols:
+        start = seen.get(symbol) or stored.get(symbol)
+        if start is None:
+            continue
+        start = max(start, now - GAP_MAX_LOOKBACK)
+        logging.info(f"Backfilling {symbol} from {start} to {now}")
+        try:
+            count = await gap_backfill.run([symbol], start, now)
+            logging.info(f"Backfilled {count} candles for {symbol}")
+        except Exception as e:
+            logging.error(f"Gap backfill failed for {symbol}: {e}")
 
 async def listen():
     """
-    Connects to the WebSocket and listens for incoming candle data.
+    Connects to the WebSocket and listens for incoming candle data until the connection closes.
     """
+    global gap_task
+    # Where each symbol's gap starts, taken before the new connection delivers any bar
+    seen = dict(last_seen)
     async with websockets.connect(WS_URL) as websocket:
         # Authenticate if required
         auth_message = {
@@ -173,32 +191,63 @@ async def listen():
         await websocket.send(json.dumps(auth_message))
         logging.info("Sent authentication message.")
 
-        # Start the batch inserter task
-        asyncio.create_task(batch_inserter())
+        # Fill whatever was missed while disconnected, without holding up the live feed
+        if gap_task is None or gap_task.done():
+            gap_task = asyncio.create_task(backfill_gaps(seen))
 
         while True:
             try:
                 message = await websocket.recv()
-                data = json.loads(message)
 
-                # Process only FEED_DATA type messages
-                if data.get('type') == 'FEED_DATA':
-                    events = data.get('data', [])
-                    if events and isinstance(events, list):
-                        for candle in events:
-                            await process_candle(candle)
+                # One parse per message, every event of a type lands in one columnar batch (FEED_DATA only)
+                batches = decoder.decode(message)
+                candles = batches.get('Candle')
+                if candles is not None:
+                    for row in candle_records(candles):
+                        await process_candle(row)
 
             except websockets.exceptions.ConnectionClosed:
-                logging.warning("WebSocket connection closed. Attempting to reconnect in 5 seconds...")
-                await asyncio.sleep(5)
-                asyncio.create_task(listen())
-                break
+                logging.warning("WebSocket connection closed.")
+                return
             except Exception as e:
                 logging.error(f"Error processing message: {e}")
 
+async def run():
+    """
+    Supervises the feed: one long lived batch inserter, and listen() restarted with exponential backoff.
+    Every bar update is forwarded to Postgres NOTIFY so consumers in other processes do not poll the table.
+    """
+    inserter = asyncio.create_task(batch_inserter())
+    notify_postgres(engine)
+    delay = RECONNECT_BASE_DELAY
+    try:
+        while True:
+            # Table, indexes and this month's partitions (cheap when they already exist)
+            try:
+                await asyncio.to_thread(ensure_schema, engine)
+            except Exception as e:
+                logging.error(f"Could not ensure the candle_data schema: {e}")
+            # Replay whatever is spooled (from a previous run or an outage) before new bars go in
+            if spool.pending:
+                await insert_batch()
+            connected_at = time.monotonic()
+            try:
+                await listen()
+            except (OSError, websockets.exceptions.WebSocketException) as e:
+                logging.error(f"WebSocket connection failed: {e}")
+            if time.monotonic() - connected_at >= RECONNECT_MAX_DELAY:
+                delay = RECONNECT_BASE_DELAY
+            wait = delay + random.uniform(0, delay / 2)
+            logging.warning(f"Reconnecting in {wait:.1f} seconds...")
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+    finally:
+        inserter.cancel()
+        await insert_batch()
+
 # Entry point
 if __name__ == "__main__":
     try:
-        asyncio.get_event_loop().run_until_complete(listen())
+        asyncio.run(run())
     except KeyboardInterrupt:
         logging.info("Data ingestion stopped by user.")
@@ -0,0 +1,126 @@
+# replay.py
+# replay.py records the raw candle events seen by Data.stream_candle_data to a compact binary log and plays a session back offline.
+import asyncio
+import logging
+import math
+import struct
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from SlackBot.Source.candle import CandleRecord
+
+logger = logging.getLogger(__name__)
+
+# File layout: MAGIC, then one record per event
+#   <qH  receive time (ns since epoch), symbol length
+#   symbol (utf-8)
+#   <qqiq10di  time (ms), index, sequence, count, volume, vwap, bid volume, ask volume, implied volatility,
+#              open interest, open, high, low, close (missing values stored as NaN), event flags
+# Version 1 logs (<qqi11d, count as a double and no event flags) are still read.
+MAGIC = b'DXCANDLE\x02'
+MAGIC_V1 = b'DXCANDLE\x01'
+_HEAD = struct.Struct('<qH')
+_BODY = struct.Struct('<qqiq10di')
+_BODY_V1 = struct.Struct('<qqi11d')
+
+def _float(value):
+    return math.nan if value is None else float(value)
+
+class CandleRecorder():
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a+b')
+        self.file.seek(0)
+        magic = self.file.read(len(MAGIC))
+        if not magic:
+            self.file.write(MAGIC)
+        elif magic != MAGIC:
+            self.file.close()
+            raise ValueError(f"{path} is not a version {MAGIC[-1]} candle event log, record to a new file")
+        self.count = 0
+
+    # Appends one raw Candle event, symbol is the routed (base) symbol
+    def write(self, symbol, event, recv_ns=None):
+        encoded = symbol.encode('utf-8')
+        self.file.write(_HEAD.pack(recv_ns or time.time_ns(), len(encoded)))
+        self.file.write(encoded)
+        self.file.write(_BODY.pack(
+            int(event.time),
+            int(event.index),
+            int(event.sequence),
+            int(event.count),
+            _float(event.volume),
+            _float(event.vwap),
+            _float(event.bid_volume),
+            _float(event.ask_volume),
+            _float(event.imp_volatility),
+            _float(event.open_interest),
+            _float(event.open),
+            _float(event.high),
+            _float(event.low),
+            _float(event.close),
+            int(getattr(event, 'event_flags', 0) or 0),
+        ))
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+        logger.info(f" CandleRecorder | close | Path: {self.path} | Events: {self.count}")
+
+# Yields (recv_ns, CandleRecord) for every record in a log. Records are rebuilt through CandleRecord.from_event,
+# the same conversion the live stream uses, so a replayed record equals the one the live run saw.
+def read_log(path):
+    with open(path, 'rb') as f:
+        magic = f.read(len(MAGIC))
+        if magic not in (MAGIC, MAGIC_V1):
+            raise ValueError(f"{path} is not a candle event log")
+        body_struct = _BODY if magic == MAGIC else _BODY_V1
+        while True:
+            head = f.read(_HEAD.size)
+            if len(head) < _HEAD.size:
+                return
+            recv_ns, symbol_len = _HEAD.unpack(head)
+            symbol = f.read(symbol_len).decode('utf-8')
+            body = f.read(body_struct.size)
+            if len(body) < body_struct.size:
+                logger.warning(f" read_log | Path: {path} | Note: Truncated final record ignored")
+                return
+            values = body_struct.unpack(body)
+            if body_struct is _BODY_V1:
+                count = values[3]
+                values = values[:3] + (None if math.isnan(count) else int(count),) + values[4:] + (0,)
+            (event_time, index, sequence, count, volume, vwap, bid_volume, ask_volume,
+             imp_volatility, open_interest, open_price, high, low, close, event_flags) = values
+            event = SimpleNamespace(
+                time=event_time, index=index, sequence=sequence, count=count, volume=volume, vwap=vwap,
+                bid_volume=bid_volume, ask_volume=ask_volume, imp_volatility=imp_volatility,
+                open_interest=open_interest, open=open_price, high=high, low=low, close=close, event_flags=event_flags,
+            )
+            yield recv_ns, CandleRecord.from_event(symbol, event, datetime.fromtimestamp(event_time / 1000, tz=timezone.utc))
+
+# Drop in replacement for Data as an event source: same stream_candle_data async generator.
+# speed=1 plays back in real time, speed=N N times faster, speed=None as fast as possible.
+class CandleReplay():
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+
+    async def stream_candle_data(self, symbols, period=None):
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        wanted = set(symbols)
+        first_recv = None
+        started = time.monotonic()
+        for recv_ns, candle in read_log(self.path):
+            if candle.EventSymbol not in wanted:
+                continue
+            if self.speed:
+                if first_recv is None:
+                    first_recv = recv_ns
+                delay = (recv_ns - first_recv) / 1e9 / self.speed - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                # Unthrottled, still hand control back to the loop now and then
+                await asyncio.sleep(0)
+            yield candle
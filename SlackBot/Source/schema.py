@@ -0,0 +1,210 @@
+# schema.py
+# schema.py owns the candle_data DDL: a table range partitioned by month on EventTime, its indexes, partition creation and retention, plus the volume_at_price table.
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+# ------------------ Configuration ------------------ #
+
+PARTITIONS_AHEAD = int(os.getenv('CANDLE_PARTITIONS_AHEAD', 2)) # Future months kept ready
+RETENTION_MONTHS = int(os.getenv('CANDLE_RETENTION_MONTHS', 0)) # Months of history kept, 0 keeps everything
+
+# --------------------------------------------------- #
+
+TABLE = 'candle_data'
+
+CANDLE_TABLE_DDL = f'''
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    "EventSymbol"   TEXT             NOT NULL,
+    "EventTime"     TIMESTAMPTZ      NOT NULL,
+    "Index"         BIGINT,
+    "Sequence"      INTEGER,
+    "Count"         DOUBLE PRECISION,
+    "Volume"        DOUBLE PRECISION,
+    "VWAP"          DOUBLE PRECISION,
+    "BidVolume"     DOUBLE PRECISION,
+    "AskVolume"     DOUBLE PRECISION,
+    "ImpVolatility" DOUBLE PRECISION,
+    "OpenInterest"  DOUBLE PRECISION,
+    "Open"          DOUBLE PRECISION,
+    "High"          DOUBLE PRECISION,
+    "Low"           DOUBLE PRECISION,
+    "Close"         DOUBLE PRECISION,
+    "EventFlags"    INTEGER          DEFAULT 0,
+    PRIMARY KEY ("EventSymbol", "EventTime")
+) PARTITION BY RANGE ("EventTime")
+'''
+
+# Latest-N and range reads walk this backwards per symbol and never touch the heap for OHLCV
+CANDLE_INDEX_DDL = f'''
+CREATE INDEX IF NOT EXISTS {TABLE}_symbol_time_desc
+    ON {TABLE} ("EventSymbol", "EventTime" DESC)
+    INCLUDE ("Open", "High", "Low", "Close", "Volume")
+'''
+
+# Per price aggregates of the time and sales feed (raw prints are never stored), upserted as levels change
+VOLUME_AT_PRICE_DDL = '''
+CREATE TABLE IF NOT EXISTS volume_at_price (
+    "EventSymbol" TEXT             NOT NULL,
+    "TradeDate"   DATE             NOT NULL,
+    "Session"     TEXT             NOT NULL,
+    "Price"       DOUBLE PRECISION NOT NULL,
+    "Volume"      DOUBLE PRECISION NOT NULL DEFAULT 0,
+    "BuyVolume"   DOUBLE PRECISION NOT NULL DEFAULT 0,
+    "SellVolume"  DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY ("EventSymbol", "TradeDate", "Session", "Price")
+)
+'''
+
+MIGRATIONS_DDL = '''
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    name       TEXT PRIMARY KEY,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+'''
+
+# Catches rows outside every monthly partition (far history, clock skew) instead of failing their whole batch
+DEFAULT_PARTITION_DDL = f'CREATE TABLE IF NOT EXISTS {TABLE}_default PARTITION OF {TABLE} DEFAULT'
+
+PARTITION_NAME = re.compile(rf'^{TABLE}_y(\d{{4}})m(\d{{2}})$')
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+def partition_name(month):
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+# Creates the partitioned table (migrating a legacy to_sql table if there is one), volume_at_price and the partitions around now
+def ensure_schema(engine, now=None):
+    now = now or datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        connection.execute(text(MIGRATIONS_DDL))
+        applied = {row[0] for row in connection.execute(text('SELECT name FROM schema_migrations'))}
+        if '001_partitioned_candle_data' not in applied:
+            _migrate_partitioned(connection, now)
+            connection.execute(text("INSERT INTO schema_migrations (name) VALUES ('001_partitioned_candle_data')"))
+        if '002_integer_event_flags' not in applied:
+            _migrate_event_flags(connection)
+            connection.execute(text("INSERT INTO schema_migrations (name) VALUES ('002_integer_event_flags')"))
+        connection.execute(text(DEFAULT_PARTITION_DDL))
+        connection.execute(text(VOLUME_AT_PRICE_DDL))
+    ensure_partitions(engine, _add_months(_month_start(now), -1), _add_months(_month_start(now), PARTITIONS_AHEAD))
+    if RETENTION_MONTHS > 0:
+        drop_expired(engine, RETENTION_MONTHS, now)
+
+# Monthly partitions covering [start_time, end_time]
+def ensure_partitions(engine, start_time, end_time):
+    month = _month_start(start_time)
+    last = _month_start(end_time)
+    with engine.begin() as connection:
+        while month <= last:
+            _create_partition(connection, month)
+            month = _add_months(month, 1)
+
+# Drops whole partitions that ended before the retention window
+def drop_expired(engine, retention_months, now=None):
+    cutoff = _add_months(_month_start(now or datetime.now(timezone.utc)), -retention_months)
+    with engine.begin() as connection:
+        for name in _partitions(connection):
+            match = PARTITION_NAME.match(name)
+            if match is None:
+                continue
+            month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+            if _add_months(month, 1) <= cutoff:
+                connection.execute(text(f'DROP TABLE IF EXISTS {name}'))
+                logger.info(f" Schema | drop_expired | Partition: {name}")
+
+# Rows of the month already sitting in the default partition are moved into the new one,
+# Postgres refuses to create a partition whose range the default partition holds rows of.
+def _create_partition(connection, month):
+    name = partition_name(month)
+    if connection.execute(text('SELECT to_regclass(:name)'), {'name': name}).scalar() is not None:
+        return
+    upper = _add_months(month, 1)
+    bounds = {'lower': month, 'upper': upper}
+    in_month = '"EventTime" >= :lower AND "EventTime" < :upper'
+    stranded = False
+    if connection.execute(text('SELECT to_regclass(:name)'), {'name': f'{TABLE}_default'}).scalar() is not None:
+        stranded = connection.execute(text(f'SELECT EXISTS (SELECT 1 FROM {TABLE}_default WHERE {in_month})'), bounds).scalar()
+    if stranded:
+        connection.execute(text(f'CREATE TEMP TABLE {TABLE}_stranded ON COMMIT DROP AS SELECT * FROM {TABLE}_default WHERE {in_month}'), bounds)
+        connection.execute(text(f'DELETE FROM {TABLE}_default WHERE {in_month}'), bounds)
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+    ))
+    if stranded:
+        connection.execute(text(f'INSERT INTO {TABLE} SELECT * FROM {TABLE}_stranded'))
+        connection.execute(text(f'DROP TABLE {TABLE}_stranded'))
+        logger.info(f" Schema | create_partition | Partition: {name} | Note: Moved its rows out of {TABLE}_default")
+
+def _partitions(connection):
+    rows = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+        "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+        "WHERE parent.relname = :table"
+    ), {'table': TABLE})
+    return [row[0] for row in rows]
+
+# A candle_data created implicitly by pandas to_sql is renamed to candle_data_legacy and copied across.
+# Duplicates of a (symbol, time) keep the row with the most volume, i.e. the final bar rather than an
+# earlier snapshot of it forming. The legacy table is left in place to be dropped by hand.
+def _migrate_partitioned(connection, now):
+    legacy_columns = None
+    if inspect(connection).has_table(TABLE):
+        partitioned = connection.execute(text(
+            "SELECT count(*) FROM pg_partitioned_table JOIN pg_class ON partrelid = pg_class.oid WHERE relname = :table"
+        ), {'table': TABLE}).scalar()
+        if partitioned:
+            return
+        legacy_columns = [column['name'] for column in inspect(connection).get_columns(TABLE)]
+        connection.execute(text(f'ALTER TABLE {TABLE} RENAME TO {TABLE}_legacy'))
+        logger.warning(f" Schema | migrate | Note: Renamed unpartitioned {TABLE} to {TABLE}_legacy")
+
+    connection.execute(text(CANDLE_TABLE_DDL))
+    connection.execute(text(CANDLE_INDEX_DDL))
+    connection.execute(text(DEFAULT_PARTITION_DDL))
+    if legacy_columns is None:
+        return
+
+    first, last = connection.execute(text(f'SELECT min("EventTime"), max("EventTime") FROM {TABLE}_legacy')).one()
+    if first is None:
+        return
+    month = _month_start(first)
+    while month <= _month_start(last):
+        _create_partition(connection, month)
+        month = _add_months(month, 1)
+    columns = [column for column in inspect(connection).get_columns(TABLE) if column['name'] in legacy_columns]
+    column_list = ', '.join(f'"{column["name"]}"' for column in columns)
+    completeness = '"Volume" DESC NULLS LAST' if 'Volume' in legacy_columns else '"EventTime"'
+    connection.execute(text(
+        f'INSERT INTO {TABLE} ({column_list}) '
+        f'SELECT DISTINCT ON ("EventSymbol", "EventTime") {column_list} FROM {TABLE}_legacy '
+        f'WHERE "EventSymbol" IS NOT NULL AND "EventTime" IS NOT NULL '
+        f'ORDER BY "EventSymbol", "EventTime", {completeness}'
+    ))
+    logger.info(f" Schema | migrate | Note: Copied {TABLE}_legacy into the partitioned {TABLE}")
+
+# EventFlags was TEXT holding '' for no flags and the snapshot bits as digits, records now carry it as an int
+def _migrate_event_flags(connection):
+    column_type = connection.execute(text(
+        "SELECT data_type FROM information_schema.columns WHERE table_name = :table AND column_name = 'EventFlags'"
+    ), {'table': TABLE}).scalar()
+    if column_type != 'text':
+        return
+    connection.execute(text(f'ALTER TABLE {TABLE} ALTER COLUMN "EventFlags" DROP DEFAULT'))
+    connection.execute(text(
+        f'ALTER TABLE {TABLE} ALTER COLUMN "EventFlags" TYPE INTEGER '
+        f'USING COALESCE(NULLIF("EventFlags", \'\'), \'0\')::integer'
+    ))
+    connection.execute(text(f'ALTER TABLE {TABLE} ALTER COLUMN "EventFlags" SET DEFAULT 0'))
+    logger.info(f" Schema | migrate | Note: {TABLE}.EventFlags is now INTEGER")
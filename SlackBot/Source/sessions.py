@@ -0,0 +1,76 @@
+# sessions.py
+# sessions.py is the session calendar: trading dates, RTH / ETH windows per product and the anchor periods (week, month, quarter, year) studies reset on.
+from datetime import datetime, time as clock, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+EST = ZoneInfo('America/New_York')
+SESSION_OPEN_HOUR = 18 # Futures trading days start at 18:00 ET the evening before
+
+# Regular trading hours per product, everything else in the trading day is the overnight (ETH) session
+RTH_HOURS = {
+    '/ES': (clock(9, 30), clock(16, 0)),
+    '/NQ': (clock(9, 30), clock(16, 0)),
+    '/RTY': (clock(9, 30), clock(16, 0)),
+    '/CL': (clock(9, 0), clock(14, 30)),
+}
+
+ANCHORS = ('rth', 'eth', 'week', 'month', 'quarter', 'year')
+
+# 18:00 ET rolls the date forward, so Sunday evening trades belong to Monday
+def trading_date(event_time):
+    return (event_time.astimezone(EST) + timedelta(hours=24 - SESSION_OPEN_HOUR)).date()
+
+# 18:00 ET on the evening before the trading date, as UTC
+def session_open(date):
+    local = datetime(date.year, date.month, date.day, SESSION_OPEN_HOUR, tzinfo=EST) - timedelta(days=1)
+    return local.astimezone(timezone.utc)
+
+# RTH open and close of a trading date, as UTC
+def rth_window(symbol, date):
+    start, end = RTH_HOURS.get(symbol, RTH_HOURS['/ES'])
+    return (
+        datetime.combine(date, start, tzinfo=EST).astimezone(timezone.utc),
+        datetime.combine(date, end, tzinfo=EST).astimezone(timezone.utc),
+    )
+
+def is_rth(symbol, event_time):
+    start, end = RTH_HOURS.get(symbol, RTH_HOURS['/ES'])
+    return start <= event_time.astimezone(EST).time() < end
+
+def session_of(symbol, event_time):
+    return 'RTH' if is_rth(symbol, event_time) else 'ETH'
+
+# Identifies the anchor period a bar falls in, a change of key means the anchor starts over.
+# 'rth' is None outside regular hours (nothing accumulates there), 'eth' is the whole 18:00 - 17:00 trading day.
+def anchor_key(anchor, symbol, event_time):
+    date = trading_date(event_time)
+    if anchor == 'rth':
+        return date if is_rth(symbol, event_time) else None
+    if anchor == 'eth':
+        return date
+    if anchor == 'week':
+        return date.isocalendar()[:2]
+    if anchor == 'month':
+        return (date.year, date.month)
+    if anchor == 'quarter':
+        return (date.year, (date.month - 1) // 3 + 1)
+    if anchor == 'year':
+        return date.year
+    raise ValueError(f"Unknown anchor '{anchor}', expected one of {ANCHORS}")
+
+# Earliest time a bar of the current period of 'anchor' can have, used to size history reads
+def anchor_start(anchor, symbol, event_time):
+    date = trading_date(event_time)
+    if anchor == 'rth':
+        return rth_window(symbol, date)[0]
+    if anchor == 'eth':
+        return session_open(date)
+    if anchor == 'week':
+        return session_open(date - timedelta(days=date.weekday()))
+    if anchor == 'month':
+        return session_open(date.replace(day=1))
+    if anchor == 'quarter':
+        return session_open(date.replace(month=(date.month - 1) // 3 * 3 + 1, day=1))
+    if anchor == 'year':
+        return session_open(date.replace(month=1, day=1))
+    raise ValueError(f"Unknown anchor '{anchor}', expected one of {ANCHORS}")
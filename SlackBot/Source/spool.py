@@ -0,0 +1,150 @@
+# spool.py
+# spool.py is an append only on disk write-ahead spool, every batch lands here before the database and is deleted once the database has it.
+import fcntl
+import logging
+import os
+import pickle
+import struct
+import zlib
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# ------------------ Configuration ------------------ #
+
+SPOOL_DIR = os.getenv('SPOOL_DIR', 'spool') # Parent directory, each writer gets its own sub directory
+SPOOL_FSYNC = os.getenv('SPOOL_FSYNC', '1') == '1' # fsync every segment (survives power loss, costs a disk flush per batch)
+
+# --------------------------------------------------- #
+
+# Segment layout: MAGIC, <II payload length and crc32, pickled list of rows
+MAGIC = b'SPOOL\x00\x00\x01'
+_HEADER = struct.Struct('<II')
+
+# Errors that mean the database could not be reached, the segment itself is fine and is retried as is.
+# Matched by class name so the spool does not depend on a driver (psycopg2 and SQLAlchemy share these names).
+CONNECTION_ERRORS = {'OperationalError', 'InterfaceError', 'DisconnectionError', 'TimeoutError'}
+
+def is_connection_error(error):
+    if isinstance(error, (OSError, ConnectionError)):
+        return True
+    return any(cls.__name__ in CONNECTION_ERRORS for cls in type(error).__mro__)
+
+# Several processes may share a directory (the gap backfill's Data opens the same spool as main.py's), every
+# operation holds an flock on <directory>/.lock and re-reads the directory instead of trusting its own listing.
+class Spool():
+    def __init__(self, directory, fsync=SPOOL_FSYNC):
+        self.directory = directory
+        self.quarantine = os.path.join(directory, 'quarantine')
+        self.lock_path = os.path.join(directory, '.lock')
+        self.fsync = fsync
+        self.sequence = 0
+        os.makedirs(directory, exist_ok=True)
+        with self._locked():
+            for name in os.listdir(directory):
+                if name.endswith('.tmp'):
+                    # Appends rename under the lock, a temp file here was still in memory when its writer went down
+                    os.remove(os.path.join(directory, name))
+            self._scan()
+        if self.pending:
+            logger.warning(f" Spool | init | Directory: {directory} | Note: {len(self.pending)} segments waiting for replay")
+
+    @contextmanager
+    def _locked(self):
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # Pending segments as they are on disk, including ones other processes wrote (call with the lock held)
+    def _scan(self):
+        self.pending = sorted(
+            os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.seg')
+        )
+        if self.pending:
+            self.sequence = max(self.sequence, int(os.path.basename(self.pending[-1])[:-4]) + 1)
+
+    # Writes a batch as a new segment, written to a temp name and renamed so a segment is either complete or absent
+    def append(self, rows):
+        if not rows:
+            return None
+        payload = pickle.dumps(list(rows), protocol=pickle.HIGHEST_PROTOCOL)
+        with self._locked():
+            self._scan()
+            path = os.path.join(self.directory, f"{self.sequence:012d}.seg")
+            self.sequence += 1
+            with open(f"{path}.tmp", 'wb') as f:
+                f.write(MAGIC)
+                f.write(_HEADER.pack(len(payload), zlib.crc32(payload)))
+                f.write(payload)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(f"{path}.tmp", path)
+            self.pending.append(path)
+        return path
+
+    # Rows of a segment, None if it fails its checksum (the file is set aside as .bad)
+    def read(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        header_end = len(MAGIC) + _HEADER.size
+        if data[:len(MAGIC)] == MAGIC and len(data) >= header_end:
+            length, checksum = _HEADER.unpack(data[len(MAGIC):header_end])
+            payload = data[header_end:]
+            if len(payload) == length and zlib.crc32(payload) == checksum:
+                return pickle.loads(payload)
+        logger.error(f" Spool | read | Segment: {path} | Note: Checksum mismatch, moved aside")
+        os.replace(path, f"{path}.bad")
+        return None
+
+    # Deletes a segment once the database confirmed it
+    def ack(self, path):
+        os.remove(path)
+        self.pending.remove(path)
+
+    # Hands every pending segment to 'write' oldest first. A connection failure stops the replay (and raises)
+    # so order is kept, a segment the database rejects for its data is moved to quarantine/ and the replay goes on.
+    # The lock is held throughout, a segment is never acked by one process while another is writing it.
+    def replay(self, write):
+        with self._locked():
+            self._scan()
+            return self._replay(write)
+
+    def _replay(self, write):
+        replayed = 0
+        while self.pending:
+            path = self.pending[0]
+            rows = self.read(path)
+            if rows is None:
+                self.pending.pop(0)
+                continue
+            try:
+                write(rows)
+            except Exception as e:
+                if is_connection_error(e):
+                    raise
+                self._quarantine(path, e)
+                continue
+            self.ack(path)
+            replayed += 1
+        return replayed
+
+    def _quarantine(self, path, error):
+        os.makedirs(self.quarantine, exist_ok=True)
+        # Sequence numbers restart once a directory drains, never overwrite an earlier quarantined segment
+        target = os.path.join(self.quarantine, os.path.basename(path))
+        suffix = 1
+        while os.path.exists(target):
+            target = os.path.join(self.quarantine, f"{os.path.basename(path)}.{suffix}")
+            suffix += 1
+        os.replace(path, target)
+        self.pending.remove(path)
+        logger.error(f" Spool | replay | Segment: {path} | Error: {error} | Note: Rejected by the database, moved to {self.quarantine}")
+
+    # Spool a new batch, then push everything pending (it included) to the database
+    def write_through(self, rows, write):
+        self.append(rows)
+        return self.replay(write)
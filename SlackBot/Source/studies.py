@@ -1,29 +1,64 @@
 # studies.py
-from SlackBot.Source.data import Data
+from datetime import datetime, timedelta, timezone
+from SlackBot.Source.candle import frame_to_records
+from SlackBot.Source.sessions import anchor_start, trading_date
+from SlackBot.Source.vwap import VWAPEngine
+from SlackBot.Source.volume_profile import SessionProfiles, VolumeProfile, structure
+from SlackBot.Source.profile_archive import ProfileArchive
+from SlackBot.Source.tpo import TPOEngine, period_span
+from SlackBot.Source.naked_vpoc import NakedVPOCIndex
 
 class Studies():
-    def __init__():
-        data = Data.read_data()
+    def __init__(self, data=None, archive=None, naked=None):
+        self.data = data
         # THis is where all of the base level data will be for all of your studies to
         # be built off of. This will be the data that is constantly updating in real time.
         # studies need to return data in the correct format so that I can derive other information from them. can I derive 75% expected range used from the expected range?
-        pass
+        self.vwap = VWAPEngine() # Anchored VWAPs (RTH, ETH, Week, Month, Quarter, Year, Custom)
+        self.profiles = SessionProfiles() # Volume Profiles of the Current and Prior Session (RTH / ETH)
+        self.archive = archive or ProfileArchive() # Every finished session's profile on disk, for composites
+        self.tpo = TPOEngine() # Market Profile (TPO) of the last few sessions (RTH / ETH)
+        self.naked = naked or NakedVPOCIndex() # Untested session VPOCs, kept on disk between runs
+
+    # One read per symbol at startup, from the start of the longest anchor (the year) up to now
+    async def warm_up(self, symbols, now=None):
+        now = now or datetime.now(timezone.utc)
+        for symbol in symbols:
+            df = await self.data.read_range(symbol, self.vwap.history_start(symbol, now), now)
+            for candle in frame_to_records(df):
+                self._update(candle)
+        self.naked.save()
+
+    # Feed every streamed candle, all incremental studies update in O(1)
+    def update(self, candle):
+        self._update(candle)
+        self.naked.save()
+
+    # The naked VPOC index reads the profile of the session a bar finished, so everything is fed bar by bar
+    def _update(self, candle):
+        self.vwap.update(candle)
+        for symbol, date in self.profiles.update(candle):
+            self.archive.add(symbol, date, self.profiles)
+        self.tpo.update(candle)
+        self.naked.update(candle, self.profiles)
+
+    # Session profile built from the bars (complete after warm_up, unlike a trade profile started mid session)
+    def _profile_value(self, symbol, session, days_back, field):
+        profile = self.profiles.get(symbol, session, days_back)
+        if profile is None:
+            return None
+        return getattr(profile, field)
     def last_price(self, data):
         value = None
         return value
     # --------------------------------- VALUE -------------------------------- #
-    def rth_vpoc(self, data):
-        # Access the data and do the calculations needed and return the result
-        value = None
-        return value
-    def eth_vpoc(self, data):
-        # Access the data and do the calculations needed and return the result
-        value = None
-        return value
-    def prior_day_vpoc(self, data):
-        # Access the data and do the calculations needed and return the result
-        value = None
-        return value
+    def rth_vpoc(self, symbol):
+        return self._profile_value(symbol, 'RTH', 0, 'vpoc')
+    def eth_vpoc(self, symbol):
+        return self._profile_value(symbol, 'ETH', 0, 'vpoc')
+    def prior_day_vpoc(self, symbol, session='RTH'):
+        # session 'RTH', 'ETH' or 'DAY' (the whole 18:00 - 17:00 trading day)
+        return self._profile_value(symbol, session, 1, 'vpoc')
     def prior_wvpoc(self, data):
         # Access the data and do the calculations needed and return the result
         value = None
@@ -62,39 +97,29 @@ class Studies():
         value = None
         return value
     # ---------------------------------- VWAP -------------------------------- #
-    def rth_vwap(self, data):
-        # access the data and do the calculations needed and return the result
-        # return STD = True then return the standard deviation as well.
-        # return SLOPE = True then return the slope of the vwap
-        value = None
-        return value
-    def eth_vwap(self, data):
-        # access the data and do the calculations needed and return the result
-        # return STD = True then return the standard deviation as well.
-        # if false then just return the vwap
-        # return SLOPE = True then return the slope of the vwap
-        value = None
-        return value
-    def wvwap(self, data):
-        # access the data and do the calculations needed and return the result
-        value = None
-        return value
-    def mvwap(self, data):
-        # access the data and do the calculations needed and return the result
-        value = None
-        return value
-    def qvwap(self, data):
-        # access the data and do the calculations needed and return the result
-        value = None
-        return value
-    def yvwap(self, data):
-        # access the data and do the calculations needed and return the result
-        value = None
-        return value    
-    def custom_vwap(self, data):
-        # Either Pass in a date and time or pass in a Study like current day high.
-        value = None
-        return value
+    # std=True also returns the 1, 2 and 3 standard deviation bands [(lower, upper), ...]
+    # slope=True also returns the slope of the vwap (change per bar over the last few bars)
+    def rth_vwap(self, symbol, std=False, slope=False):
+        return self.vwap.result(symbol, 'rth', std, slope)
+    def eth_vwap(self, symbol, std=False, slope=False):
+        return self.vwap.result(symbol, 'eth', std, slope)
+    def wvwap(self, symbol, std=False, slope=False):
+        return self.vwap.result(symbol, 'week', std, slope)
+    def mvwap(self, symbol, std=False, slope=False):
+        return self.vwap.result(symbol, 'month', std, slope)
+    def qvwap(self, symbol, std=False, slope=False):
+        return self.vwap.result(symbol, 'quarter', std, slope)
+    def yvwap(self, symbol, std=False, slope=False):
+        return self.vwap.result(symbol, 'year', std, slope)
+    def custom_vwap(self, symbol, anchor, std=False, slope=False):
+        # Anchor it first with anchor_vwap(), either a date and time or the time of a study like current day high.
+        return self.vwap.result(symbol, anchor, std, slope)
+    # Starts a custom vwap at start_time, bars already stored since then are read back once
+    async def anchor_vwap(self, symbol, anchor, start_time):
+        self.vwap.anchor(symbol, anchor, start_time)
+        if self.data is not None:
+            df = await self.data.read_range(symbol, start_time, datetime.now(timezone.utc))
+            self.vwap.warm_up(frame_to_records(df), anchors=[anchor])
     # ------------------------------ MARKET LEVELS --------------------------- # 
     def session_levels(self, data):
         # access the data and do the calculations for any given session or sessions.
@@ -148,16 +173,18 @@ class Studies():
         # 30 minute relative volume?
         value = None
         return value
-    def delta(self, data):
-        # Pass in the period of time you want to calculate the delta for and return the result
-        # Use this to calculate the OVN delta as well as RTH delta.
-        value = None
-        return value
+    def delta(self, symbol, session='RTH'):
+        # Aggressor classified time and sales delta of the current trading date, 'ETH' is the OVN delta.
+        if self.data is None:
+            return None
+        return self.data.trades.delta(symbol, session)
     # --------------------------- MARKET PROFILE ---------------------------- #
-    def period(self, data):
-        # pass in the period letter or the range of period letters that you want, return the open, high, low, close, and mid
-        value = None
-        return value
+    def period(self, symbol, letters, session='RTH', days_back=0):
+        # pass in the period letter ('A') or the range of period letters ('A-C') that you want, return the open, high, low, close, and mid
+        profile = self.tpo.get(symbol, session, days_back)
+        if profile is None:
+            return None, None, None, None, None
+        return profile.period(*period_span(letters))
     def open_type(self, data):
         # return the open type for the current period or any given period.
         value = None
@@ -166,49 +193,62 @@ class Studies():
         # return the day type for the current day or any given period
         value = None
         return value
-    def composite(self, data):
-        # pass in the period letter or the range of period letters that you want, return the open, high, low, close, and mid
-        value = None
-        return value
-    def initial_balance(self, data):
-        # return the initial balance high, low, 0.5x, 1x, 1.5x, 2x.
-        value = None
-        return value
-    def t_vpoc(self, data):
-        # access the data and do the calculations needed and return the result
-        value = None
-        return value
-    def single_print_past(self, data):
-        # return all of the single prints for the last x amount of time.
-        value = None
-        return value
-    def single_print_current(self, data):
-        # return all of the single prints for the current period.
-        value = None
-        return value
-    def excess(self, data):
-        # return all of the excess for the given period.
-        value = None
-        return value
+    def initial_balance(self, symbol, days_back=0):
+        # return the initial balance high, low and the 0.5x, 1x, 1.5x, 2x extensions {multiplier: (low, high)}.
+        profile = self.tpo.get(symbol, 'RTH', days_back)
+        if profile is None:
+            return None, None, {}
+        return profile.initial_balance()
+    def t_vpoc(self, symbol, session='RTH', days_back=0):
+        profile = self.tpo.get(symbol, session, days_back)
+        return profile.t_vpoc if profile is not None else None
+    def single_print_past(self, symbol, days=1, session='RTH'):
+        # return all of the single prints of the last 'days' sessions before the current one as [(date, low, high)].
+        prints = []
+        for days_back in range(days, 0, -1):
+            profile = self.tpo.get(symbol, session, days_back)
+            if profile is not None:
+                date = self.tpo.dates(symbol)[-1 - days_back]
+                prints.extend((date, low, high) for low, high in profile.single_prints())
+        return prints
+    def single_print_current(self, symbol, session='RTH'):
+        # return all of the single prints of the current session as [(low, high)].
+        profile = self.tpo.get(symbol, session)
+        return profile.single_prints() if profile is not None else []
+    def excess(self, symbol, session='RTH', days_back=0):
+        # return the (upper, lower) excess of the session, each (low, high) or None.
+        profile = self.tpo.get(symbol, session, days_back)
+        if profile is None:
+            return None, None
+        return profile.excess()
     # --------------------------- VOLUME PROFILE ---------------------------- #
-    def composite(self, data):
-       # return the composte profile for given time range.
-        value = None
-        return value
-    def structure(self, data):
-        # would it be possible to format the profile and then classify its shape into a structure? Balanced, Trending, Etc? 
-        # and could you do this for any given period of time?? DVPOC ALIGNS WITH COMPOSITE NODE THAT COULD BECOME 5DA
-        # How can you tell if a vpoc is prominant???? or NOT???
-        value = None
-        return value
-    def naked_vpoc(self, data):
-        # return all of the naked vpocs for the last x amount of time.
-        value = None
-        return value
-    def value_area(self,data):
-        # return the value area high, low, and point of control.
-        value = None
-        return value
+    def composite(self, symbol, days=None, start=None, end=None, period=None, session='DAY', current=False):
+        # return the composite profile (VolumeProfile) of the last 'days' finished days, the dates start - end,
+        # or this 'week' / 'month' / 'quarter' / 'year' (period). current=True adds the day in progress.
+        if period is not None:
+            start = trading_date(anchor_start(period, symbol, datetime.now(timezone.utc)))
+        profile = self.archive.composite(symbol, start, end, days, session)
+        if current:
+            profile = VolumeProfile.merged([profile, self.profiles.get(symbol, session)])
+            if profile.base is None:
+                return None
+        return profile
+    def structure(self, symbol, days=None, start=None, end=None, period=None, session='DAY', current=False):
+        # Shape (Balanced, Trending, P, b), range, value area and VPOC prominence of a composite, see volume_profile.structure.
+        # DVPOC ALIGNS WITH COMPOSITE NODE THAT COULD BECOME 5DA
+        return structure(self.composite(symbol, days, start, end, period, session, current))
+    def naked_vpoc(self, symbol, days=None, session=None):
+        # return all of the naked vpocs of the last 'days' trading days (all of them by default) as [(date, session, price)], newest first.
+        since = None
+        if days is not None:
+            since = trading_date(datetime.now(timezone.utc)) - timedelta(days=days)
+        return self.naked.naked(symbol, since, session)
+    def value_area(self, symbol, session='RTH', days_back=0):
+        # return the value area low, high, and point of control (70% of the session's volume).
+        profile = self.profiles.get(symbol, session, days_back)
+        if profile is None:
+            return None, None, None
+        return profile.value_area()
     # ------------------------------- ECONOMIC ------------------------------ #
     def economic_scene(self, data):
         # return all of the economic events for the current day.
@@ -0,0 +1,105 @@
+# time_and_sales.py
+# time_and_sales.py classifies every print by aggressor side and folds it into per price volume / delta profiles, only the aggregates are kept and persisted.
+import logging
+import os
+import time
+from SlackBot.Source.constant import tick_sizes
+from SlackBot.Source.volume_profile import VolumeProfile
+from SlackBot.Source.sessions import trading_date, session_of
+
+logger = logging.getLogger(__name__)
+
+# ------------------ Configuration ------------------ #
+
+TRADE_SNAPSHOT_INTERVAL = float(os.getenv('TRADE_SNAPSHOT_INTERVAL', 30)) # Seconds between upserts of changed price levels
+TRADE_SESSIONS_KEPT = int(os.getenv('TRADE_SESSIONS_KEPT', 2)) # Trading dates kept in memory per symbol (current and prior)
+
+# --------------------------------------------------- #
+
+BUY = 'BUY'
+SELL = 'SELL'
+
+# Aggressor side of a print: the exchange flag when it is sent, else the quote rule (at or through the
+# offer is a buy, at or through the bid is a sell), else the tick rule against the previous print.
+def classify_aggressor(price, bid=None, ask=None, aggressor_side=None, last_price=None, last_side=None):
+    side = getattr(aggressor_side, 'value', aggressor_side)
+    if side in (BUY, SELL):
+        return side
+    if ask is not None and bid is not None and ask > bid:
+        if price >= ask:
+            return BUY
+        if price <= bid:
+            return SELL
+    if last_price is not None:
+        if price > last_price:
+            return BUY
+        if price < last_price:
+            return SELL
+        return last_side # Zero tick, same side as the last move
+    return None
+
+# Every symbol's trade profiles keyed by trading date and session (RTH / ETH)
+class TradeAggregates():
+    def __init__(self, tick_sizes=tick_sizes, snapshot_interval=TRADE_SNAPSHOT_INTERVAL, sessions_kept=TRADE_SESSIONS_KEPT):
+        self.tick_sizes = tick_sizes
+        self.snapshot_interval = snapshot_interval
+        self.sessions_kept = sessions_kept
+        self.profiles = {} # (symbol, trading date, session) -> VolumeProfile
+        self.last_trade = {} # symbol -> (price, side) for the tick rule
+        self.last_snapshot = time.monotonic()
+
+    # Classifies and aggregates one print, returns the side it was given (None if it could not be classified)
+    def add(self, symbol, event_time, price, size, bid=None, ask=None, aggressor_side=None):
+        last_price, last_side = self.last_trade.get(symbol, (None, None))
+        side = classify_aggressor(price, bid, ask, aggressor_side, last_price, last_side)
+        self.last_trade[symbol] = (price, side)
+        self.profile(symbol, trading_date(event_time), session_of(symbol, event_time)).add(price, size, side)
+        return side
+
+    def profile(self, symbol, date, session):
+        key = (symbol, date, session)
+        profile = self.profiles.get(key)
+        if profile is None:
+            profile = self.profiles[key] = VolumeProfile(self.tick_sizes.get(symbol, 0.01))
+            self._expire(symbol)
+        return profile
+
+    def _expire(self, symbol):
+        dates = sorted({date for key_symbol, date, _ in self.profiles if key_symbol == symbol})
+        for date in dates[:-self.sessions_kept]:
+            for session in ('RTH', 'ETH'):
+                self.profiles.pop((symbol, date, session), None)
+
+    # Profile of a session of the latest (or a given) trading date, None if nothing traded
+    def session(self, symbol, session, date=None):
+        if date is None:
+            dates = [key_date for key_symbol, key_date, _ in self.profiles if key_symbol == symbol]
+            if not dates:
+                return None
+            date = max(dates)
+        return self.profiles.get((symbol, date, session))
+
+    # Buy minus sell volume of a session (TOTAL_OVN_DELTA is 'ETH', TOTAL_RTH_DELTA is 'RTH')
+    def delta(self, symbol, session, date=None):
+        profile = self.session(symbol, session, date)
+        return profile.delta if profile is not None else 0.0
+
+    def snapshot_due(self):
+        return time.monotonic() - self.last_snapshot >= self.snapshot_interval
+
+    # volume_at_price rows for every level that changed since the last snapshot
+    def snapshot(self):
+        rows = []
+        for (symbol, date, session), profile in self.profiles.items():
+            for price, volume, buy, sell in profile.changed():
+                rows.append({
+                    'EventSymbol': symbol,
+                    'TradeDate': date,
+                    'Session': session,
+                    'Price': price,
+                    'Volume': float(volume),
+                    'BuyVolume': float(buy),
+                    'SellVolume': float(sell),
+                })
+        self.last_snapshot = time.monotonic()
+        return rows
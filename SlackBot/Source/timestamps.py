@@ -0,0 +1,105 @@
+# timestamps.py
+# timestamps.py decodes DXLink 'YYYYMMDD-HHMMSS.mmm-TZ' timestamps without strptime, one at a time or a whole FEED_DATA batch at once.
+import logging
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_LENGTH = 24 # e.g. '20210506-200000.000-0400'
+INVALID_NS = np.iinfo(np.int64).min # Marker for timestamps that failed to parse in the batch path
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# '-0400' -> timezone(-4h), there are only a handful of offsets so they are built once
+_offsets = {}
+
+def _offset(tz_str):
+    tz = _offsets.get(tz_str)
+    if tz is None:
+        minutes = int(tz_str[1:3]) * 60 + int(tz_str[3:5])
+        tz = timezone(timedelta(minutes=-minutes if tz_str[0] == '-' else minutes))
+        _offsets[tz_str] = tz
+    return tz
+
+def parse_timestamp(ts_str):
+    """
+    Parses timestamp strings into datetime objects.
+    Format: 'YYYYMMDD-HHMMSS.mmm-TZ'
+    Example: '20210506-200000.000-0400'
+    """
+    try:
+        if len(ts_str) != TIMESTAMP_LENGTH:
+            return datetime.strptime(ts_str, '%Y%m%d-%H%M%S.%f%z')
+        return datetime(
+            int(ts_str[0:4]), int(ts_str[4:6]), int(ts_str[6:8]),
+            int(ts_str[9:11]), int(ts_str[11:13]), int(ts_str[13:15]),
+            int(ts_str[16:19]) * 1000,
+            tzinfo=_offset(ts_str[19:24])
+        )
+    except (ValueError, TypeError) as e:
+        logger.error(f"Timestamp parsing error: {e} for {ts_str}")
+        return None
+
+# Days since 1970-01-01 for a proleptic Gregorian date, vectorized (H. Hinnant's days_from_civil)
+def _days_from_civil(year, month, day):
+    year = year - (month <= 2)
+    era = np.floor_divide(year, 400)
+    yoe = year - era * 400
+    doy = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+def parse_timestamps_ns(ts_strs):
+    """
+    Parses a batch of timestamp strings into an int64 array of epoch nanoseconds (UTC).
+    Entries that fail to parse come back as INVALID_NS.
+    """
+    count = len(ts_strs)
+    if count == 0:
+        return np.empty(0, dtype=np.int64)
+    chars = np.asarray(ts_strs)
+    if chars.dtype != np.dtype(f'U{TIMESTAMP_LENGTH}'):
+        # Longest entry is not the expected width (or not text at all), nothing to vectorize
+        return np.array([_parse_one_ns(ts) for ts in ts_strs], dtype=np.int64)
+
+    # Each row of 'digits' is one timestamp as code points minus '0'
+    digits = chars.view(np.uint32).reshape(count, TIMESTAMP_LENGTH).astype(np.int64) - 48
+    lengths = np.char.str_len(chars)
+
+    def number(start, stop):
+        value = np.zeros(count, dtype=np.int64)
+        for column in range(start, stop):
+            value = value * 10 + digits[:, column]
+        return value
+
+    year, month, day = number(0, 4), number(4, 6), number(6, 8)
+    hour, minute, second = number(9, 11), number(11, 13), number(13, 15)
+    millis = number(16, 19)
+    sign = np.where(digits[:, 19] == ord('-') - 48, -1, 1)
+    offset = sign * (number(20, 22) * 3600 + number(22, 24) * 60)
+
+    seconds = _days_from_civil(year, month, day) * 86400 + hour * 3600 + minute * 60 + second - offset
+    result = (seconds * 1000 + millis) * 1_000_000
+
+    # Anything that is not the fixed width layout (or has stray characters) goes through the scalar path
+    numeric = np.r_[0:8, 9:15, 16:19, 20:24]
+    valid = (lengths == TIMESTAMP_LENGTH) & np.all((digits[:, numeric] >= 0) & (digits[:, numeric] <= 9), axis=1)
+    for i in np.flatnonzero(~valid):
+        result[i] = _parse_one_ns(ts_strs[i])
+    return result
+
+def _parse_one_ns(ts_str):
+    if isinstance(ts_str, (int, float)) and not isinstance(ts_str, bool):
+        return int(ts_str) * 1_000_000 # DXLink sends epoch millis when the feed is not configured for strings
+    parsed = parse_timestamp(ts_str) if isinstance(ts_str, str) else None
+    if parsed is None:
+        return INVALID_NS
+    delta = parsed - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1000
+
+# Epoch nanoseconds back to an aware UTC datetime (microsecond precision)
+def ns_to_datetime(ns):
+    if ns == INVALID_NS:
+        return None
+    return EPOCH + timedelta(microseconds=int(ns) // 1000)
@@ -0,0 +1,226 @@
+# tpo.py
+# tpo.py is the Market Profile (TPO) engine: 30 minute periods lettered from the session calendar, one bit per period on every price tick, so single prints, excess, the TPO POC and period OHLC come straight off the bitsets.
+import logging
+import os
+import string
+from datetime import timedelta
+import numpy as np
+from SlackBot.Source.constant import tick_sizes
+from SlackBot.Source.sessions import trading_date, session_of, session_open, rth_window
+
+logger = logging.getLogger(__name__)
+
+# ------------------ Configuration ------------------ #
+
+TPO_SESSIONS_KEPT = int(os.getenv('TPO_SESSIONS_KEPT', 5)) # Trading dates of TPO profiles kept in memory per symbol
+EXCESS_TICKS = int(os.getenv('TPO_EXCESS_TICKS', 2)) # Single print ticks at an extreme needed to call it excess
+
+# --------------------------------------------------- #
+
+PERIOD = timedelta(minutes=30)
+LETTERS = string.ascii_uppercase + string.ascii_lowercase # A-Z then a-z, 52 periods cover the whole 23 hour day
+PADDING = 32 # Extra ticks allocated on each side whenever a profile has to grow
+IB_MULTIPLIERS = (0.5, 1, 1.5, 2)
+
+# Letter (or 'A-C' range of letters) -> (first, last) period index
+def period_span(letters):
+    if isinstance(letters, int):
+        return letters, letters
+    if isinstance(letters, (tuple, list)):
+        first, last = letters
+    elif '-' in letters:
+        first, last = letters.split('-', 1)
+    else:
+        first = last = letters
+    first, last = [LETTERS.index(letter) if isinstance(letter, str) else letter for letter in (first, last)]
+    return min(first, last), max(first, last)
+
+# Start of period A of a session: the RTH open, or 18:00 ET the evening before for the overnight session
+def session_start(symbol, date, session):
+    return rth_window(symbol, date)[0] if session == 'RTH' else session_open(date)
+
+# One session. bits[i] has bit p set when period p traded at tick base + i, counts[i] is its number of TPOs.
+# The period OHLC lists are indexed by period so any period reads in O(1).
+class TPOProfile():
+    def __init__(self, tick_size, start):
+        self.tick_size = tick_size
+        self.start = start
+        self.base = None # Tick of slot 0
+        self.bits = np.zeros(0, dtype=np.uint64)
+        self.counts = np.zeros(0, dtype=np.uint8)
+        self.low_tick = None
+        self.high_tick = None
+        self.opens = [None] * len(LETTERS)
+        self.highs = [None] * len(LETTERS)
+        self.lows = [None] * len(LETTERS)
+        self.closes = [None] * len(LETTERS)
+        self.last_period = None
+
+    def tick(self, price):
+        return int(round(price / self.tick_size))
+
+    def price(self, tick):
+        return round(tick * self.tick_size, 10)
+
+    # One bar. Setting a bit that is already set changes nothing, so repeats of the forming bar just widen it.
+    def update(self, period, open_, high, low, close):
+        if not 0 <= period < len(LETTERS):
+            return
+        low_tick, high_tick = sorted((self.tick(low), self.tick(high)))
+        self._ensure(low_tick, high_tick)
+        start, stop = low_tick - self.base, high_tick - self.base + 1
+        bit = np.uint64(1 << period)
+        fresh = (self.bits[start:stop] & bit) == 0
+        self.bits[start:stop] |= bit
+        self.counts[start:stop] += fresh.astype(np.uint8)
+        self.low_tick = low_tick if self.low_tick is None else min(self.low_tick, low_tick)
+        self.high_tick = high_tick if self.high_tick is None else max(self.high_tick, high_tick)
+
+        if self.opens[period] is None:
+            self.opens[period] = open_ if open_ is not None else close
+        self.highs[period] = high if self.highs[period] is None else max(self.highs[period], high)
+        self.lows[period] = low if self.lows[period] is None else min(self.lows[period], low)
+        if self.last_period is None or period >= self.last_period:
+            self.closes[period] = close
+            self.last_period = period
+
+    def _ensure(self, low_tick, high_tick):
+        if self.base is None:
+            self.base = low_tick - PADDING
+            self._resize(0, high_tick - low_tick + 2 * PADDING + 1)
+            return
+        if low_tick < self.base:
+            shift = self.base - low_tick + PADDING
+            self.base -= shift
+            self._resize(shift, len(self.bits) + shift)
+        if high_tick - self.base >= len(self.bits):
+            self._resize(0, high_tick - self.base + PADDING + 1)
+
+    def _resize(self, offset, length):
+        for name in ('bits', 'counts'):
+            old = getattr(self, name)
+            grown = np.zeros(length, dtype=old.dtype)
+            grown[offset:offset + len(old)] = old
+            setattr(self, name, grown)
+
+    # (open, high, low, close, mid) of a period or a range of periods, None values when nothing traded yet
+    def period(self, first, last=None):
+        last = first if last is None else last
+        traded = [p for p in range(first, last + 1) if self.opens[p] is not None]
+        if not traded:
+            return None, None, None, None, None
+        high = max(self.highs[p] for p in traded)
+        low = min(self.lows[p] for p in traded)
+        return self.opens[traded[0]], high, low, self.closes[traded[-1]], (high + low) / 2
+
+    # Counts over the traded range, lowest tick first
+    def _traded(self):
+        start, stop = self.low_tick - self.base, self.high_tick - self.base + 1
+        return start, self.counts[start:stop]
+
+    # Price with the most TPOs, ties go to the one closest to the middle of the range
+    @property
+    def t_vpoc(self):
+        if self.base is None:
+            return None
+        start, counts = self._traded()
+        candidates = np.flatnonzero(counts == counts.max())
+        middle = (len(counts) - 1) / 2
+        best = int(candidates[np.argmin(np.abs(candidates - middle))])
+        return self.price(best + start + self.base)
+
+    # Runs of single print ticks as [(low, high)], lowest first
+    def single_print_runs(self):
+        if self.base is None:
+            return []
+        start, counts = self._traded()
+        single = np.concatenate(([False], counts == 1, [False]))
+        edges = np.flatnonzero(single[1:] != single[:-1])
+        offset = start + self.base
+        return [(self.price(int(a) + offset), self.price(int(b) - 1 + offset)) for a, b in zip(edges[0::2], edges[1::2])]
+
+    # Single prints inside the range, the runs at the high and low are tails (see excess)
+    def single_prints(self):
+        low, high = self.price(self.low_tick), self.price(self.high_tick)
+        return [run for run in self.single_print_runs() if run[0] != low and run[1] != high]
+
+    # (upper excess, lower excess): single print tails of at least 'ticks' ticks at the extremes, else None
+    def excess(self, ticks=EXCESS_TICKS):
+        if self.base is None:
+            return None, None
+        low, high = self.price(self.low_tick), self.price(self.high_tick)
+        upper = lower = None
+        for run in self.single_print_runs():
+            if self.tick(run[1]) - self.tick(run[0]) + 1 < ticks or run == (low, high):
+                continue
+            if run[1] == high:
+                upper = run
+            if run[0] == low:
+                lower = run
+        return upper, lower
+
+    # (high, low, {multiplier: (low, high)}) of the first two periods (A and B)
+    def initial_balance(self, multipliers=IB_MULTIPLIERS):
+        _, high, low, _, _ = self.period(0, 1)
+        if high is None:
+            return None, None, {}
+        ib_range = high - low
+        return high, low, {k: (low - k * ib_range, high + k * ib_range) for k in multipliers}
+
+    # Letters that traded at a price, e.g. 'ABE'
+    def letters(self, price):
+        if self.base is None:
+            return ''
+        slot = self.tick(price) - self.base
+        if not 0 <= slot < len(self.bits):
+            return ''
+        bits = int(self.bits[slot])
+        return ''.join(letter for p, letter in enumerate(LETTERS) if bits >> p & 1)
+
+# TPO profiles per symbol, trading date and session (RTH / ETH), fed one candle at a time
+class TPOEngine():
+    def __init__(self, tick_sizes=tick_sizes, sessions_kept=TPO_SESSIONS_KEPT):
+        self.tick_sizes = tick_sizes
+        self.sessions_kept = sessions_kept
+        self.profiles = {} # (symbol, trading date, session) -> TPOProfile
+
+    def update(self, candle):
+        symbol, event_time = candle['EventSymbol'], candle['EventTime']
+        high, low = candle['High'], candle['Low']
+        if high is None or low is None or np.isnan(high) or np.isnan(low):
+            return
+        date = trading_date(event_time)
+        session = session_of(symbol, event_time)
+        profile = self.profile(symbol, date, session)
+        period = int((event_time - profile.start) // PERIOD)
+        profile.update(period, candle['Open'], high, low, candle['Close'])
+
+    # History oldest first (CandleRecords)
+    def warm_up(self, history):
+        for candle in history:
+            self.update(candle)
+
+    def profile(self, symbol, date, session):
+        key = (symbol, date, session)
+        profile = self.profiles.get(key)
+        if profile is None:
+            profile = self.profiles[key] = TPOProfile(self.tick_sizes.get(symbol, 0.01), session_start(symbol, date, session))
+            self._expire(symbol)
+        return profile
+
+    def _expire(self, symbol):
+        dates = self.dates(symbol)
+        for date in dates[:-self.sessions_kept]:
+            for session in ('RTH', 'ETH'):
+                self.profiles.pop((symbol, date, session), None)
+
+    # Trading dates held for a symbol, oldest first
+    def dates(self, symbol):
+        return sorted({date for key_symbol, date, _ in self.profiles if key_symbol == symbol})
+
+    # Profile of a session of a trading date, days_back=1 is the prior one
+    def get(self, symbol, session, days_back=0):
+        dates = self.dates(symbol)
+        if days_back >= len(dates):
+            return None
+        return self.profiles.get((symbol, dates[-1 - days_back], session))
@@ -0,0 +1,305 @@
+# volume_profile.py
+# volume_profile.py is the volume profile primitive: volume (and buy / sell volume) per price tick in contiguous numpy arrays, with a cached VPOC and a 70% value area.
+import logging
+import numpy as np
+from SlackBot.Source.constant import tick_sizes
+from SlackBot.Source.sessions import trading_date, session_of
+
+logger = logging.getLogger(__name__)
+
+PADDING = 64 # Extra ticks allocated on each side whenever a profile has to grow
+VALUE_AREA = 0.70 # Share of the session's volume inside the value area
+SESSIONS_KEPT = 2 # Trading dates of bar profiles kept in memory per symbol (current and prior)
+DUST = 1e-9 # Volume left behind by float add / subtract round trips, treated as nothing traded
+TREND_SHARE = 0.6 # Value area wider than this share of the range reads as a trending profile
+
+# Arrays are indexed by tick - base, where a tick is price / tick size rounded to an integer,
+# so every profile of a product lines up on the same integer price grid.
+class VolumeProfile():
+    def __init__(self, tick_size):
+        self.tick_size = tick_size
+        self.base = None # Tick of slot 0
+        self.volume = np.zeros(0)
+        self.buy = np.zeros(0)
+        self.sell = np.zeros(0)
+        self.total = 0.0
+        self.poc = None # Tick of the VPOC, None while it has to be recomputed
+        self.version = 0 # Bumped on every change, keys the value area cache
+        self.cached_value_area = None
+        self.dirty = set() # Ticks changed since the last changed() call
+
+    def tick(self, price):
+        return int(round(price / self.tick_size))
+
+    def price(self, tick):
+        return round(tick * self.tick_size, 10)
+
+    # One trade (or any volume at a single price), side 'BUY' / 'SELL' / None
+    def add(self, price, volume, side=None):
+        tick = self.tick(price)
+        self._apply(tick, tick, volume, volume if side == 'BUY' else 0.0, volume if side == 'SELL' else 0.0)
+
+    # One bar: volume (and its bid / ask split) spread evenly over every tick from low to high
+    def add_range(self, low, high, volume, buy=0.0, sell=0.0):
+        low_tick, high_tick = sorted((self.tick(low), self.tick(high)))
+        count = high_tick - low_tick + 1
+        self._apply(low_tick, high_tick, volume / count, buy / count, sell / count)
+
+    # Takes back exactly what add_range added (e.g. the previous state of a forming bar)
+    def subtract_range(self, low, high, volume, buy=0.0, sell=0.0):
+        low_tick, high_tick = sorted((self.tick(low), self.tick(high)))
+        count = high_tick - low_tick + 1
+        self._apply(low_tick, high_tick, -volume / count, -buy / count, -sell / count)
+
+    def _apply(self, low_tick, high_tick, volume, buy, sell):
+        self._ensure(low_tick, high_tick)
+        start, stop = low_tick - self.base, high_tick - self.base + 1
+        self.volume[start:stop] += volume
+        if buy:
+            self.buy[start:stop] += buy
+        if sell:
+            self.sell[start:stop] += sell
+        self.total += volume * (stop - start)
+        self.version += 1
+        self.dirty.update(range(low_tick, high_tick + 1))
+
+        # VPOC upkeep only looks at the touched ticks: an add can only raise them, a subtract
+        # only matters when it lowers the VPOC itself (then it is recomputed on the next read)
+        if self.poc is None:
+            return
+        if volume > 0:
+            peak = start + int(np.argmax(self.volume[start:stop]))
+            if self.volume[peak] > self.volume[self.poc - self.base]:
+                self.poc = peak + self.base
+        elif low_tick <= self.poc <= high_tick:
+            self.poc = None
+
+    def _ensure(self, low_tick, high_tick):
+        if self.base is None:
+            self.base = low_tick - PADDING
+            self._resize(0, high_tick - low_tick + 2 * PADDING + 1)
+            self.poc = low_tick
+            return
+        if low_tick < self.base:
+            shift = self.base - low_tick + PADDING
+            self.base -= shift
+            self._resize(shift, len(self.volume) + shift)
+        if high_tick - self.base >= len(self.volume):
+            self._resize(0, high_tick - self.base + PADDING + 1)
+
+    def _resize(self, offset, length):
+        for name in ('volume', 'buy', 'sell'):
+            grown = np.zeros(length)
+            old = getattr(self, name)
+            grown[offset:offset + len(old)] = old
+            setattr(self, name, grown)
+
+    # Price with the most volume, ties keep the level that got there first
+    @property
+    def vpoc(self):
+        if self.total <= DUST or self.base is None:
+            return None
+        if self.poc is None:
+            self.poc = int(np.argmax(self.volume)) + self.base
+        return self.price(self.poc)
+
+    # (value area low, value area high, vpoc). Expands from the VPOC two ticks at a time towards the side
+    # with more volume until 'share' of the volume is inside, no sorting of the profile is involved.
+    def value_area(self, share=VALUE_AREA):
+        if self.total <= DUST or self.base is None:
+            return None, None, None
+        cached = self.cached_value_area
+        if cached is not None and cached[0] == self.version and cached[1] == share:
+            return cached[2]
+
+        vpoc = self.vpoc
+        volume = self.volume
+        traded = np.flatnonzero(volume > DUST)
+        first, last = int(traded[0]), int(traded[-1])
+        low = high = self.poc - self.base
+        inside = volume[low]
+        target = share * self.total
+        while inside < target and (low > first or high < last):
+            above = volume[high + 1:min(high + 3, last + 1)].sum() if high < last else -1.0
+            below = volume[max(low - 2, first):low].sum() if low > first else -1.0
+            if above >= below:
+                inside += above
+                high = min(high + 2, last)
+            else:
+                inside += below
+                low = max(low - 2, first)
+
+        result = (self.price(low + self.base), self.price(high + self.base), vpoc)
+        self.cached_value_area = (self.version, share, result)
+        return result
+
+    # Prices, volume, buy and sell volume over the traded range, lowest price first
+    def levels(self):
+        if self.base is None:
+            empty = np.zeros(0)
+            return empty, empty, empty, empty
+        traded = np.flatnonzero(self.volume > DUST)
+        if len(traded) == 0:
+            empty = np.zeros(0)
+            return empty, empty, empty, empty
+        window = slice(traded[0], traded[-1] + 1)
+        prices = (np.arange(window.start, window.stop) + self.base) * self.tick_size
+        return prices, self.volume[window], self.buy[window], self.sell[window]
+
+    @property
+    def delta(self):
+        return float(self.buy.sum() - self.sell.sum())
+
+    @property
+    def total_volume(self):
+        return float(self.total)
+
+    # (price, volume, buy, sell) of every level changed since the last call
+    def changed(self):
+        levels = []
+        for tick in sorted(self.dirty):
+            slot = tick - self.base
+            levels.append((self.price(tick), self.volume[slot], self.buy[slot], self.sell[slot]))
+        self.dirty.clear()
+        return levels
+
+    # Profile over existing aligned arrays (slot 0 is 'base'), e.g. a composite out of the archive
+    @classmethod
+    def from_arrays(cls, tick_size, base, volume, buy, sell):
+        profile = cls(tick_size)
+        profile.base = base
+        profile.volume = np.asarray(volume, dtype=np.float64)
+        profile.buy = np.asarray(buy, dtype=np.float64)
+        profile.sell = np.asarray(sell, dtype=np.float64)
+        profile.total = float(profile.volume.sum())
+        profile.version += 1
+        if profile.total <= DUST:
+            profile.base = None
+        return profile
+
+    # Sum of several profiles of the same product on one aligned array (e.g. RTH + ETH = the whole day)
+    @classmethod
+    def merged(cls, profiles, tick_size=None):
+        profiles = [profile for profile in profiles if profile is not None and profile.base is not None]
+        merged = cls(tick_size or (profiles[0].tick_size if profiles else 0.01))
+        if not profiles:
+            return merged
+        low = min(profile.base for profile in profiles)
+        high = max(profile.base + len(profile.volume) for profile in profiles)
+        merged.base = low
+        merged._resize(0, high - low)
+        for profile in profiles:
+            start = profile.base - low
+            for name in ('volume', 'buy', 'sell'):
+                getattr(merged, name)[start:start + len(profile.volume)] += getattr(profile, name)
+            merged.total += profile.total
+        merged.version += 1
+        return merged
+
+# Bar built profiles per symbol, trading date and session (RTH / ETH), fed one candle at a time.
+# Repeats of the forming bar take back its previous contribution before adding the new one.
+class SessionProfiles():
+    def __init__(self, tick_sizes=tick_sizes, sessions_kept=SESSIONS_KEPT):
+        self.tick_sizes = tick_sizes
+        self.sessions_kept = sessions_kept
+        self.profiles = {} # (symbol, trading date, session) -> VolumeProfile
+        self.forming = {} # symbol -> (profile key, EventTime, low, high, volume, buy, sell)
+
+    # Returns the trading dates this candle finished as [(symbol, date)], their profiles are still held
+    def update(self, candle):
+        symbol, event_time = candle['EventSymbol'], candle['EventTime']
+        low, high, volume = candle['Low'], candle['High'], candle['Volume']
+        if low is None or high is None or not volume or np.isnan(volume) or np.isnan(low) or np.isnan(high):
+            return []
+        buy = _number(candle['AskVolume'])
+        sell = _number(candle['BidVolume'])
+        key = (symbol, trading_date(event_time), session_of(symbol, event_time))
+        forming = self.forming.get(symbol)
+        finished = []
+        if forming is not None:
+            if event_time < forming[1]:
+                return [] # Late update to a bar already closed
+            if event_time == forming[1] and forming[0] in self.profiles:
+                self.profiles[forming[0]].subtract_range(*forming[2:])
+            if key[1] > forming[0][1]:
+                finished.append((symbol, forming[0][1]))
+        self.profile(*key).add_range(low, high, volume, buy, sell)
+        self.forming[symbol] = (key, event_time, low, high, volume, buy, sell)
+        return finished
+
+    # History oldest first (CandleRecords), returns every trading date it finished
+    def warm_up(self, history):
+        finished = []
+        for candle in history:
+            finished.extend(self.update(candle))
+        return finished
+
+    def profile(self, symbol, date, session):
+        key = (symbol, date, session)
+        profile = self.profiles.get(key)
+        if profile is None:
+            profile = self.profiles[key] = VolumeProfile(self.tick_sizes.get(symbol, 0.01))
+            self._expire(symbol)
+        return profile
+
+    def _expire(self, symbol):
+        dates = sorted({date for key_symbol, date, _ in self.profiles if key_symbol == symbol})
+        for date in dates[:-self.sessions_kept]:
+            for session in ('RTH', 'ETH'):
+                self.profiles.pop((symbol, date, session), None)
+
+    # Trading dates held for a symbol, oldest first
+    def dates(self, symbol):
+        return sorted({date for key_symbol, date, _ in self.profiles if key_symbol == symbol})
+
+    def get_date(self, symbol, date, session):
+        return self.profiles.get((symbol, date, session))
+
+    # Profile of a session ('RTH', 'ETH' or 'DAY' for both) of a trading date, days_back=1 is the prior one
+    def get(self, symbol, session, days_back=0):
+        dates = self.dates(symbol)
+        if days_back >= len(dates):
+            return None
+        date = dates[-1 - days_back]
+        if session == 'DAY':
+            return VolumeProfile.merged(
+                [self.profiles.get((symbol, date, 'ETH')), self.profiles.get((symbol, date, 'RTH'))],
+                self.tick_sizes.get(symbol, 0.01)
+            )
+        return self.profiles.get((symbol, date, session))
+
+def _number(value):
+    if value is None:
+        return 0.0
+    value = float(value)
+    return 0.0 if np.isnan(value) else value
+
+# Shape of a profile: 'Trending' when the value area stretches over most of the range (no price was accepted),
+# else 'P' / 'b' / 'Balanced' by where the VPOC sits in the range. Prominence is the VPOC's volume over the
+# average traded level, a high reading is a well defined node, near 1 a flat profile.
+def structure(profile, trend_share=TREND_SHARE):
+    if profile is None or profile.vpoc is None:
+        return None
+    prices, volume, _, _ = profile.levels()
+    low, high = float(prices[0]), float(prices[-1])
+    val, vah, vpoc = profile.value_area()
+    span = high - low
+    if span <= 0:
+        shape = 'Balanced'
+    elif (vah - val) / span >= trend_share:
+        shape = 'Trending'
+    elif (vpoc - low) / span >= 2 / 3:
+        shape = 'P'
+    elif (vpoc - low) / span <= 1 / 3:
+        shape = 'b'
+    else:
+        shape = 'Balanced'
+    return {
+        'shape': shape,
+        'low': low,
+        'high': high,
+        'val': val,
+        'vah': vah,
+        'vpoc': vpoc,
+        'prominence': float(volume.max() / volume[volume > DUST].mean()),
+    }
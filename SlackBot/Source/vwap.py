@@ -0,0 +1,150 @@
+# vwap.py
+# vwap.py keeps anchored VWAPs (RTH, ETH, week, month, quarter, year or custom) as running sums, so VWAP, standard deviation bands and slope update in O(1) per bar.
+import logging
+import math
+import os
+from collections import deque
+from SlackBot.Source.sessions import ANCHORS, anchor_key, anchor_start
+
+logger = logging.getLogger(__name__)
+
+# ------------------ Configuration ------------------ #
+
+SLOPE_BARS = int(os.getenv('VWAP_SLOPE_BARS', 6)) # Closed bars the slope is measured over
+BAND_MULTIPLIERS = (1, 2, 3) # Standard deviations of the bands
+
+# --------------------------------------------------- #
+
+# Price a bar contributes: its own VWAP when the feed sends one, else the typical price
+def bar_price(candle):
+    vwap = candle['VWAP']
+    if vwap is not None and not math.isnan(vwap) and vwap > 0:
+        return vwap
+    high, low, close = candle['High'], candle['Low'], candle['Close']
+    if high is None or low is None or close is None:
+        return close
+    return (high + low + close) / 3
+
+# Sums of price x volume, volume and price^2 x volume since the anchor.
+# The forming bar is kept apart so its repeats replace instead of adding up.
+class AnchoredVWAP():
+    __slots__ = ('start', 'pv', 'v', 'p2v', 'forming', 'forming_time', 'history')
+
+    def __init__(self, start, slope_bars=SLOPE_BARS):
+        self.start = start
+        self.pv = 0.0
+        self.v = 0.0
+        self.p2v = 0.0
+        self.forming = (0.0, 0.0, 0.0)
+        self.forming_time = None
+        self.history = deque(maxlen=slope_bars) # VWAP at the close of the last closed bars
+
+    def update(self, price, volume, event_time):
+        if self.forming_time is not None and event_time < self.forming_time:
+            return # Late update to a bar already folded in
+        if self.forming_time is not None and event_time > self.forming_time:
+            pv, v, p2v = self.forming
+            self.pv += pv
+            self.v += v
+            self.p2v += p2v
+            if self.v:
+                self.history.append(self.pv / self.v)
+        self.forming = (price * volume, volume, price * price * volume)
+        self.forming_time = event_time
+
+    def _sums(self):
+        pv, v, p2v = self.forming
+        return self.pv + pv, self.v + v, self.p2v + p2v
+
+    @property
+    def value(self):
+        pv, v, _ = self._sums()
+        return pv / v if v else None
+
+    # Volume weighted standard deviation of price around the VWAP
+    @property
+    def std(self):
+        pv, v, p2v = self._sums()
+        if not v:
+            return None
+        vwap = pv / v
+        return math.sqrt(max(p2v / v - vwap * vwap, 0.0))
+
+    def bands(self, multipliers=BAND_MULTIPLIERS):
+        vwap, std = self.value, self.std
+        if vwap is None:
+            return []
+        return [(vwap - k * std, vwap + k * std) for k in multipliers]
+
+    # Change in VWAP per bar over the last SLOPE_BARS closed bars
+    @property
+    def slope(self):
+        vwap = self.value
+        if vwap is None or not self.history:
+            return None
+        return (vwap - self.history[0]) / len(self.history)
+
+# Every anchor of every symbol. Session anchors roll over on their own (sessions.anchor_key),
+# custom anchors start at a given time, e.g. the bar a study event fired on.
+class VWAPEngine():
+    def __init__(self, anchors=ANCHORS, slope_bars=SLOPE_BARS):
+        self.anchors = tuple(anchors)
+        self.slope_bars = slope_bars
+        self.vwaps = {} # (symbol, anchor) -> AnchoredVWAP
+        self.keys = {} # (symbol, anchor) -> anchor period the VWAP belongs to
+        self.custom = {} # (symbol, name) -> start time
+
+    # Starts (or restarts) a custom anchor, bars before start_time are ignored
+    def anchor(self, symbol, name, start_time):
+        if name in ANCHORS:
+            raise ValueError(f"'{name}' is a session anchor, pick another name for a custom anchor")
+        self.custom[(symbol, name)] = start_time
+        self.vwaps[(symbol, name)] = AnchoredVWAP(start_time, self.slope_bars)
+
+    def drop(self, symbol, name):
+        self.custom.pop((symbol, name), None)
+        self.vwaps.pop((symbol, name), None)
+
+    # One candle into every anchor of its symbol (or only 'anchors')
+    def update(self, candle, anchors=None):
+        volume = candle['Volume']
+        price = bar_price(candle)
+        if not volume or price is None or math.isnan(volume) or math.isnan(price):
+            return
+        symbol, event_time = candle['EventSymbol'], candle['EventTime']
+        for anchor in self.anchors if anchors is None else [a for a in anchors if a in ANCHORS]:
+            key = anchor_key(anchor, symbol, event_time)
+            if key is None:
+                continue # Outside the anchor's hours (RTH overnight), the last value stands
+            if self.keys.get((symbol, anchor)) != key:
+                self.keys[(symbol, anchor)] = key
+                self.vwaps[(symbol, anchor)] = AnchoredVWAP(event_time, self.slope_bars)
+            self.vwaps[(symbol, anchor)].update(price, volume, event_time)
+        for (custom_symbol, name), start_time in self.custom.items():
+            if custom_symbol == symbol and event_time >= start_time and (anchors is None or name in anchors):
+                self.vwaps[(symbol, name)].update(price, volume, event_time)
+
+    # History oldest first (CandleRecords), e.g. everything since history_start()
+    def warm_up(self, history, anchors=None):
+        for candle in history:
+            self.update(candle, anchors)
+
+    # Earliest bar any session anchor of the symbol needs, as of 'now'
+    def history_start(self, symbol, now):
+        return min(anchor_start(anchor, symbol, now) for anchor in self.anchors)
+
+    def get(self, symbol, anchor):
+        return self.vwaps.get((symbol, anchor))
+
+    # vwap, or (vwap, std bands) / (vwap, slope) / (vwap, std bands, slope) like the Studies VWAP methods return
+    def result(self, symbol, anchor, std=False, slope=False):
+        vwap = self.get(symbol, anchor)
+        value = vwap.value if vwap is not None else None
+        if not std and not slope:
+            return value
+        result = (value,)
+        if std:
+            result += (vwap.bands() if vwap is not None else [],)
+        if slope:
+            result += (vwap.slope if vwap is not None else None,)
+        return result
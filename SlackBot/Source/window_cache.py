@@ -0,0 +1,74 @@
+# window_cache.py
+# window_cache.py keeps the last N candles of every symbol in memory so the main loop never has to read back what it just wrote.
+import logging
+import os
+from collections import deque
+import numpy as np
+from SlackBot.Source.candle import records_to_frame, frame_to_records
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SIZE = int(os.getenv('WINDOW_SIZE', 200)) # Candles kept per symbol
+
+class WindowCache():
+    def __init__(self, size=WINDOW_SIZE):
+        self.size = size
+        self.windows = {} # symbol -> deque of CandleRecords, oldest first
+        self.versions = {} # symbol -> bumped on every change
+        self.frames = {} # symbol -> (version, DataFrame) built on demand
+
+    # One read per symbol at startup, after that the cache is fed by append()
+    async def seed(self, data, symbols):
+        for symbol in symbols:
+            df = await data.read_data(symbol, limit=self.size)
+            window = self._window(symbol)
+            window.clear()
+            window.extend(frame_to_records(df))
+            self._touch(symbol)
+            logger.debug(f" WindowCache | seed | Symbol: {symbol} | Candles: {len(window)}")
+
+    # O(1): a repeat of the forming bar replaces the last entry, a new bar is appended
+    def append(self, candle):
+        symbol = candle['EventSymbol']
+        window = self._window(symbol)
+        if window:
+            last_time = window[-1]['EventTime']
+            if candle['EventTime'] == last_time:
+                window[-1] = candle
+                self._touch(symbol)
+                return
+            if candle['EventTime'] < last_time:
+                # Late update to an older bar, patch it in place if it is still in the window
+                for i in range(len(window) - 2, -1, -1):
+                    if window[i]['EventTime'] == candle['EventTime']:
+                        window[i] = candle
+                        self._touch(symbol)
+                        break
+                return
+        window.append(candle)
+        self._touch(symbol)
+
+    def records(self, symbol):
+        return list(self.windows.get(symbol, ()))
+
+    # Same shape as Data.read_data (sorted by EventTime), rebuilt only when the window changed
+    def frame(self, symbol):
+        version = self.versions.get(symbol, 0)
+        cached = self.frames.get(symbol)
+        if cached is None or cached[0] != version:
+            cached = (version, records_to_frame(self.windows.get(symbol, ())))
+            self.frames[symbol] = cached
+        return cached[1]
+
+    # One column as a float array, e.g. cache.array('/ES', 'Close')
+    def array(self, symbol, column):
+        return np.fromiter((candle[column] for candle in self.windows.get(symbol, ())), dtype=np.float64)
+
+    def _window(self, symbol):
+        window = self.windows.get(symbol)
+        if window is None:
+            window = self.windows[symbol] = deque(maxlen=self.size)
+        return window
+
+    def _touch(self, symbol):
+        self.versions[symbol] = self.versions.get(symbol, 0) + 1
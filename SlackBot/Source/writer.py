@@ -0,0 +1,168 @@
+# writer.py
+# writer.py buffers rows in memory and bulk loads them into Postgres with COPY, flushing on a size or time threshold.
+import asyncio
+import csv
+import io
+import logging
+import os
+import time
+import pandas as pd
+from datetime import datetime
+from sqlalchemy import inspect
+
+logger = logging.getLogger(__name__)
+
+# ------------------ Configuration ------------------ #
+
+FLUSH_SIZE = int(os.getenv('WRITER_FLUSH_SIZE', 500)) # Rows buffered before a flush is forced
+FLUSH_INTERVAL = float(os.getenv('WRITER_FLUSH_INTERVAL', 5)) # Max seconds a row waits in the buffer
+DURABILITY = os.getenv('WRITER_DURABILITY', 'sync') # 'sync' waits for the WAL flush, 'async' commits with synchronous_commit off
+
+# --------------------------------------------------- #
+
+def _csv_value(value):
+    # COPY csv treats an unquoted empty field as NULL
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+# Batched COPY writer, one instance per table
+# With a key the batch is COPY'd into a temp table and upserted with ON CONFLICT (key) DO UPDATE.
+# With a spool every batch is written to disk first and only deleted once the database has it.
+# manage_table=False leaves the DDL to the caller (candle_data is owned by schema.py).
+class BulkWriter():
+    def __init__(self, engine, table='candle_data', key=None, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL, durability=DURABILITY, spool=None, manage_table=True):
+        if durability not in ('sync', 'async'):
+            raise ValueError(f"Unknown durability '{durability}', expected 'sync' or 'async'")
+        self.engine = engine
+        self.table = table
+        self.key = list(key) if key else None
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.spool = spool
+        self.buffer = []
+        self.columns = None
+        self.table_checked = not manage_table
+        self.lock = asyncio.Lock()
+        self.timer_task = None
+        self.last_flush = time.monotonic()
+
+    # Buffers rows (CandleRecords or dicts keyed by column name) and flushes once the size threshold is hit
+    async def add(self, rows):
+        if not rows:
+            return
+        if self.columns is None:
+            self.columns = list(rows[0].keys())
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.flush_size:
+            try:
+                await self.flush()
+                return
+            except Exception:
+                pass # Logged in flush, the rows stay buffered for the timer to retry
+        if self.timer_task is None or self.timer_task.done():
+            self.timer_task = asyncio.create_task(self._flush_timer())
+
+    # Flushes whatever is buffered, the COPY itself runs in a worker thread so the event loop keeps going
+    # Spooled batches left by a failed flush or a previous run are replayed first, in order.
+    async def flush(self):
+        async with self.lock:
+            if not self.buffer and not self._spooled():
+                return
+            rows, self.buffer = self.buffer, []
+            spooled = False
+            try:
+                if self.spool is not None:
+                    await asyncio.to_thread(self.spool.append, rows)
+                    spooled = True
+                    await asyncio.to_thread(self.spool.replay, self.write_rows)
+                else:
+                    await asyncio.to_thread(self.write_rows, rows)
+                self.last_flush = time.monotonic()
+                logger.debug(f" Writer | flush | Table: {self.table} | Rows: {len(rows)}")
+            except Exception as e:
+                logger.error(f" Writer | flush | Table: {self.table} | Error: {e}")
+                # Rows not safe in the spool go back for the next attempt, ahead of anything that arrived meanwhile
+                if not spooled:
+                    self.buffer[:0] = rows
+                raise
+
+    # Flushes the remainder and stops the timer. A flush the timer is running finishes first,
+    # cancelling it mid COPY would drop its rows.
+    async def close(self):
+        if self.timer_task is not None:
+            timer_task, self.timer_task = self.timer_task, None
+            async with self.lock:
+                timer_task.cancel()
+            await asyncio.gather(timer_task, return_exceptions=True)
+        await self.flush()
+
+    def _spooled(self):
+        return self.spool is not None and bool(self.spool.pending)
+
+    async def _flush_timer(self):
+        while self.buffer or self._spooled():
+            wait = self.flush_interval - (time.monotonic() - self.last_flush)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                await self.flush()
+            except Exception:
+                # Already logged in flush, back off a full interval before retrying
+                await asyncio.sleep(self.flush_interval)
+
+    # Synchronous COPY of a batch, call through asyncio.to_thread from async code
+    def write_rows(self, rows):
+        if not rows:
+            return
+        if self.columns is None:
+            self.columns = list(rows[0].keys())
+        if not self.table_checked:
+            self._create_table(rows)
+        if self.key:
+            # ON CONFLICT cannot touch the same row twice in one statement, keep the latest row per key
+            rows = list({tuple(row[column] for column in self.key): row for row in rows}.values())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_csv_value(row.get(column)) for column in self.columns])
+        buffer.seek(0)
+
+        column_list = ', '.join(f'"{column}"' for column in self.columns)
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            if self.durability == 'async':
+                cursor.execute("SET LOCAL synchronous_commit TO OFF")
+            if self.key:
+                key_list = ', '.join(f'"{column}"' for column in self.key)
+                updates = ', '.join(f'"{column}" = EXCLUDED."{column}"' for column in self.columns if column not in self.key)
+                cursor.execute(f'CREATE TEMP TABLE {self.table}_staging (LIKE {self.table} INCLUDING DEFAULTS) ON COMMIT DROP')
+                cursor.copy_expert(f'COPY {self.table}_staging ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+                cursor.execute(
+                    f'INSERT INTO {self.table} ({column_list}) SELECT {column_list} FROM {self.table}_staging '
+                    f'ON CONFLICT ({key_list}) DO UPDATE SET {updates}'
+                )
+            else:
+                cursor.copy_expert(f'COPY {self.table} ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+    # COPY needs the table to exist, to_sql used to create it implicitly so keep doing that on first use
+    # ON CONFLICT also needs a unique index over the key
+    def _create_table(self, rows):
+        if not inspect(self.engine).has_table(self.table):
+            sample = [[row.get(column) for column in self.columns] for row in rows[:1]]
+            pd.DataFrame(sample, columns=self.columns).head(0).to_sql(self.table, self.engine, index=False)
+        if self.key:
+            key_list = ', '.join(f'"{column}"' for column in self.key)
+            with self.engine.begin() as connection:
+                connection.exec_driver_sql(f'CREATE UNIQUE INDEX IF NOT EXISTS {self.table}_key ON {self.table} ({key_list})')
+        self.table_checked = True
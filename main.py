@@ -3,12 +3,20 @@ import asyncio
 import logging
 from datetime import datetime, timedelta, timezone
 from SlackBot.Utils import config
-from SlackBot.Source.data import Data
+from SlackBot.Source.data import Data, STORED_INTERVAL
+from SlackBot.Source.connection import canonical_interval
 from SlackBot.Source.studies import Studies
 from SlackBot.Utils.utils import Utilities
 from SlackBot.Source.constant import symbols
+from SlackBot.Source.replay import CandleRecorder, CandleReplay
+from SlackBot.Source.window_cache import WindowCache
+from SlackBot.Source.aggregator import BarAggregator
+from SlackBot.Source.indicators import IndicatorSet
+from SlackBot.Source.profile_archive import ProfileArchive
+from SlackBot.Source.naked_vpoc import NakedVPOCIndex
 from logs.Logging_Config import setup_logging
 import os
+import tempfile
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from zoneinfo import ZoneInfo
@@ -32,8 +40,21 @@ async def main():
     logger = logging.getLogger(__name__)
     
     # Initialization 
-    data = Data()
-    studies = Studies()
+    # REPLAY_FILE plays a recorded session back offline: candles go to an in-memory store (nothing persisted, no NOTIFY)
+    # and the studies start empty with their on-disk state in a fresh temporary directory, so a replay is repeatable
+    replay_file = os.getenv('REPLAY_FILE')
+    if replay_file:
+        state_dir = tempfile.mkdtemp(prefix='replay_')
+        data = Data(backend='memory')
+        studies = Studies(
+            data,
+            archive=ProfileArchive(os.path.join(state_dir, 'profile_archive')),
+            naked=NakedVPOCIndex(os.path.join(state_dir, 'naked_vpocs.json'))
+        )
+        logger.info(f" Main | replay | File: {replay_file} | State: {state_dir}")
+    else:
+        data = Data()
+        studies = Studies(data)
     utils = Utilities()
     
     logger.debug()
@@ -84,12 +105,82 @@ async def main():
         trigger=CronTrigger(hour=12, minute=00, second=1, timezone=est),
         name='IB Crude Alert'
     )    
-    scheduler.start()
-    logger.info("APScheduler started.")      
+    # Store maintenance every day after the close: candle_data partitions ahead of the calendar (and retention),
+    # or compaction of the finished Parquet partitions
+    scheduler.add_job(
+        data.maintenance,
+        trigger=CronTrigger(hour=17, minute=15, timezone=est),
+        name='Store Maintenance'
+    )
+    if not replay_file:
+        scheduler.start()
+        logger.info("APScheduler started.")      
     
+    # Base Subscription, every other timeframe is aggregated locally from it
+    # The store keeps one bar per (symbol, time), a base other than the stored interval would upsert over its bars
+    base_interval = os.getenv('BASE_INTERVAL', '5min')
+    if canonical_interval(base_interval) != STORED_INTERVAL:
+        raise ValueError(f"BASE_INTERVAL '{base_interval}' is not supported, the candle store holds {STORED_INTERVAL} bars")
+
+    # Event Source (REPLAY_FILE plays a recorded session back instead of the live feed, RECORD_FILE records the live feed)
+    record_file = os.getenv('RECORD_FILE')
+    recorder = CandleRecorder(record_file) if record_file and not replay_file else None
+    if replay_file:
+        speed = float(os.getenv('REPLAY_SPEED', 1)) or None # 0 = Unthrottled
+        candles = CandleReplay(replay_file, speed).stream_candle_data(symbols, base_interval)
+    else:
+        candles = data.stream_candle_data(symbols, base_interval, recorder=recorder)
+
+    # Time and Sales (live feed only), aggressor classified volume / delta at price accumulates in data.trades
+    async def feed_trades():
+        try:
+            async for _ in data.stream_time_and_sales(symbols):
+                pass
+        except Exception as e:
+            logger.error(f" Main | feed_trades | Error: {e}")
+    trade_task = None if replay_file else asyncio.create_task(feed_trades())
+
+    # Replay Candles Spooled by a Previous Run before Reading Anything Back
+    try:
+        await data.replay_spool()
+    except Exception as e:
+        logger.error(f" Startup | replay_spool | Error: {e}")
+
+    # Multi-Timeframe Bars (30m TPO Periods, 1h, Daily) built from the Base Stream
+    aggregator = BarAggregator(('30m', '1h', '1d'))
+
+    # Rolling Window Cache (Seeded once, then fed by the stream)
+    window_cache = WindowCache()
+    await window_cache.seed(data, symbols)
+
+    # Anchored VWAPs, warmed up once from the start of the year
+    try:
+        await studies.warm_up(symbols)
+    except Exception as e:
+        logger.error(f" Startup | studies.warm_up | Error: {e}")
+
+    # Incremental Indicators, warmed up from the Seeded Window and updated in O(1) per Candle
+    indicator_lengths = {'sma': [10, 20], 'ema': [9, 21], 'std': [20], 'min': [20], 'max': [20]}
+    indicators = IndicatorSet(indicator_lengths)
+    for symbol in symbols:
+        indicators.warm_up(symbol, window_cache.records(symbol))
+
+    # The same Indicators over every Closed Higher Timeframe Bar, the Seeded Window is rolled up first
+    timeframe_indicators = {timeframe: IndicatorSet(indicator_lengths) for timeframe in aggregator.timeframes}
+    def roll_up(candle):
+        for timeframe, bar in aggregator.update(candle):
+            timeframe_indicators[timeframe].update(bar)
+    for symbol in symbols:
+        for candle in window_cache.records(symbol):
+            roll_up(candle)
+
     # Main Loop
-    async for candle in data.stream_candle_data(symbols, '5min'):
+    async for candle in candles:
         await data.write_data([candle])
+        window_cache.append(candle)
+        roll_up(candle)
+        indicators.update(candle)
+        studies.update(candle)
         
         # Feed Relavent Data to Studies
         
@@ -98,11 +189,15 @@ async def main():
         # Conditonal Alerts
         
         # Periodic Alerts
-        
-        symbol = candle['EventSymbol']
-        df = await data.read_data(symbol, limit=200)
+        # (a study that needs a DataFrame builds it with window_cache.frame(symbol) when it runs, not per candle)
     
     # Exit Point and Exit Logic
+    if trade_task is not None:
+        trade_task.cancel()
+    await data.flush_data()
+    await data.connection.close()
+    if recorder is not None:
+        recorder.close()
     # Build Auto Exit Logic (No Need for user input)
     # Export Alerts to google sheets
     
@@ -0,0 +1,35 @@
+# test_aggregator.py
+# test_aggregator.py checks that 5m base bars, forming repeats included, roll up into closed higher timeframe bars.
+from datetime import datetime, timedelta, timezone
+from SlackBot.Source.aggregator import BarAggregator
+from SlackBot.Source.candle import CandleRecord
+from SlackBot.Source.indicators import IndicatorSet
+
+START = datetime(2026, 3, 2, 14, 30, tzinfo=timezone.utc)
+
+def base_bar(i, close, volume=100.0):
+    return CandleRecord('/ES', START + timedelta(minutes=5 * i), Volume=volume, VWAP=close,
+                        Open=close, High=close + 1, Low=close - 1, Close=close)
+
+def test_thirty_minute_bars_close_with_every_base_bar():
+    aggregator = BarAggregator(('30m',))
+    closed = []
+    for i in range(7):
+        # The forming base bar arrives twice, the repeat replaces it instead of adding its volume again
+        closed += aggregator.update(base_bar(i, 5000.0 + i, volume=50.0))
+        closed += aggregator.update(base_bar(i, 5000.0 + i))
+    (timeframe, bar), = closed
+    assert timeframe == '30m'
+    assert bar.EventTime == START
+    assert (bar.Open, bar.High, bar.Low, bar.Close) == (5000.0, 5006.0, 4999.0, 5005.0)
+    assert bar.Volume == 600.0
+    assert aggregator.current('/ES', '30m').Close == 5006.0
+
+def test_closed_bars_feed_timeframe_indicators():
+    aggregator = BarAggregator(('30m',))
+    indicators = IndicatorSet({'sma': [2]})
+    for i in range(18):
+        for _, bar in aggregator.update(base_bar(i, 5000.0 + i)):
+            indicators.update(bar)
+    # Closed 30m bars end on 5005 and 5011, the third (bars 12 - 17) has not been closed by a later bar yet
+    assert indicators.value('/ES', 'sma_2') == 5008.0
@@ -0,0 +1,72 @@
+# test_candle.py
+# test_candle.py checks that live tastytrade Candle events (Decimal fields) flow through every incremental study engine.
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+from SlackBot.Source.candle import CandleRecord
+from SlackBot.Source.indicators import IndicatorSet
+from SlackBot.Source.tpo import TPOEngine
+from SlackBot.Source.volume_profile import SessionProfiles
+from SlackBot.Source.vwap import VWAPEngine
+
+START = datetime(2026, 3, 2, 14, 30, tzinfo=timezone.utc) # 09:30 ET, RTH open
+
+def candle_event(i, close, event_flags=0):
+    return SimpleNamespace(
+        index=i, sequence=0, count=10,
+        volume=Decimal('120'), vwap=Decimal('NaN'), bid_volume=Decimal('50'), ask_volume=Decimal('70'),
+        imp_volatility=Decimal('NaN'), open_interest=Decimal('NaN'),
+        open=Decimal(str(close - 0.25)), high=Decimal(str(close + 0.5)), low=Decimal(str(close - 0.5)), close=Decimal(str(close)),
+        event_flags=event_flags,
+    )
+
+def live_records(bars=12):
+    records = []
+    for i in range(bars):
+        event = candle_event(i, 5000.0 + i * 0.25)
+        # Every bar arrives twice, once forming and once final
+        records.append(CandleRecord.from_event('/ES', event, START + timedelta(minutes=5 * i)))
+        records.append(CandleRecord.from_event('/ES', event, START + timedelta(minutes=5 * i)))
+    return records
+
+def test_from_event_converts_decimals():
+    record = CandleRecord.from_event('/ES', candle_event(0, 5000.0), START)
+    for column in ('Volume', 'BidVolume', 'AskVolume', 'Open', 'High', 'Low', 'Close'):
+        assert type(record[column]) is float
+    assert record.VWAP is None
+    assert record.ImpVolatility is None
+    assert record.OpenInterest is None
+
+def test_event_flags_are_ints():
+    # Snapshot flags (4, 8, 16) and unset flags (0 or None) share one column type
+    for flags, expected in ((0, 0), (None, 0), (4, 4), (8, 8), (16, 16)):
+        record = CandleRecord.from_event('/ES', candle_event(0, 5000.0, event_flags=flags), START)
+        assert type(record.EventFlags) is int
+        assert record.EventFlags == expected
+    assert type(CandleRecord('/ES', START).EventFlags) is int
+
+def test_decimal_events_through_every_engine():
+    records = live_records()
+    vwap = VWAPEngine()
+    profiles = SessionProfiles()
+    tpo = TPOEngine()
+    indicators = IndicatorSet({'sma': [3], 'ema': [3], 'std': [3], 'min': [3], 'max': [3]})
+    indicators.warm_up('/ES', records[:4])
+    for record in records:
+        vwap.update(record)
+        profiles.update(record)
+        tpo.update(record)
+        indicators.update(record)
+
+    # 12 bars of 120 lots closing 5000.00 .. 5002.75, each sent twice: the repeats must not count again
+    assert vwap.get('/ES', 'rth').value == pytest.approx(5001.375)
+    profile = profiles.get('/ES', 'RTH')
+    assert profile.total_volume == pytest.approx(12 * 120)
+    assert profile.vpoc == 5000.5
+    assert tpo.get('/ES', 'RTH').t_vpoc == 5001.25
+    values = indicators.values('/ES')
+    assert values['sma_3'] == pytest.approx(5002.5)
+    assert values['ema_3'] == pytest.approx(5002.5, abs=1e-3)
+    assert values['std_3'] == pytest.approx(0.25)
+    assert (values['min_3'], values['max_3']) == (5002.25, 5002.75)
@@ -0,0 +1,46 @@
+# test_decoder.py
+# test_decoder.py checks that COMPACT FEED_DATA candles decode into records with float (or None) prices and volumes.
+import json
+import math
+from datetime import datetime, timezone
+from SlackBot.Source.decoder import SCHEMAS, FeedDecoder, candle_records
+from SlackBot.Source.indicators import IndicatorSet
+
+BAR_TIME = 1772462400000 # 2026-03-02 14:40 UTC in epoch millis
+
+def compact_candle(close, **overrides):
+    event = {
+        'eventSymbol': '/ES{=5m}', 'eventTime': 0, 'time': BAR_TIME, 'sequence': 0, 'count': 12,
+        'open': 5000.0, 'high': 5001.0, 'low': 4999.0, 'close': close, 'volume': 250.0, 'vwap': 'NaN',
+        'bidVolume': 100.0, 'askVolume': 150.0, 'impVolatility': 'NaN', 'openInterest': 'NaN', 'eventFlags': 0,
+    }
+    event.update(overrides)
+    return [event[field] for field in SCHEMAS['Candle']]
+
+def decode(*events):
+    message = {'type': 'FEED_DATA', 'channel': 1, 'data': ['Candle', [value for event in events for value in event]]}
+    return candle_records(FeedDecoder().decode(json.dumps(message))['Candle'])
+
+def test_nan_strings_become_none():
+    record, = decode(compact_candle('NaN', open='NaN', high='NaN', low='NaN'))
+    assert record.EventSymbol == '/ES'
+    assert record.EventTime == datetime.fromtimestamp(BAR_TIME / 1000, tz=timezone.utc)
+    for column in ('Open', 'High', 'Low', 'Close', 'VWAP', 'ImpVolatility', 'OpenInterest'):
+        assert record[column] is None
+    assert record.Volume == 250.0
+
+def test_decoded_values_are_floats():
+    first, second = decode(compact_candle(5000.5), compact_candle(5000.75, volume=300))
+    for column in ('Open', 'High', 'Low', 'Close', 'Volume', 'BidVolume', 'AskVolume'):
+        assert type(first[column]) is float
+    assert second.Volume == 300.0
+    assert type(first.EventFlags) is int
+
+    snapshot, = decode(compact_candle(5000.5, eventFlags=8))
+    assert snapshot.EventFlags == 8
+
+    indicators = IndicatorSet({'sma': [1]})
+    assert indicators.update(first)['sma_1'] == 5000.5
+    nan_close, = decode(compact_candle('NaN'))
+    assert indicators.update(nan_close)['sma_1'] == 5000.5 # A NaN close leaves the indicator alone
+    assert not math.isnan(indicators.value('/ES', 'sma_1'))
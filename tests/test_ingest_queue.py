@@ -0,0 +1,62 @@
+# test_ingest_queue.py
+# test_ingest_queue.py checks the overflow policies of the bounded ingest queue and its gauges.
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from SlackBot.Source.candle import CandleRecord
+from SlackBot.Source.ingest_queue import IngestQueue
+
+START = datetime(2026, 3, 2, 14, 30, tzinfo=timezone.utc)
+
+def bar(i, close=5000.0):
+    return CandleRecord('/ES', START + timedelta(minutes=5 * i), Close=close)
+
+def closes(rows):
+    return [(row.EventTime, row.Close) for row in rows]
+
+def test_block_waits_for_the_writer():
+    async def run():
+        queue = IngestQueue(2, policy='block')
+        await queue.put(bar(0))
+        await queue.put(bar(1))
+        producer = asyncio.create_task(queue.put(bar(2)))
+        await asyncio.sleep(0.01)
+        assert not producer.done() # Full, the feed is held back
+        assert queue.blocked == 1
+        assert closes(queue.get_batch(1)) == closes([bar(0)])
+        await asyncio.wait_for(producer, 1)
+        assert closes(queue.get_batch(10)) == closes([bar(1), bar(2)])
+    asyncio.run(run())
+
+def test_drop_oldest_never_waits():
+    async def run():
+        queue = IngestQueue(2, policy='drop_oldest')
+        for i in range(4):
+            await asyncio.wait_for(queue.put(bar(i)), 1)
+        assert queue.dropped == 2
+        assert queue.high_water == 2
+        assert closes(queue.get_batch(10)) == closes([bar(2), bar(3)])
+    asyncio.run(run())
+
+def test_coalesce_replaces_in_place():
+    async def run():
+        queue = IngestQueue(2, policy='coalesce')
+        await queue.put(bar(0, 1.0))
+        await queue.put(bar(1, 1.0))
+        # Same candle key while full: replaced where it is queued, no waiting
+        await asyncio.wait_for(queue.put(bar(0, 2.0)), 1)
+        assert queue.coalesced == 1
+        assert closes(queue.get_batch(10)) == closes([bar(0, 2.0), bar(1, 1.0)])
+        # The key left the queue with the batch, the next update queues again
+        await queue.put(bar(0, 3.0))
+        assert queue.depth == 1
+    asyncio.run(run())
+
+def test_gauges_and_validation():
+    queue = IngestQueue(5)
+    assert queue.gauges()['depth'] == 0
+    assert queue.lag == 0.0
+    with pytest.raises(ValueError):
+        IngestQueue(5, policy='newest')
+    with pytest.raises(ValueError):
+        IngestQueue(0)
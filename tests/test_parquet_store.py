@@ -0,0 +1,55 @@
+# test_parquet_store.py
+# test_parquet_store.py round-trips history batches (snapshot flags included) through the Parquet store.
+import asyncio
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from SlackBot.Source.candle import CandleRecord
+from SlackBot.Source.parquet_store import ParquetStore
+
+START = datetime(2026, 3, 2, 14, 30, tzinfo=timezone.utc)
+
+def history_event(i, event_flags):
+    close = Decimal(5000) + i
+    return SimpleNamespace(
+        index=i, sequence=0, count=10, volume=Decimal('120'), vwap=Decimal('NaN'), bid_volume=Decimal('50'),
+        ask_volume=Decimal('70'), imp_volatility=Decimal('NaN'), open_interest=Decimal('NaN'),
+        open=close, high=close + 1, low=close - 1, close=close, event_flags=event_flags,
+    )
+
+def test_snapshot_flags_round_trip(tmp_path):
+    # A history snapshot: begin flag on the first event, nothing in the middle, end flag on the last
+    flags = [4, 0, None, 8]
+    records = [CandleRecord.from_event('/ES', history_event(i, flag), START + timedelta(minutes=5 * i)) for i, flag in enumerate(flags)]
+    store = ParquetStore(root=str(tmp_path), flush_size=100)
+
+    async def write():
+        await store.add([record.as_dict() for record in records])
+        await store.close()
+    asyncio.run(write())
+
+    df = store.read('/ES')
+    assert list(df['EventFlags']) == [4, 0, 0, 8]
+    assert list(df['Close']) == [5000.0, 5001.0, 5002.0, 5003.0]
+    assert df['VWAP'].isna().all()
+
+def test_failed_write_keeps_rows(tmp_path, monkeypatch):
+    store = ParquetStore(root=str(tmp_path), flush_size=2, flush_interval=60)
+    rows = [CandleRecord.from_event('/ES', history_event(i, 0), START + timedelta(minutes=5 * i)).as_dict() for i in range(3)]
+    write_rows = store.write_rows
+
+    def failing(rows):
+        raise OSError("disk full")
+
+    async def run():
+        monkeypatch.setattr(store, 'write_rows', failing)
+        await store.add(rows[:2]) # Size threshold hit, the write fails and is not raised to the caller
+        assert store.buffer == rows[:2]
+        await store.add(rows[2:])
+        assert store.buffer == rows
+        monkeypatch.setattr(store, 'write_rows', write_rows)
+        await store.close()
+        assert store.buffer == []
+    asyncio.run(run())
+
+    assert list(store.read('/ES')['Close']) == [5000.0, 5001.0, 5002.0]
@@ -0,0 +1,65 @@
+# test_replay.py
+# test_replay.py checks that a recorded session plays back as exactly the records the live stream produced.
+import asyncio
+import struct
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from SlackBot.Source.candle import CandleRecord
+from SlackBot.Source.memory_store import MemoryStore
+from SlackBot.Source.replay import MAGIC_V1, CandleRecorder, CandleReplay, read_log
+
+START = datetime(2026, 3, 2, 14, 30, tzinfo=timezone.utc)
+
+def live_event(i, event_flags=0):
+    close = Decimal('5000.25') + i
+    return SimpleNamespace(
+        time=int((START + timedelta(minutes=5 * i)).timestamp() * 1000), index=i << 32, sequence=i, count=12,
+        volume=Decimal('250'), vwap=Decimal('NaN'), bid_volume=Decimal('100'), ask_volume=Decimal('150'),
+        imp_volatility=Decimal('NaN'), open_interest=Decimal('NaN'),
+        open=close - 1, high=close + 1, low=close - 2, close=close, event_flags=event_flags,
+    )
+
+def live_record(event):
+    return CandleRecord.from_event('/ES', event, datetime.fromtimestamp(event.time / 1000, tz=timezone.utc))
+
+def test_replayed_records_match_live(tmp_path):
+    path = str(tmp_path / 'session.bin')
+    events = [live_event(0, 4), live_event(1), live_event(2, 8)]
+    recorder = CandleRecorder(path)
+    for event in events:
+        recorder.write('/ES', event)
+    recorder.close()
+
+    replayed = [record for _, record in read_log(path)]
+    assert [record.values() for record in replayed] == [live_record(event).values() for event in events]
+    assert replayed[0].VWAP is None # Missing values come back as None, not NaN
+    assert [record.EventFlags for record in replayed] == [4, 0, 8]
+
+def test_version_1_logs_still_read(tmp_path):
+    path = tmp_path / 'v1.bin'
+    event = live_event(0)
+    body = struct.pack(
+        '<qqi11d', event.time, event.index, event.sequence, 12.0, 250.0, float('nan'), 100.0, 150.0,
+        float('nan'), float('nan'), 4999.25, 5001.25, 4998.25, 5000.25,
+    )
+    path.write_bytes(MAGIC_V1 + struct.pack('<qH', 0, 3) + b'/ES' + body)
+    (_, record), = read_log(str(path))
+    assert record.values() == live_record(event).values()
+
+def test_replay_into_memory_store(tmp_path):
+    path = str(tmp_path / 'session.bin')
+    recorder = CandleRecorder(path)
+    for i in range(3):
+        recorder.write('/ES', live_event(i))
+    recorder.close()
+    store = MemoryStore()
+
+    async def run():
+        async for candle in CandleReplay(path, speed=None).stream_candle_data(['/ES']):
+            await store.add([candle])
+    asyncio.run(run())
+
+    df = store.read('/ES', limit=2)
+    assert list(df['Close']) == [5001.25, 5002.25]
+    assert store.read('/NQ').empty
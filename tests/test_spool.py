@@ -0,0 +1,88 @@
+# test_spool.py
+# test_spool.py checks segment replay order, quarantine of rejected batches and two processes sharing a spool directory.
+import multiprocessing
+import os
+import pytest
+from SlackBot.Source.spool import Spool
+
+class OperationalError(Exception):
+    pass
+
+class DataError(Exception):
+    pass
+
+def test_replay_in_order_and_ack(tmp_path):
+    spool = Spool(str(tmp_path), fsync=False)
+    spool.append([1, 2])
+    spool.append([3])
+    written = []
+    assert spool.replay(written.append) == 2
+    assert written == [[1, 2], [3]]
+    assert spool.pending == []
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.seg')]
+
+def test_connection_error_keeps_segments(tmp_path):
+    spool = Spool(str(tmp_path), fsync=False)
+    spool.append([1])
+    spool.append([2])
+
+    def unreachable(rows):
+        raise OperationalError("connection refused")
+
+    with pytest.raises(OperationalError):
+        spool.replay(unreachable)
+    assert len(spool.pending) == 2
+    # A restart finds both segments and replays them in order
+    written = []
+    assert Spool(str(tmp_path), fsync=False).replay(written.append) == 2
+    assert written == [[1], [2]]
+
+def test_rejected_segment_is_quarantined(tmp_path):
+    spool = Spool(str(tmp_path), fsync=False)
+    for rows in ([1], ['bad'], [3]):
+        spool.append(rows)
+    written = []
+
+    def write(rows):
+        if rows == ['bad']:
+            raise DataError("invalid input syntax")
+        written.append(rows)
+
+    assert spool.replay(write) == 2
+    assert written == [[1], [3]]
+    assert spool.pending == []
+    assert os.listdir(spool.quarantine) == ['000000000001.seg']
+    # The directory drained, a new process starts numbering at 0 again but keeps the quarantined segment
+    spool = Spool(str(tmp_path), fsync=False)
+    spool.append(['bad'])
+    spool.append(['bad'])
+    spool.replay(write)
+    assert sorted(os.listdir(spool.quarantine)) == ['000000000000.seg', '000000000001.seg', '000000000001.seg.1']
+
+def test_corrupt_segment_is_set_aside(tmp_path):
+    spool = Spool(str(tmp_path), fsync=False)
+    path = spool.append([1])
+    with open(path, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b'\x00')
+    assert spool.replay(lambda rows: None) == 0
+    assert os.path.exists(f"{path}.bad")
+
+def _append_many(directory, tag, count):
+    spool = Spool(directory, fsync=False)
+    for i in range(count):
+        spool.append([(tag, i)])
+
+def test_two_processes_share_a_directory(tmp_path):
+    Spool(str(tmp_path), fsync=False) # Directory and lock file exist before the writers start
+    workers = [multiprocessing.Process(target=_append_many, args=(str(tmp_path), tag, 50)) for tag in ('a', 'b')]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    written = []
+    Spool(str(tmp_path), fsync=False).replay(written.extend)
+    # No segment overwrote another and each writer's batches stay in its own order
+    assert len(written) == 100
+    for tag in ('a', 'b'):
+        assert [i for written_tag, i in written if written_tag == tag] == list(range(50))
@@ -0,0 +1,32 @@
+# test_time_and_sales.py
+# test_time_and_sales.py checks aggressor classification and per price aggregation, including prints with missing quotes.
+from datetime import datetime, timezone
+from decimal import Decimal
+from SlackBot.Source.candle import to_float
+from SlackBot.Source.time_and_sales import BUY, SELL, TradeAggregates, classify_aggressor
+
+TRADE_TIME = datetime(2026, 3, 2, 15, 0, tzinfo=timezone.utc)
+
+def test_quote_rule():
+    assert classify_aggressor(5000.25, bid=5000.0, ask=5000.25) == BUY
+    assert classify_aggressor(5000.0, bid=5000.0, ask=5000.25) == SELL
+    assert classify_aggressor(5000.0, bid=5000.0, ask=5000.25, aggressor_side='BUY') == BUY
+
+def test_nan_quotes_fall_back_to_tick_rule():
+    # DXLink sends Decimal('NaN') for a missing bid / ask, converted they are None and the quote rule is skipped
+    bid, ask = to_float(Decimal('NaN')), to_float(Decimal('NaN'))
+    assert (bid, ask) == (None, None)
+    assert classify_aggressor(5000.25, bid, ask) is None
+    assert classify_aggressor(5000.25, bid, ask, last_price=5000.0) == BUY
+    assert classify_aggressor(5000.0, bid, ask, last_price=5000.25) == SELL
+    assert classify_aggressor(5000.0, bid, ask, last_price=5000.0, last_side=SELL) == SELL
+
+def test_aggregates_by_price():
+    trades = TradeAggregates(tick_sizes={'/ES': 0.25})
+    assert trades.add('/ES', TRADE_TIME, 5000.25, 3.0, bid=5000.0, ask=5000.25) == BUY
+    assert trades.add('/ES', TRADE_TIME, 5000.0, 2.0, bid=None, ask=None) == SELL # Tick rule, down from the last print
+    assert trades.add('/ES', TRADE_TIME, 5000.0, 1.0, bid=5000.0, ask=5000.25) == SELL
+    profile = trades.session('/ES', 'RTH')
+    assert profile.total_volume == 6.0
+    assert profile.delta == 0.0 # 3 bought, 2 + 1 sold
+    assert profile.vpoc == 5000.25 # 3 lots at each price, the tie keeps the level traded first